@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+asyncio collector engine: keeps WebSocket connections to many callboxes open in one process.
+Each endpoint has its own polling schedule, reconnects with exponential backoff and writes
+to its own record sink, tagged with the endpoint in the output file name.
+"""
+import asyncio
+import os
+import random
+import re
+import sys
+import time
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Collect.record_sink import RecordSinkError, create_sink
+from Collect.ue_monitor import UEMonitor
+from Collect.poll_scheduler import TickScheduler
+
+
+def endpoint_tag(ws_url):
+    """ws://192.168.50.66:9001/ -> 192.168.50.66_9001"""
+    return re.sub(r'[^0-9A-Za-z.-]+', '_', re.sub(r'^wss?://', '', ws_url)).strip('_')
+
+
+def tagged_output_file(output_file, tag):
+    base, ext = os.path.splitext(output_file)
+    return f"{base}_{tag}{ext}"
+
+
+class EndpointCollector:
+    """
+    One callbox connection. Record extraction reuses UEMonitor's _handle_message, so records
+    are identical to the single-endpoint collector.
+    """
+
+    def __init__(self, ws_url, sink, poll_interval=1.0, reconnect_initial=1.0, reconnect_max=30.0, **monitor_kwargs):
+        self.ws_url = ws_url
+        self.tag = endpoint_tag(ws_url)
+        self.poll_interval = poll_interval
+        self.reconnect_initial = reconnect_initial
+        self.reconnect_max = reconnect_max
+        self.monitor = UEMonitor(ws_url, sink.output_file, sink=sink, **monitor_kwargs)
+        self.connects = 0
+        self.failures = 0
+        self.missed_ticks = 0
+
+    async def _poll(self, ws):
+        """Send ue_get on a drift-free monotonic schedule; ticks are restarted on every connection."""
+        ticks = TickScheduler(1 / self.poll_interval)
+        try:
+            while True:
+                await ws.send(self.monitor.ue_get_message())
+                await ticks.wait_async()
+        finally:
+            self.missed_ticks += ticks.missed
+
+    async def run(self, stop_event):
+        backoff = self.reconnect_initial
+        while not stop_event.is_set():
+            poller = None
+            try:
+                async with websockets.connect(self.ws_url, open_timeout=10, max_size=None) as ws:
+                    self.connects += 1
+                    backoff = self.reconnect_initial
+                    print(f"[{self.tag}] connected.")
+                    poller = asyncio.create_task(self._poll(ws))
+                    receiver = asyncio.create_task(self._receive(ws))
+                    stopper = asyncio.create_task(stop_event.wait())
+                    done, _ = await asyncio.wait({poller, receiver, stopper}, return_when=asyncio.FIRST_COMPLETED)
+                    for task in (poller, receiver, stopper):
+                        task.cancel()
+                    for task in done:
+                        if task is not stopper and task.exception():
+                            raise task.exception()
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+                self.failures += 1
+                print(f"[{self.tag}] connection error: {e}", file=sys.stderr)
+            finally:
+                if poller:
+                    poller.cancel()
+
+            if stop_event.is_set():
+                break
+            # Exponential backoff with jitter so many endpoints do not reconnect in lockstep.
+            delay = backoff * random.uniform(0.5, 1.0)
+            print(f"[{self.tag}] reconnecting in {delay:.1f}s.")
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, self.reconnect_max)
+
+    async def _receive(self, ws):
+        async for message in ws:
+            self.monitor._handle_message(message, time.time_ns(), time.monotonic())
+
+
+class AsyncCollector:
+    """
+    Runs one EndpointCollector per ws_url in a single event loop. chunk_rows, flush_interval_ms
+    and verbose are passed to each endpoint's UEMonitor.
+    """
+
+    def __init__(self, ws_urls, output_file, poll_interval=1.0, time_limit=None, sink_format='csv',
+                 fsync='interval', **monitor_kwargs):
+        self.time_limit = time_limit
+        self.endpoints = []
+        for ws_url in ws_urls:
+            sink = create_sink(sink_format, tagged_output_file(output_file, endpoint_tag(ws_url)), fsync=fsync)
+            self.endpoints.append(EndpointCollector(ws_url, sink, poll_interval=poll_interval, **monitor_kwargs))
+
+    async def run(self):
+        stop_event = asyncio.Event()
+        for endpoint in self.endpoints:
+            endpoint.monitor.sink.start()
+        tasks = [asyncio.create_task(endpoint.run(stop_event)) for endpoint in self.endpoints]
+        started = time.monotonic()
+        try:
+            while True:
+                remaining = self.time_limit - (time.monotonic() - started) if self.time_limit else 1.0
+                if remaining <= 0:
+                    print(f"\nTime limit of {self.time_limit} seconds reached.")
+                    break
+                await asyncio.sleep(min(remaining, 1.0))
+                # Partly filled record chunks go to the sinks once they are older than the flush interval.
+                for endpoint in self.endpoints:
+                    endpoint.monitor.records.flush(force=False)
+                failed = [endpoint for endpoint in self.endpoints if endpoint.monitor.sink.error is not None]
+                if failed:
+                    print(f"\n[{failed[0].tag}] Record sink failed ({failed[0].monitor.sink.error}), stopping.",
+                          file=sys.stderr)
+                    break
+        finally:
+            stop_event.set()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.close(time.monotonic() - started)
+
+    def close(self, elapsed):
+        print("\nStopping collectors...")
+        failed = []
+        for endpoint in self.endpoints:
+            endpoint.monitor.records.flush()
+            try:
+                endpoint.monitor.sink.close()
+            except RecordSinkError as e:
+                # Close the remaining endpoints' sinks before reporting the failure.
+                print(f"[{endpoint.tag}] Save FAILED: {e}", file=sys.stderr)
+                failed.append(e)
+            print(f"[{endpoint.tag}] {endpoint.monitor.record_count} records in {elapsed:.0f}s, "
+                  f"{endpoint.connects} connects, {endpoint.failures} failures, {endpoint.missed_ticks} missed ticks "
+                  f"-> {endpoint.monitor.sink.output_file}")
+            print(f"[{endpoint.tag}] ue_get: {endpoint.monitor.poll_stats.summary()}")
+        if failed:
+            raise failed[0]
+
+
+def run_async_collector(ws_urls, output_file, poll_interval=1.0, time_limit=None, sink_format='csv',
+                        fsync='interval', **monitor_kwargs):
+    collector = AsyncCollector(ws_urls, output_file, poll_interval, time_limit, sink_format, fsync, **monitor_kwargs)
+    try:
+        asyncio.run(collector.run())
+    except KeyboardInterrupt:
+        # asyncio.run cancels the main task, whose finally block has already closed the sinks.
+        pass
+    return collector
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Load benchmark of the UEMonitor collector against a local mock callbox. For every UE count
+the mock server runs in its own process and UEMonitor polls it at --poll-rate for --duration
+seconds; the table reports records/s against the expected rate, ue_get request/response
+latency, receive-queue latency and drops, collector CPU and resident memory growth. Output
+files go to a temporary directory that is removed afterwards unless --keep is given.
+
+    python Collect/collector_benchmark.py --ues 1 10 100 1000 --poll-rate 10 --duration 10
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import contextlib
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Collect.record_sink import SINK_FORMATS, create_sink
+from Collect.ue_monitor import UEMonitor
+
+DEFAULT_UE_COUNTS = [1, 10, 100, 1000]
+MOCK_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_callbox.py')
+
+
+def rss_mb():
+    """Current resident set size of this process in MB (Linux /proc; falls back to peak RSS)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_mock_server(n_nr, n_lte=0, extra_args=(), timeout=10.0):
+    """Launch mock_callbox.py in a subprocess; returns (process, ws_url) once the port accepts connections."""
+    port = _free_port()
+    proc = subprocess.Popen([sys.executable, MOCK_SCRIPT, '--port', str(port), '--nr-ues', str(n_nr),
+                             '--lte-ues', str(n_lte), *extra_args],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return proc, f"ws://127.0.0.1:{port}/"
+        except OSError:
+            if proc.poll() is not None:
+                break
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError(f"Mock callbox did not start on port {port}")
+
+
+def output_size(path):
+    """Size in bytes of a file, or of every file below a directory."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def benchmark_collector(n_ues, poll_rate=10.0, duration=10.0, sink_format='binary', lte_fraction=0.25,
+                        keep=False):
+    """
+    Run UEMonitor against a mock callbox with n_ues UEs; returns a dict of measurements.
+    The output directory is removed afterwards unless keep is set ('output_dir' in the result).
+    """
+    n_lte = int(n_ues * lte_fraction)
+    proc, ws_url = start_mock_server(n_ues - n_lte, n_lte)
+    out_dir = tempfile.mkdtemp(prefix=f'collector_bench_{n_ues}_')
+    output_file = os.path.join(out_dir, 'bench.csv' if sink_format == 'csv' else 'bench.bin')
+    try:
+        monitor = UEMonitor(ws_url, output_file, time_limit=duration, poll_rate=poll_rate,
+                            sink=create_sink(sink_format, output_file, fsync='never'))
+        rss_before = rss_mb()
+        peak = [rss_before]
+        done = threading.Event()
+
+        def sample_rss():
+            while not done.wait(0.1):
+                peak[0] = max(peak[0], rss_mb())
+
+        sampler = threading.Thread(target=sample_rss, daemon=True)
+        sampler.start()
+        cpu_before = time.process_time()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            monitor.start_monitoring()
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu_before
+        done.set()
+        sampler.join()
+        output_bytes = output_size(out_dir)
+    finally:
+        proc.kill()
+        proc.wait()
+        if not keep:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    stats = monitor.poll_stats
+    latencies = sorted(stats.latencies)
+    p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] if latencies else float('nan')
+    return {
+        'ues': n_ues,
+        'records': monitor.record_count,
+        'records_per_s': monitor.record_count / elapsed,
+        'expected_per_s': n_ues * poll_rate,
+        'latency_avg_ms': sum(latencies) / len(latencies) * 1000 if latencies else float('nan'),
+        'latency_p95_ms': p95 * 1000,
+        'rx_latency_avg_ms': monitor.rx_latency_total / monitor.rx_frames * 1000 if monitor.rx_frames else 0.0,
+        'rx_dropped': monitor.rx_dropped,
+        'unanswered': stats.outstanding,
+        'cpu_pct': cpu / elapsed * 100,
+        'rss_growth_mb': peak[0] - rss_before,
+        'output_mb': output_bytes / 2**20,
+        'output_dir': out_dir if keep else None,
+    }
+
+
+def format_results(results):
+    header = (f"{'UEs':>6} {'records/s':>10} {'expected':>9} {'lat avg':>8} {'lat p95':>8} {'rx q':>7} "
+              f"{'drops':>6} {'CPU %':>6} {'RSS +MB':>8} {'out MB':>7}")
+    lines = [header, '-' * len(header)]
+    for r in results:
+        lines.append(f"{r['ues']:>6} {r['records_per_s']:>10.0f} {r['expected_per_s']:>9.0f} "
+                     f"{r['latency_avg_ms']:>6.1f}ms {r['latency_p95_ms']:>6.1f}ms {r['rx_latency_avg_ms']:>5.1f}ms "
+                     f"{r['rx_dropped']:>6} {r['cpu_pct']:>6.1f} {r['rss_growth_mb']:>8.1f} {r['output_mb']:>7.2f}")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Collector load benchmark against a local mock callbox.')
+    parser.add_argument('--ues', type=int, nargs='+', default=DEFAULT_UE_COUNTS,
+                        help=f'UE counts to test (default: {DEFAULT_UE_COUNTS}).')
+    parser.add_argument('--poll-rate', type=float, default=10.0, help='ue_get rate in Hz (default: 10).')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per UE count (default: 10).')
+    parser.add_argument('--sink-format', choices=SINK_FORMATS, default='binary',
+                        help='Record sink used by the collector (default: binary).')
+    parser.add_argument('--keep', action='store_true', help='Keep the output files instead of deleting them.')
+    args = parser.parse_args()
+
+    results = []
+    for n in args.ues:
+        results.append(benchmark_collector(n, args.poll_rate, args.duration, args.sink_format, keep=args.keep))
+        kept = f" Output kept in {results[-1]['output_dir']}." if args.keep else ''
+        print(f"{n} UEs done.{kept}", flush=True)
+    print(format_results(results))
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Adaptive dwell for the heatmap sweep: per-UE rolling throughput statistics in fixed-size
+ring buffers (O(1) per sample) and a DwellPolicy that ends a measurement point as soon as
+the mean has settled, between a minimum and a maximum dwell.
+
+Run this module to compare a simulated campaign with the fixed 5 s + 15 s dwell:
+    python Collect/dwell.py --points 130
+"""
+import math
+import random
+import argparse
+import threading
+from functools import lru_cache
+
+from scipy.stats import t as student_t
+
+DEFAULT_WINDOW = 64
+DEFAULT_CONFIDENCE = 0.95
+CONVERGENCE_CRITERIA = ['ci', 'std']
+
+
+@lru_cache(maxsize=None)
+def t_quantile(confidence, dof):
+    """Two-sided Student t critical value, e.g. 4.30 for 95% at 2 degrees of freedom (1.96 as dof -> inf)."""
+    return float(student_t.ppf(0.5 + confidence / 2, dof))
+
+
+class RingStats:
+    """Mean and variance of the last `capacity` samples, kept as running sums over a ring buffer."""
+
+    __slots__ = ('capacity', 'values', 'pos', 'count', 'total', 'total_sq')
+
+    def __init__(self, capacity=DEFAULT_WINDOW):
+        self.capacity = capacity
+        self.values = [0.0] * capacity
+        self.pos = 0
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def push(self, value):
+        if self.count == self.capacity:
+            old = self.values[self.pos]
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            self.count += 1
+        self.values[self.pos] = value
+        self.total += value
+        self.total_sq += value * value
+        self.pos = (self.pos + 1) % self.capacity
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def variance(self):
+        """Sample variance (n - 1); clamped at 0 against rounding in the running sums."""
+        if self.count < 2:
+            return 0.0
+        return max((self.total_sq - self.total * self.total / self.count) / (self.count - 1), 0.0)
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def ci_halfwidth(self, confidence=DEFAULT_CONFIDENCE):
+        """
+        Half-width of the t confidence interval of the mean. With the few samples a point has
+        early on, the normal quantile (1.96) would understate it by up to 2x (t = 4.30 at n = 3).
+        """
+        if self.count < 2:
+            return math.inf
+        return t_quantile(confidence, self.count - 1) * self.std / math.sqrt(self.count)
+
+
+class UERateStats:
+    """
+    RingStats per UE id, fed by the collector thread and read by the sweep thread. reset(since_ns)
+    starts a new point: samples received before since_ns (e.g. still queued from the settle
+    period) are ignored instead of entering the new window. Only the last `window` samples per
+    UE count, so a point should pass DwellPolicy.window() to cover its whole dwell.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._since_ns = None
+
+    def push(self, ue_id, value, ts_ns=None):
+        with self._lock:
+            if ts_ns is not None and self._since_ns is not None and ts_ns < self._since_ns:
+                return
+            stats = self._stats.get(ue_id)
+            if stats is None:
+                stats = self._stats[ue_id] = RingStats(self.window)
+            stats.push(value)
+
+    def reset(self, since_ns=None, window=None):
+        with self._lock:
+            self._stats = {}
+            self._since_ns = since_ns
+            if window is not None:
+                self.window = window
+
+    def snapshot(self):
+        """{ue_id: (count, mean, std, ci_halfwidth)}"""
+        with self._lock:
+            return {ue_id: (s.count, s.mean, s.std, s.ci_halfwidth()) for ue_id, s in self._stats.items()}
+
+
+class DwellPolicy:
+    """
+    When to stop measuring a point. After `settle` seconds for the link to react, samples are
+    collected for at least `min_dwell` and at most `max_dwell` seconds; in between the point
+    ends once every UE has `min_samples` samples and its spread is within tolerance:
+      ci  - CI half-width of the mean <= max(rel_tol * |mean|, abs_tol)
+      std - sample standard deviation  <= max(rel_tol * |mean|, abs_tol)
+    abs_tol (Mbps) keeps points with near-zero throughput from never converging.
+    """
+
+    def __init__(self, settle=2.0, min_dwell=3.0, max_dwell=15.0, criterion='ci', rel_tol=0.05, abs_tol=0.5,
+                 min_samples=3):
+        if criterion not in CONVERGENCE_CRITERIA:
+            raise ValueError(f"Unknown convergence criterion: {criterion}")
+        self.settle = settle
+        self.min_dwell = min_dwell
+        self.max_dwell = max(max_dwell, min_dwell)
+        self.criterion = criterion
+        self.rel_tol = rel_tol
+        self.abs_tol = abs_tol
+        self.min_samples = min_samples
+
+    def ue_converged(self, count, mean, std, ci_halfwidth):
+        if count < self.min_samples:
+            return False
+        spread = ci_halfwidth if self.criterion == 'ci' else std
+        return spread <= max(self.rel_tol * abs(mean), self.abs_tol)
+
+    def done(self, elapsed, snapshot):
+        """(finished, converged) for a point measured for `elapsed` seconds."""
+        if elapsed >= self.max_dwell:
+            return True, bool(snapshot) and all(self.ue_converged(*s) for s in snapshot.values())
+        if elapsed < self.min_dwell or not snapshot:
+            return False, False
+        converged = all(self.ue_converged(*s) for s in snapshot.values())
+        return converged, converged
+
+    def window(self, sample_rate):
+        """Ring size holding every sample of a max_dwell point at sample_rate samples/s per UE (plus slack)."""
+        return max(math.ceil(self.max_dwell * sample_rate) + 2, DEFAULT_WINDOW)
+
+
+def point_throughput(snapshot):
+    """Mean over UEs of each UE's mean throughput, so UEs with more records do not dominate."""
+    if not snapshot:
+        return 0.0
+    return sum(mean for _, mean, _, _ in snapshot.values()) / len(snapshot)
+
+
+def simulate_campaign(n_points=130, n_ues=1, sample_rate=1.0, noise_cv=0.05, policy=None, seed=0):
+    """
+    Simulate measuring n_points with a fixed dwell (5 s wait + 15 s) and with `policy`.
+    Throughput per point is drawn once, samples add Gaussian noise with coefficient of variation
+    noise_cv. Returns (fixed seconds, adaptive seconds, mean |difference| between estimates in Mbps).
+    """
+    rng = random.Random(seed)
+    policy = policy or DwellPolicy()
+    dt = 1.0 / sample_rate
+    fixed_time = adaptive_time = 0.0
+    diffs = []
+    for _ in range(n_points):
+        true_rates = [rng.choice([0.0, rng.uniform(5, 250)]) for _ in range(n_ues)]
+
+        def sample(rate):
+            return max(rng.gauss(rate, noise_cv * rate), 0.0)
+
+        fixed = UERateStats(math.ceil(15 * sample_rate) + 2)
+        for _ in range(int(15 * sample_rate)):
+            for ue_id, rate in enumerate(true_rates):
+                fixed.push(ue_id, sample(rate))
+        fixed_time += 5 + 15
+
+        adaptive = UERateStats(policy.window(sample_rate))
+        elapsed = 0.0
+        while True:
+            elapsed += dt
+            for ue_id, rate in enumerate(true_rates):
+                adaptive.push(ue_id, sample(rate))
+            finished, _ = policy.done(elapsed, adaptive.snapshot())
+            if finished:
+                break
+        adaptive_time += policy.settle + elapsed
+        diffs.append(abs(point_throughput(fixed.snapshot()) - point_throughput(adaptive.snapshot())))
+    return fixed_time, adaptive_time, sum(diffs) / len(diffs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate fixed vs adaptive dwell for a heatmap campaign.')
+    parser.add_argument('--points', type=int, default=130, help='Number of (gain, noise) points (default: 130).')
+    parser.add_argument('--ues', type=int, default=1, help='UEs per point (default: 1).')
+    parser.add_argument('--rate', type=float, default=1.0, help='Samples per second per UE (default: 1).')
+    parser.add_argument('--noise-cv', type=float, default=0.05, help='Sample noise as a fraction of the mean.')
+    parser.add_argument('--criterion', choices=CONVERGENCE_CRITERIA, default='ci')
+    args = parser.parse_args()
+    fixed_s, adaptive_s, mean_diff = simulate_campaign(args.points, args.ues, args.rate, args.noise_cv,
+                                                       DwellPolicy(criterion=args.criterion))
+    print(f"fixed dwell:    {fixed_s / 60:.1f} min")
+    print(f"adaptive dwell: {adaptive_s / 60:.1f} min ({adaptive_s / fixed_s:.0%} of fixed)")
+    print(f"mean |throughput difference| per point: {mean_diff:.2f} Mbps")
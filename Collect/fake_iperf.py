@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the iperf 2 UDP client and server used by the collector: accepts the same options,
+prints the same header and per-interval report lines and a final report on SIGINT/SIGHUP/SIGTERM.
+The server (-s) reports jitter and lost/total datagrams for a simulated link that delivers
+--rate with --loss datagrams lost. --time-scale shortens the real interval so tests run faster
+than one report per second.
+
+    python Collect/fake_iperf.py -c 192.168.2.2 -u -b 230m -t 1000000 -i 1 --time-scale 0.1
+    python Collect/fake_iperf.py -s -u -i 1 --rate 120m --loss 0.02 --time-scale 0.1
+"""
+import sys
+import time
+import random
+import signal
+import argparse
+
+_UNITS = {'': 1, 'k': 1e3, 'm': 1e6, 'g': 1e9}
+DATAGRAM_BYTES = 1470
+
+
+def parse_rate(value):
+    """'230m' -> 230e6 bits/s."""
+    value = value.strip().lower()
+    unit = value[-1] if value[-1] in _UNITS else ''
+    return float(value[:-1] if unit else value) * _UNITS[unit]
+
+
+def format_bytes(n):
+    for unit, size in (('GBytes', 2**30), ('MBytes', 2**20), ('KBytes', 2**10)):
+        if n >= size:
+            return f"{n / size:.1f} {unit}"
+    return f"{n:.0f} Bytes"
+
+
+def format_rate(bits):
+    for unit, size in (('Gbits/sec', 1e9), ('Mbits/sec', 1e6), ('Kbits/sec', 1e3)):
+        if bits >= size:
+            return f"{bits / size:.0f} {unit}" if bits / size >= 100 else f"{bits / size:.1f} {unit}"
+    return f"{bits:.0f} bits/sec"
+
+
+def report_line(start, end, n_bytes):
+    return f"[  3] {start:4.1f}-{end:4.1f} sec  {format_bytes(n_bytes):>11}  {format_rate(n_bytes * 8 / (end - start))}"
+
+
+def server_line(start, end, n_bytes, jitter_ms, lost, total):
+    return (f"{report_line(start, end, n_bytes)}  {jitter_ms:6.3f} ms {lost:4d}/{total:6d} "
+            f"({lost / max(total, 1) * 100:.2g}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake iperf 2 UDP client or server.')
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('-c', '--client')
+    mode.add_argument('-s', '--server', action='store_true')
+    parser.add_argument('-u', '--udp', action='store_true')
+    parser.add_argument('-b', '--bandwidth', default='1m')
+    parser.add_argument('-t', '--time', type=float, default=10.0)
+    parser.add_argument('-i', '--interval', type=float, default=1.0)
+    parser.add_argument('-p', '--port', type=int, default=5001)
+    parser.add_argument('--time-scale', type=float, default=1.0,
+                        help='Wall seconds per reported second (default: 1).')
+    parser.add_argument('--jitter', type=float, default=0.02, help='Rate fluctuation per interval (fraction).')
+    parser.add_argument('--rate', default='230m', help='Server: rate the simulated link delivers (default: 230m).')
+    parser.add_argument('--loss', type=float, default=0.0, help='Server: fraction of datagrams lost (default: 0).')
+    args = parser.parse_args()
+
+    stop = []
+    for sig in (signal.SIGINT, signal.SIGHUP, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.append(True))
+
+    print('-' * 60)
+    if args.server:
+        rate = parse_rate(args.rate)
+        print(f"Server listening on UDP port {args.port}")
+        print(f"Receiving {DATAGRAM_BYTES} byte datagrams")
+    else:
+        rate = parse_rate(args.bandwidth)
+        print(f"Client connecting to {args.client}, UDP port {args.port}")
+        print(f"Sending {DATAGRAM_BYTES} byte datagrams, IPG target: 51.13 us (kalman adjust)")
+    print("UDP buffer size:  208 KByte (default)")
+    print('-' * 60)
+    if args.server:
+        print(f"[  3] local 127.0.0.1 port {args.port} connected with 192.168.50.66 port 41234")
+        print("[ ID] Interval       Transfer     Bandwidth        Jitter   Lost/Total Datagrams", flush=True)
+    else:
+        print(f"[  3] local 127.0.0.1 port 41234 connected with {args.client} port {args.port}")
+        print("[ ID] Interval       Transfer     Bandwidth", flush=True)
+
+    started = time.monotonic()
+    t = 0.0
+    total = 0.0
+    lost_total = 0
+    sent_total = 0
+    while not stop and t < args.time:
+        # Sleep in short steps so a signal ends the run promptly.
+        deadline = started + (t + args.interval) * args.time_scale
+        while not stop and time.monotonic() < deadline:
+            time.sleep(min(0.05, max(deadline - time.monotonic(), 0)))
+        if stop:
+            break
+        n_bytes = rate / 8 * args.interval * max(1 + random.gauss(0, args.jitter), 0)
+        if args.server:
+            received = int(n_bytes // DATAGRAM_BYTES)
+            sent = round(received / (1 - args.loss)) if args.loss < 1 else received
+            lost = min(round((sent - received) * max(1 + random.gauss(0, 0.2), 0)), sent)
+            received = sent - lost
+            n_bytes = received * DATAGRAM_BYTES
+            lost_total += lost
+            sent_total += sent
+            print(server_line(t, t + args.interval, n_bytes, abs(random.gauss(0.02, 0.01)), lost, sent), flush=True)
+        else:
+            print(report_line(t, t + args.interval, n_bytes), flush=True)
+        total += n_bytes
+        t += args.interval
+    if args.server:
+        if t > 0:
+            print(server_line(0.0, t, total, 0.02, lost_total, sent_total), flush=True)
+        return
+    if t > 0:
+        print(report_line(0.0, t, total))
+    print(f"[  3] Sent {int(total // DATAGRAM_BYTES)} datagrams", flush=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
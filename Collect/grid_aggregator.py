@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Streaming per-cell aggregation for heatmap campaigns. Every record updates count, sum, sum of
+squares and a last-N window of each metric for its (RAT, gain_4g, gain_5g, noise) cell, so the
+grid file heat_map.py plots is ready the moment the sweep ends, without rescanning raw data.
+
+Grid file: CSV, one row per (cell, metric) with GRID_COLUMNS; `tail` and `tail_ts` hold the
+last-N values and their epoch-ns timestamps joined by ';'.
+"""
+import os
+import math
+import threading
+from collections import deque
+
+import pandas as pd
+
+DEFAULT_GRID_METRICS = ['avg_rate_mbps', 'instant_rate_mbps']
+DEFAULT_TAIL_N = 10
+GRID_KEYS = ['RAT', 'gain_4g', 'gain_5g', 'noise']
+GRID_COLUMNS = GRID_KEYS + ['metric', 'count', 'sum', 'sumsq', 'mean', 'std', 'tail_mean', 'tail', 'tail_ts']
+
+
+def default_grid_file(output_file):
+    return os.path.splitext(output_file)[0] + '.grid.csv'
+
+
+class _CellStats:
+    __slots__ = ('count', 'total', 'total_sq', 'tail', 'tail_ts')
+
+    def __init__(self, tail_n):
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.tail = deque(maxlen=tail_n)
+        self.tail_ts = deque(maxlen=tail_n)
+
+    def add(self, ts_ns, value):
+        self.count += 1
+        self.total += value
+        self.total_sq += value * value
+        self.tail.append(value)
+        self.tail_ts.append(ts_ns)
+
+
+class GridAggregator:
+    """Thread-safe: the rx worker calls add() while the sweep thread writes the grid file."""
+
+    def __init__(self, metrics=DEFAULT_GRID_METRICS, tail_n=DEFAULT_TAIL_N):
+        self.metrics = list(metrics)
+        self.tail_n = tail_n
+        self._lock = threading.Lock()
+        self._cells = {}  # {(RAT, gain_4g, gain_5g, noise): [_CellStats per metric]}
+
+    def add(self, rat, gain_4g, gain_5g, noise, ts_ns, values):
+        """values: metric values in self.metrics order; records without gain_5g/noise are ignored."""
+        if gain_5g is None or noise is None:
+            return
+        key = (rat, gain_4g, gain_5g, noise)
+        with self._lock:
+            cell = self._cells.get(key)
+            if cell is None:
+                cell = self._cells[key] = [_CellStats(self.tail_n) for _ in self.metrics]
+            for stats, value in zip(cell, values):
+                if value is not None and value == value:  # skip None and NaN
+                    stats.add(ts_ns, value)
+
+    def __len__(self):
+        return len(self._cells)
+
+    def to_frame(self):
+        rows = []
+        with self._lock:
+            for (rat, gain_4g, gain_5g, noise), cell in self._cells.items():
+                for metric, stats in zip(self.metrics, cell):
+                    if not stats.count:
+                        continue
+                    mean = stats.total / stats.count
+                    var = (stats.total_sq - stats.total * mean) / (stats.count - 1) if stats.count > 1 else 0.0
+                    rows.append((rat, gain_4g, gain_5g, noise, metric, stats.count, stats.total, stats.total_sq,
+                                 mean, math.sqrt(max(var, 0.0)), sum(stats.tail) / len(stats.tail),
+                                 ';'.join(repr(v) for v in stats.tail), ';'.join(str(t) for t in stats.tail_ts)))
+        return pd.DataFrame(rows, columns=GRID_COLUMNS)
+
+    def load(self, path):
+        """Restore cells from an existing grid file (used when resuming a sweep); returns the number of cells."""
+        try:
+            grid = pd.read_csv(path, dtype={'tail': str, 'tail_ts': str}, keep_default_na=False,
+                               float_precision='round_trip')
+        except FileNotFoundError:
+            return 0
+        with self._lock:
+            for row in grid.itertuples(index=False):
+                if row.metric not in self.metrics:
+                    continue
+                key = (row.RAT, row.gain_4g, row.gain_5g, row.noise)
+                cell = self._cells.get(key)
+                if cell is None:
+                    cell = self._cells[key] = [_CellStats(self.tail_n) for _ in self.metrics]
+                stats = cell[self.metrics.index(row.metric)]
+                stats.count, stats.total, stats.total_sq = int(row.count), float(row.sum), float(row.sumsq)
+                stats.tail.extend(float(v) for v in row.tail.split(';') if v)
+                stats.tail_ts.extend(int(t) for t in row.tail_ts.split(';') if t)
+        return len(self._cells)
+
+    def write(self, path):
+        """Write the grid file atomically."""
+        tmp = path + '.tmp'
+        self.to_frame().to_csv(tmp, index=False)
+        os.replace(tmp, path)
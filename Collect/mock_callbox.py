@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the callbox WebSocket API, for exercising the collectors without hardware.
+Answers `ue_get` with a synthetic `ue_list` (NR UEs with qos_flow_list, LTE UEs with erab_list)
+or with recorded ue_get responses, and applies `rf_gain` / `noise_level` to a link model, so
+heatmap sweeps can be rehearsed. Response delay and maximum response rate are configurable.
+"""
+import asyncio
+import argparse
+import gzip
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def load_replay(path):
+    """
+    Recorded ue_get responses, one JSON object per line (optionally .gz). Lines without a
+    ue_list (other messages, capture headers) are skipped; a line may also wrap the response
+    as {"message": "<raw JSON text>"} or, as raw_capture.py writes it, {"ts": ..., "message": {...}}.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    responses = []
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if isinstance(entry.get('message'), str) and entry['message'].startswith('{'):
+                entry = json.loads(entry['message'])
+            elif isinstance(entry.get('message'), dict):
+                entry = entry['message']
+            if entry.get('ue_list'):
+                responses.append(entry)
+    if not responses:
+        raise ValueError(f"No ue_get responses with a ue_list in {path}")
+    return responses
+
+
+class MockUE:
+    """Per-UE link state: RAT, id, path offset against the cell's link budget, byte counter."""
+
+    __slots__ = ('rat', 'ue_id', 'offset_db', 'attached', 'total_bytes', 'rate_mbps')
+
+    def __init__(self, rat, ue_id, offset_db):
+        self.rat = rat
+        self.ue_id = ue_id
+        self.offset_db = offset_db
+        self.attached = True
+        self.total_bytes = 0.0
+        self.rate_mbps = 0.0
+
+
+class MockCallbox:
+    """
+    Synthetic UE state for one callbox; n_nr NR UEs followed by n_lte LTE UEs.
+
+    Link model: the highest noise level a UE survives rises linearly with its RAT's gain
+    (max_noise = -120 + (gain - 40) * 2.2 + offset, gain_5g for NR and gain_4g for LTE); each
+    UE gets a fixed offset drawn from +-ue_spread_db. Throughput falls off over the last
+    `fade_db` dB before that edge and fluctuates by `jitter` (fraction of the rate). A link that
+    drops stays down until the margin is back above `reattach_margin_db`, like a UE that has
+    to re-attach. With `replay`, ue_get is answered from recorded responses in a loop instead.
+    """
+
+    def __init__(self, n_nr=1, n_lte=0, rate_mbps=200.0, fade_db=20.0, reattach_margin_db=10.0,
+                 ue_spread_db=0.0, jitter=0.0, replay=None, seed=0):
+        self.rate_mbps = rate_mbps
+        self.fade_db = fade_db
+        self.reattach_margin_db = reattach_margin_db
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.ues = ([MockUE('NR', i + 1, self.rng.uniform(-ue_spread_db, ue_spread_db)) for i in range(n_nr)] +
+                    [MockUE('LTE', 1000 + i, self.rng.uniform(-ue_spread_db, ue_spread_db)) for i in range(n_lte)])
+        self.replay = load_replay(replay) if isinstance(replay, str) else replay
+        self.start = time.monotonic()
+        self.requests = 0
+        self.gain_4g = 90
+        self.gain_5g = 90
+        self.noise = -120.0
+        self._last_update = self.start
+        self.advance()
+
+    @property
+    def n_nr(self):
+        return sum(1 for ue in self.ues if ue.rat == 'NR')
+
+    @property
+    def n_lte(self):
+        return len(self.ues) - self.n_nr
+
+    @property
+    def attached(self):
+        return all(ue.attached for ue in self.ues)
+
+    def margin_db(self, ue=None):
+        gain = self.gain_4g if ue is not None and ue.rat == 'LTE' else self.gain_5g
+        return (-120 + (gain - 40) * 2.2 + (ue.offset_db if ue is not None else 0.0)) - self.noise
+
+    def _ue_rate_mbps(self, ue):
+        margin = self.margin_db(ue)
+        if ue.attached and margin < 0:
+            ue.attached = False
+        elif not ue.attached and margin >= self.reattach_margin_db:
+            ue.attached = True
+        if not ue.attached:
+            return 0.0
+        rate = self.rate_mbps * min(margin / self.fade_db, 1.0) if self.fade_db > 0 else self.rate_mbps
+        if self.jitter:
+            rate *= max(1.0 + self.rng.gauss(0.0, self.jitter), 0.0)
+        return rate
+
+    def link_rate_mbps(self):
+        """Mean current rate over all UEs."""
+        self.advance()
+        return sum(ue.rate_mbps for ue in self.ues) / len(self.ues) if self.ues else 0.0
+
+    def advance(self):
+        """Accumulate bytes since the last update at each UE's current rate, then re-evaluate the link."""
+        now = time.monotonic()
+        dt = now - self._last_update
+        self._last_update = now
+        for ue in self.ues:
+            ue.total_bytes += ue.rate_mbps * 125_000 * dt
+            ue.rate_mbps = self._ue_rate_mbps(ue)
+
+    def ue_list(self):
+        if self.replay:
+            return self.replay[self.requests % len(self.replay)]['ue_list']
+        self.advance()
+        ues = []
+        for ue in self.ues:
+            cell = {'dl_bitrate': ue.rate_mbps * 1_000_000, 'cqi': 15 if ue.attached else 0, 'dl_mcs': 27,
+                    'ul_mcs': 20, 'epre': -80.0, 'ul_path_loss': 60.0 - ue.offset_db, 'p_ue': 10.0,
+                    'pusch_snr': 25.0, 'ul_n_layer': 1}
+            if ue.rat == 'NR':
+                cell.update(ri=2, ul_rank=1, ul_phr=20)
+                ues.append({'ran_ue_id': ue.ue_id, 'cells': [cell],
+                            'qos_flow_list': [{'dl_total_bytes': int(ue.total_bytes)}]})
+            else:
+                cell.update(pucch1_snr=20.0)
+                ues.append({'enb_ue_id': ue.ue_id, 'cells': [cell],
+                            'erab_list': [{'dl_total_bytes': int(ue.total_bytes)}]})
+        return ues
+
+    def handle(self, request):
+        message = request.get('message')
+        if message == 'ue_get':
+            response = {'message': 'ue_get', 'message_id': request.get('message_id'), 'ue_list': self.ue_list()}
+            self.requests += 1
+            return response
+        if message in ('rf_gain', 'noise_level'):
+            # Bytes up to now were carried at the old link state.
+            self.advance()
+            if message == 'rf_gain':
+                self.gain_4g, self.gain_5g = request['tx_gain'][0], request['tx_gain'][1]
+            else:
+                self.noise = request['noise_level']
+            self.advance()
+        return {'message': message, 'message_id': request.get('message_id')}
+
+
+async def serve(host='127.0.0.1', port=9001, response_delay_ms=0.0, max_rate_hz=None, **callbox_kwargs):
+    """
+    Start one mock callbox server; returns (server, callbox). Every response is delayed by
+    response_delay_ms, and ue_get responses are paced to at most max_rate_hz per server.
+    """
+    callbox = MockCallbox(**callbox_kwargs)
+    min_gap = 1.0 / max_rate_hz if max_rate_hz else 0.0
+    next_slot = [0.0]
+
+    async def handler(ws):
+        loop = asyncio.get_running_loop()
+        try:
+            async for raw in ws:
+                request = json.loads(raw)
+                if min_gap and request.get('message') == 'ue_get':
+                    slot = max(next_slot[0], loop.time())
+                    next_slot[0] = slot + min_gap
+                    await asyncio.sleep(slot - loop.time())
+                if response_delay_ms:
+                    await asyncio.sleep(response_delay_ms / 1000)
+                await ws.send(json.dumps(callbox.handle(request)))
+        except websockets.ConnectionClosed:
+            pass
+
+    server = await websockets.serve(handler, host, port, max_size=None)
+    return server, callbox
+
+
+async def run_collector_scale_test(n_endpoints=50, duration=10.0, n_ues=4, poll_interval=1.0, keep=False):
+    """
+    Start n_endpoints mock callboxes on local ports, point one AsyncCollector at all of them,
+    and report how many records each endpoint delivered versus the expected polling rate.
+    The collector output is removed afterwards unless keep is set.
+    """
+    from Collect.async_collector import AsyncCollector
+
+    servers = [await serve('127.0.0.1', 0, n_nr=n_ues) for _ in range(n_endpoints)]
+    urls = [f"ws://127.0.0.1:{s.sockets[0].getsockname()[1]}/" for s, _ in servers]
+    out_dir = tempfile.mkdtemp(prefix='collector_scale_')
+    collector = AsyncCollector(urls, os.path.join(out_dir, 'scale.csv'), poll_interval=poll_interval,
+                               time_limit=duration)
+    try:
+        started = time.perf_counter()
+        await collector.run()
+        elapsed = time.perf_counter() - started
+    finally:
+        for server, _ in servers:
+            server.close()
+            await server.wait_closed()
+        if not keep:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    expected = duration / poll_interval * n_ues
+    counts = [endpoint.monitor.record_count for endpoint in collector.endpoints]
+    print(f"{n_endpoints} endpoints x {n_ues} UEs for {elapsed:.1f}s in one process")
+    print(f"records per endpoint: min {min(counts)}, max {max(counts)}, expected ~{expected:.0f}")
+    kept = f", output kept in {out_dir}" if keep else ''
+    print(f"total {sum(counts)} records ({sum(counts) / elapsed:.0f}/s){kept}")
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mock callbox WebSocket server.')
+    parser.add_argument('--port', type=int, default=9001, help='Port to listen on (default: 9001).')
+    parser.add_argument('--nr-ues', type=int, default=1, help='Number of NR UEs (default: 1).')
+    parser.add_argument('--lte-ues', type=int, default=0, help='Number of LTE UEs (default: 0).')
+    parser.add_argument('--rate-mbps', type=float, default=200.0, help='Per-UE rate with full link margin (default: 200).')
+    parser.add_argument('--ue-spread-db', type=float, default=0.0,
+                        help='Spread of the per-UE link offset in dB (default: 0, all UEs identical).')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='Throughput fluctuation as a fraction of the rate (default: 0).')
+    parser.add_argument('--response-delay-ms', type=float, default=0.0, help='Delay before every response.')
+    parser.add_argument('--max-rate', type=float, help='Answer at most this many ue_get per second.')
+    parser.add_argument('--replay', type=str,
+                        help='Answer ue_get with recorded responses from this JSONL(.gz) file, in a loop.')
+    parser.add_argument('--scale-test', type=int, metavar='N',
+                        help='Instead of serving, run the asyncio collector against N local mock endpoints.')
+    parser.add_argument('--duration', type=float, default=10.0, help='Scale test duration in seconds.')
+    parser.add_argument('--poll-rate', type=float, default=1.0, help='Scale test ue_get rate in Hz (default: 1).')
+    parser.add_argument('--keep', action='store_true', help='Keep the scale test output instead of deleting it.')
+    args = parser.parse_args()
+
+    if args.scale_test:
+        asyncio.run(run_collector_scale_test(args.scale_test, args.duration, args.nr_ues or 1, 1 / args.poll_rate,
+                                             keep=args.keep))
+    else:
+        async def main():
+            _, callbox = await serve('0.0.0.0', args.port, args.response_delay_ms, args.max_rate,
+                                     n_nr=args.nr_ues, n_lte=args.lte_ues, rate_mbps=args.rate_mbps,
+                                     ue_spread_db=args.ue_spread_db, jitter=args.jitter, replay=args.replay)
+            source = f"{len(callbox.replay)} recorded responses" if callbox.replay else \
+                f"{args.nr_ues} NR + {args.lte_ues} LTE UEs"
+            print(f"Mock callbox listening on ws://0.0.0.0:{args.port}/ ({source})", flush=True)
+            await asyncio.Future()
+        asyncio.run(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Drift-free periodic scheduling on the monotonic clock. Tick k is due at origin + k * period,
+so send time and sleep jitter never accumulate; ticks that are already more than one period
+overdue are skipped and counted instead of being fired in a burst. Schedulers created with
+the same origin share one timebase (polling at 10 Hz and a 1 Hz scenario loop stay aligned).
+"""
+import math
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+
+DEFAULT_POLL_RATE_HZ = 1.0
+SCENARIO_RATE_HZ = 1.0
+
+
+class TickScheduler:
+    """Deadline-based ticks at `rate_hz` from `origin` (a time.monotonic() value, default now)."""
+
+    def __init__(self, rate_hz, origin=None):
+        if rate_hz <= 0:
+            raise ValueError(f"rate_hz must be positive, got {rate_hz}")
+        self.period = 1.0 / rate_hz
+        self.origin = time.monotonic() if origin is None else origin
+        self.tick = 0
+        self.missed = 0
+        self.late_total = 0.0
+        self.late_max = 0.0
+
+    def elapsed(self):
+        return time.monotonic() - self.origin
+
+    def deadline(self):
+        return self.origin + self.tick * self.period
+
+    def _advance(self):
+        """Move to the next tick; returns the seconds to wait for it (0 if it is due)."""
+        self.tick += 1
+        now = time.monotonic()
+        overdue = now - self.deadline()
+        if overdue > self.period:
+            skipped = math.floor(overdue / self.period)
+            self.tick += skipped
+            self.missed += skipped
+            overdue = now - self.deadline()
+        return max(-overdue, 0.0)
+
+    def _fired(self):
+        late = time.monotonic() - self.deadline()
+        if late > 0:
+            self.late_total += late
+            self.late_max = max(self.late_max, late)
+
+    def wait(self):
+        """Block until the next tick is due."""
+        delay = self._advance()
+        if delay:
+            time.sleep(delay)
+        self._fired()
+        return self.tick
+
+    async def wait_async(self):
+        """asyncio version of wait()."""
+        delay = self._advance()
+        if delay:
+            await asyncio.sleep(delay)
+        self._fired()
+        return self.tick
+
+    def summary(self):
+        fired = self.tick + 1 - self.missed
+        avg_ms = self.late_total / fired * 1000 if fired else 0
+        return (f"{fired} ticks at {1 / self.period:g} Hz, {self.missed} missed, "
+                f"wake-up lateness avg {avg_ms:.1f} ms / max {self.late_max * 1000:.1f} ms")
+
+
+class PollStats:
+    """
+    Request/response latency of ue_get polls for one endpoint. Each request carries a
+    sequence number in its message_id; responses are matched back by that id. Requests are
+    sent by the polling thread and responses recorded by the rx worker, so state is locked.
+    """
+
+    def __init__(self, prefix, window=1000, max_outstanding=100):
+        self.prefix = prefix
+        self.requests = 0
+        self.responses = 0
+        self.unmatched = 0
+        self.latencies = deque(maxlen=window)
+        self.latency_max = 0.0
+        self.max_outstanding = max_outstanding
+        self._outstanding = OrderedDict()  # {seq: send time (monotonic)}
+        self._lock = threading.Lock()
+
+    def next_message_id(self):
+        with self._lock:
+            seq = self.requests
+            self.requests += 1
+            self._outstanding[seq] = time.monotonic()
+            if len(self._outstanding) > self.max_outstanding:
+                self._outstanding.popitem(last=False)
+        return f"{self.prefix}:{seq}"
+
+    def response(self, message_id, received=None):
+        """Record the response to message_id, received at time.monotonic() value `received`."""
+        prefix, _, seq = str(message_id).rpartition(':')
+        if received is None:
+            received = time.monotonic()
+        with self._lock:
+            sent = self._outstanding.pop(int(seq), None) if prefix == self.prefix and seq.isdigit() else None
+            if sent is None:
+                self.unmatched += 1
+                return None
+            latency = received - sent
+            self.responses += 1
+            self.latencies.append(latency)
+            self.latency_max = max(self.latency_max, latency)
+        return latency
+
+    @property
+    def outstanding(self):
+        with self._lock:
+            return len(self._outstanding)
+
+    def summary(self):
+        with self._lock:
+            requests, responses, outstanding = self.requests, self.responses, len(self._outstanding)
+            ordered = sorted(self.latencies)
+            latency_max = self.latency_max
+        if not ordered:
+            return f"{requests} requests, no responses"
+        p95 = ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+        return (f"{requests} requests, {responses} responses, {outstanding} unanswered; "
+                f"latency avg {sum(ordered) / len(ordered) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, "
+                f"max {latency_max * 1000:.1f} ms")
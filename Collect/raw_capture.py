@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Raw capture of received WebSocket frames, so records can be re-derived later with new
+extraction logic instead of repeating a drive test.
+
+File format: JSONL, one frame per line as {"ts":<epoch ns>,"message":<raw frame>}. The monitor's
+record labels (gain_4g, gain_5g, noise) are interleaved as {"ts":<epoch ns>,"state":{...}} lines
+whenever they change and at the start of every block, so a replay labels each frame exactly as
+the live run did, also when it starts mid-capture. Lines are compressed
+in independent gzip members of about `block_bytes` uncompressed bytes each. The file is a
+valid .gz (gzip/zcat read it as a whole); the sidecar <file>.idx holds one JSON line per
+block with its byte offset, compressed length, first/last timestamp and frame count, so a
+reader can seek to a time range and decompress blocks in parallel.
+
+    python Collect/raw_capture.py info run.capture.jsonl.gz
+    python Collect/raw_capture.py replay run.capture.jsonl.gz -o rederived.csv [--speed 1]
+    python Collect/raw_capture.py synth bench.capture.jsonl.gz --frames 20000 --ues 16
+"""
+import os
+import sys
+import json
+import time
+import gzip
+import zlib
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_BLOCK_BYTES = 1 << 20
+DEFAULT_LEVEL = 3
+DEFAULT_READ_WORKERS = 4
+
+_TS_PREFIX = b'{"ts":'
+_MESSAGE_PREFIX = b',"message":'
+_STATE_PREFIX = b',"state":'
+
+
+def default_capture_file(output_file):
+    return os.path.splitext(output_file)[0] + '.capture.jsonl.gz'
+
+
+def index_file(path):
+    return path + '.idx'
+
+
+class RawCaptureWriter:
+    """
+    Appends (ts_ns, raw frame) lines to a block-compressed capture. Not thread-safe: the
+    collector calls write() from its single processing worker.
+    """
+
+    def __init__(self, path, block_bytes=DEFAULT_BLOCK_BYTES, level=DEFAULT_LEVEL):
+        self.path = path
+        self.block_bytes = block_bytes
+        self.level = level
+        # Appending keeps earlier blocks valid; offsets continue from the current file size.
+        self._file = open(path, 'ab')
+        self._index = open(index_file(path), 'a', encoding='utf-8')
+        self._lines = []
+        self._size = 0
+        self._first_ts = self._last_ts = None
+        self._block_frames = 0
+        self._state = None
+        self.frames = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+
+    def write(self, ts_ns, message):
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        # Newlines can only be insignificant whitespace in valid JSON; keep one frame per line.
+        if b'\n' in message:
+            message = message.replace(b'\n', b' ')
+        self._append(ts_ns, b'%s%d%s%s}\n' % (_TS_PREFIX, ts_ns, _MESSAGE_PREFIX, message))
+        self._block_frames += 1
+        if self._size >= self.block_bytes:
+            self.flush()
+
+    def write_state(self, ts_ns, state):
+        """Record the labels (dict of gain_4g, gain_5g, noise) applied to the frames that follow."""
+        self._state = json.dumps(state, separators=(',', ':')).encode('utf-8')
+        # An empty block gets the state as its first line anyway, with the next frame.
+        if self._lines:
+            self._append(ts_ns, self._state_line(ts_ns))
+
+    def _state_line(self, ts_ns):
+        return b'%s%d%s%s}\n' % (_TS_PREFIX, ts_ns, _STATE_PREFIX, self._state)
+
+    def _append(self, ts_ns, line):
+        if not self._lines:
+            self._first_ts = ts_ns
+            # Every block starts with the labels in force, so it can be replayed on its own.
+            if self._state is not None:
+                self._lines.append(self._state_line(ts_ns))
+                self._size += len(self._lines[-1])
+        self._last_ts = ts_ns
+        self._lines.append(line)
+        self._size += len(line)
+
+    def flush(self):
+        """Compress the pending lines as one gzip member and index it."""
+        if not self._lines:
+            return
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        data = compressor.compress(b''.join(self._lines)) + compressor.flush()
+        offset = self._file.tell()
+        self._file.write(data)
+        self._file.flush()
+        self._index.write(json.dumps({'offset': offset, 'length': len(data), 'first_ts': self._first_ts,
+                                      'last_ts': self._last_ts, 'frames': self._block_frames,
+                                      'raw_bytes': self._size}) + '\n')
+        self._index.flush()
+        self.frames += self._block_frames
+        self.raw_bytes += self._size
+        self.compressed_bytes += len(data)
+        self._lines = []
+        self._size = 0
+        self._block_frames = 0
+        self._first_ts = self._last_ts = None
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        self._index.close()
+
+    def summary(self):
+        ratio = self.raw_bytes / self.compressed_bytes if self.compressed_bytes else 0.0
+        return (f"{self.frames} frames, {self.raw_bytes / 2**20:.1f} MB raw -> "
+                f"{self.compressed_bytes / 2**20:.1f} MB ({ratio:.1f}x)")
+
+
+def _parse_line(line):
+    """
+    (ts_ns, raw frame bytes, None) or, for a state line, (ts_ns, None, state dict) from one
+    capture line; frames are sliced without a JSON parse.
+    """
+    line = line.rstrip(b'\n')
+    comma = line.index(b',', len(_TS_PREFIX))
+    ts_ns = int(line[len(_TS_PREFIX):comma])
+    if line.startswith(_STATE_PREFIX, comma):
+        return ts_ns, None, json.loads(line[comma + len(_STATE_PREFIX):-1])
+    return ts_ns, line[comma + len(_MESSAGE_PREFIX):-1], None
+
+
+def _split_frames(data):
+    """[(ts_ns, raw frame bytes or None, state or None)] from the decompressed lines of one block."""
+    return [_parse_line(line) for line in data.split(b'\n') if line]
+
+
+class CaptureReader:
+    """Reads a capture block by block; uses the sidecar index when present."""
+
+    def __init__(self, path):
+        self.path = path
+        self.blocks = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(index_file(self.path), encoding='utf-8') as f:
+                blocks = [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return None
+        # A block whose index line was written but whose data was cut off by a crash is ignored.
+        size = os.path.getsize(self.path)
+        return [b for b in blocks if b['offset'] + b['length'] <= size]
+
+    @property
+    def frame_count(self):
+        return sum(b['frames'] for b in self.blocks) if self.blocks is not None else None
+
+    def frames(self, start_ns=None, end_ns=None, workers=DEFAULT_READ_WORKERS):
+        """Yield (ts_ns, raw frame bytes) in capture order, limited to [start_ns, end_ns]."""
+        for ts_ns, message, _ in self.entries(start_ns, end_ns, workers):
+            if message is not None:
+                yield ts_ns, message
+
+    def entries(self, start_ns=None, end_ns=None, workers=DEFAULT_READ_WORKERS):
+        """
+        Yield (ts_ns, raw frame bytes, None) and (ts_ns, None, state) in capture order, limited
+        to [start_ns, end_ns]; the last state before start_ns comes first. Indexed blocks outside
+        the range are skipped without reading (each block starts with its state); the others
+        are decompressed by `workers` threads (zlib releases the GIL) a few blocks ahead.
+        """
+        if self.blocks is None:
+            yield from _select(self._entries_sequential(), start_ns, end_ns)
+            return
+        yield from _select(self._entries_indexed(start_ns, end_ns, workers), start_ns, end_ns)
+
+    def _entries_indexed(self, start_ns, end_ns, workers):
+        blocks = [b for b in self.blocks
+                  if (start_ns is None or b['last_ts'] >= start_ns) and (end_ns is None or b['first_ts'] <= end_ns)]
+        with ThreadPoolExecutor(max(workers, 1)) as pool:
+            pending = deque()
+            blocks = iter(blocks)
+            for block in blocks:
+                pending.append(pool.submit(self._read_block_at, block))
+                if len(pending) >= 2 * workers:
+                    break
+            while pending:
+                data = pending.popleft().result()
+                block = next(blocks, None)
+                if block is not None:
+                    pending.append(pool.submit(self._read_block_at, block))
+                yield from _split_frames(data)
+
+    def _read_block_at(self, block):
+        # Each worker opens its own handle so seeks do not interfere.
+        with open(self.path, 'rb') as f:
+            f.seek(block['offset'])
+            return zlib.decompress(f.read(block['length']), 31)
+
+    def _entries_sequential(self):
+        """Fallback without an index: one pass over the concatenated gzip members."""
+        with gzip.open(self.path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield _parse_line(line)
+
+
+def _select(entries, start_ns, end_ns):
+    """Entries within [start_ns, end_ns], preceded by the last state seen before start_ns."""
+    earlier_state = None
+    for entry in entries:
+        ts_ns = entry[0]
+        if start_ns is not None and ts_ns < start_ns:
+            if entry[2] is not None:
+                earlier_state = entry
+            continue
+        if end_ns is not None and ts_ns > end_ns:
+            continue
+        if earlier_state is not None:
+            yield earlier_state
+            earlier_state = None
+        yield entry
+
+
+def replay_capture(monitor, path, speed=None, start_ns=None, end_ns=None):
+    """
+    Feed a capture through `monitor`'s receive queue and processing worker, exactly as
+    on_message would but keeping the captured receive timestamps; puts block instead of
+    dropping. Captured state lines are queued in order with the frames, so the worker labels
+    each record with the gain_4g/gain_5g/noise of the live run. speed=None replays as fast
+    as possible, otherwise at `speed` x real time. Returns (frames, raw bytes, seconds).
+    """
+    monitor.sink.start()
+    monitor.start_processing()
+    frames = raw_bytes = 0
+    started = time.perf_counter()
+    origin = None
+    for ts_ns, message, state in CaptureReader(path).entries(start_ns, end_ns):
+        if state is not None:
+            monitor.rx_queue.put((ts_ns, None, state))
+            continue
+        if speed:
+            if origin is None:
+                origin = (ts_ns, time.monotonic())
+            delay = origin[1] + (ts_ns - origin[0]) / 1e9 / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        monitor.rx_queue.put((ts_ns, time.monotonic(), message))
+        frames += 1
+        raw_bytes += len(message)
+    monitor.stop_processing()
+    elapsed = time.perf_counter() - started
+    monitor.save_data()
+    return frames, raw_bytes, elapsed
+
+
+def synthesize_capture(path, n_frames=20000, n_ues=16, interval=1.0):
+    """Write a capture of n_frames mock ue_get responses, `interval` seconds apart."""
+    from Collect.mock_callbox import MockCallbox
+    callbox = MockCallbox(n_nr=n_ues - n_ues // 4, n_lte=n_ues // 4, jitter=0.05)
+    writer = RawCaptureWriter(path)
+    ts_ns = time.time_ns()
+    for i in range(n_frames):
+        response = callbox.handle({'message': 'ue_get', 'message_id': f'ue_monitor_script:{i}'})
+        writer.write(ts_ns + int(i * interval * 1e9), json.dumps(response))
+    writer.close()
+    return writer
+
+
+def _parse_time(value):
+    """Epoch seconds or 'YYYY-mm-dd HH:MM:SS' local time -> epoch ns."""
+    if value is None:
+        return None
+    try:
+        return int(float(value) * 1e9)
+    except ValueError:
+        return int(time.mktime(time.strptime(value, '%Y-%m-%d %H:%M:%S')) * 1e9)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect, replay or synthesize raw ue_get captures.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_info = sub.add_parser('info', help='Blocks, frames, time range and compression of a capture.')
+    p_info.add_argument('capture')
+
+    p_replay = sub.add_parser('replay', help='Re-derive records from a capture with the current extraction logic.')
+    p_replay.add_argument('capture')
+    p_replay.add_argument('-o', '--output-file', help='Output file (default: <capture>.replay.csv).')
+    p_replay.add_argument('--speed', type=float,
+                          help='Replay at this multiple of real time (default: as fast as possible).')
+    p_replay.add_argument('--start', help='First receive time, epoch seconds or "YYYY-mm-dd HH:MM:SS".')
+    p_replay.add_argument('--end', help='Last receive time, epoch seconds or "YYYY-mm-dd HH:MM:SS".')
+    p_replay.add_argument('--sink-format', choices=['csv', 'binary'], default='csv')
+    p_replay.add_argument('--read-only', action='store_true',
+                          help='Only decompress and split frames, to measure reader throughput.')
+
+    p_synth = sub.add_parser('synth', help='Write a capture of mock callbox responses for benchmarking.')
+    p_synth.add_argument('capture')
+    p_synth.add_argument('--frames', type=int, default=20000)
+    p_synth.add_argument('--ues', type=int, default=16)
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        reader = CaptureReader(args.capture)
+        if reader.blocks is None:
+            print(f"{args.capture}: no index, {sum(1 for _ in reader.frames())} frames")
+        else:
+            blocks = reader.blocks
+            raw = sum(b['raw_bytes'] for b in blocks)
+            packed = sum(b['length'] for b in blocks)
+            print(f"{args.capture}: {len(blocks)} blocks, {reader.frame_count} frames, "
+                  f"{raw / 2**20:.1f} MB raw / {packed / 2**20:.1f} MB compressed ({raw / max(packed, 1):.1f}x)")
+            if blocks:
+                fmt = lambda ns: time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ns / 1e9))
+                print(f"time range: {fmt(blocks[0]['first_ts'])} - {fmt(blocks[-1]['last_ts'])}")
+    elif args.command == 'synth':
+        writer = synthesize_capture(args.capture, args.frames, args.ues)
+        print(f"{args.capture}: {writer.summary()}")
+    elif args.read_only:
+        started = time.perf_counter()
+        frames = raw_bytes = 0
+        for _, message in CaptureReader(args.capture).frames(_parse_time(args.start), _parse_time(args.end)):
+            frames += 1
+            raw_bytes += len(message)
+        elapsed = time.perf_counter() - started
+        print(f"{frames} frames, {raw_bytes / 2**20:.1f} MB in {elapsed:.2f}s "
+              f"({raw_bytes / 2**20 / elapsed:.0f} MB/s, {frames / elapsed:.0f} frames/s)")
+    else:
+        from Collect.record_sink import create_sink
+        from Collect.ue_monitor import UEMonitor
+        output = args.output_file or args.capture.split('.capture')[0] + '.replay.csv'
+        monitor = UEMonitor(None, output, sink=create_sink(args.sink_format, output, fsync='never'))
+        frames, raw_bytes, elapsed = replay_capture(monitor, args.capture, args.speed,
+                                                    _parse_time(args.start), _parse_time(args.end))
+        print(f"Replayed {frames} frames ({raw_bytes / 2**20:.1f} MB) in {elapsed:.2f}s: "
+              f"{raw_bytes / 2**20 / elapsed:.0f} MB/s, {monitor.record_count / elapsed:.0f} records/s")
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Compact record path for the collectors. UE updates are written straight into typed,
+preallocated column arrays (one chunk of `chunk_rows` rows at a time) instead of building
+a dict per record; full chunks are handed to the record sink, which converts them to
+CSV_HEADER-compatible output on its writer thread. Timestamps are integer epoch nanoseconds
+until they are written.
+
+Run this module to benchmark records/sec of the old dict path against this one:
+    python Collect/record_buffer.py --frames 2000 --ues 16
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+from array import array
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Collect.record_sink import CSV_HEADER
+
+DEFAULT_CHUNK_ROWS = 100
+DEFAULT_FLUSH_MS = 1000
+
+RAT_NAMES = ['NR', 'LTE']
+RAT_NR = 0
+RAT_LTE = 1
+
+INT_COLUMNS = ['timestamp', 'ue_id', 'total_dl_bytes']
+FLOAT_COLUMNS = [c for c in CSV_HEADER if c not in INT_COLUMNS and c != 'RAT']
+
+# Cell fields copied as-is for each RAT; everything else stays NaN (written as an empty CSV field).
+NR_CELL_FIELDS = ['epre', 'ul_path_loss', 'p_ue', 'ul_phr', 'pusch_snr', 'cqi', 'ri', 'dl_mcs', 'ul_mcs',
+                  'ul_n_layer', 'ul_rank', 'dl_retx', 'ul_retx', 'dl_err', 'ul_err']
+LTE_CELL_FIELDS = ['epre', 'ul_path_loss', 'p_ue', 'pucch1_snr', 'pusch_snr', 'cqi', 'dl_mcs', 'ul_mcs',
+                   'ul_n_layer']
+
+_NAN = float('nan')
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return _NAN
+
+
+def _to_int(value, name):
+    try:
+        as_float = float(value)
+        if as_float == int(as_float):
+            return int(as_float)
+    except (TypeError, ValueError, OverflowError):
+        pass
+    raise ValueError(f"{name} {value!r} is not an integer")
+
+
+class ColumnChunk:
+    """Preallocated typed columns for up to `capacity` records; `n` rows are filled."""
+
+    __slots__ = ('capacity', 'n', 'ints', 'floats', 'rat', 'cell_columns')
+
+    def __init__(self, capacity=DEFAULT_CHUNK_ROWS):
+        self.capacity = capacity
+        self.n = 0
+        zeros = bytes(8 * capacity)
+        self.ints = {col: array('q', zeros) for col in INT_COLUMNS}
+        self.floats = {col: array('d', [_NAN]) * capacity for col in FLOAT_COLUMNS}
+        self.rat = array('b', bytes(capacity))
+        # (column array, cell key) pairs per RAT, so the hot loop does no dict lookups by column name.
+        self.cell_columns = ([(self.floats[f], f) for f in NR_CELL_FIELDS],
+                             [(self.floats[f], f) for f in LTE_CELL_FIELDS])
+
+    def __len__(self):
+        return self.n
+
+    def to_columns(self):
+        """{column: numpy array} in CSV_HEADER order; timestamp stays int64 epoch-ns and RAT is a str array."""
+        n = self.n
+        columns = {}
+        for col in CSV_HEADER:
+            if col in self.ints:
+                columns[col] = np.frombuffer(self.ints[col], dtype='int64')[:n]
+            elif col == 'RAT':
+                columns[col] = np.array(RAT_NAMES, dtype=object)[np.frombuffer(self.rat, dtype='int8')[:n]]
+            else:
+                columns[col] = np.frombuffer(self.floats[col], dtype='float64')[:n]
+        return columns
+
+
+class RecordBuffer:
+    """
+    Fills ColumnChunks from UE updates and passes each chunk to `on_chunk` when it holds
+    `chunk_rows` records or `flush_interval_ms` has passed since the chunk was started.
+    Thread-safe: the rx worker appends while the monitoring loop may call flush().
+    """
+
+    def __init__(self, on_chunk, chunk_rows=DEFAULT_CHUNK_ROWS, flush_interval_ms=DEFAULT_FLUSH_MS):
+        self.on_chunk = on_chunk
+        self.chunk_rows = max(int(chunk_rows), 1)
+        self.flush_interval = flush_interval_ms / 1000
+        self._lock = threading.Lock()
+        self._chunk = ColumnChunk(self.chunk_rows)
+        self._deadline = time.monotonic() + self.flush_interval
+
+    def append(self, rat, ts_ns, ue_id, cell, instant_rate_mbps, avg_rate_mbps, total_dl_bytes,
+               gain_4g, gain_5g, noise):
+        """
+        Add one record. A cell field that is not a number (e.g. '15' or 'n/a') is converted
+        with float() or stored as NaN; a ue_id or byte count that is not an integer raises
+        ValueError before anything is written, so the caller can skip just that UE.
+        """
+        if type(ue_id) is not int:
+            ue_id = _to_int(ue_id, 'ue_id')
+        if type(total_dl_bytes) is not int:
+            total_dl_bytes = _to_int(total_dl_bytes, 'total_dl_bytes')
+        with self._lock:
+            chunk = self._chunk
+            row = chunk.n
+            ints = chunk.ints
+            ints['timestamp'][row] = ts_ns
+            ints['ue_id'][row] = ue_id
+            ints['total_dl_bytes'][row] = total_dl_bytes
+            chunk.rat[row] = rat
+            floats = chunk.floats
+            floats['instant_rate_mbps'][row] = instant_rate_mbps
+            floats['avg_rate_mbps'][row] = avg_rate_mbps
+            floats['gain_4g'][row] = _NAN if gain_4g is None else gain_4g
+            floats['gain_5g'][row] = _NAN if gain_5g is None else gain_5g
+            floats['noise'][row] = _NAN if noise is None else noise
+            get = cell.get
+            for column, key in chunk.cell_columns[rat]:
+                value = get(key)
+                if value is not None:
+                    try:
+                        column[row] = value
+                    except TypeError:
+                        column[row] = _to_float(value)
+            chunk.n = row + 1
+            if chunk.n >= self.chunk_rows or time.monotonic() >= self._deadline:
+                self._hand_off_locked()
+
+    def flush(self, force=True):
+        """Hand off the partly filled chunk (only once the flush interval has passed unless force)."""
+        with self._lock:
+            if self._chunk.n and (force or time.monotonic() >= self._deadline):
+                self._hand_off_locked()
+
+    def _hand_off_locked(self):
+        chunk = self._chunk
+        self._chunk = ColumnChunk(self.chunk_rows)
+        self._deadline = time.monotonic() + self.flush_interval
+        self.on_chunk(chunk)
+
+
+def _legacy_extract(ue_list, timestamp, ue_states, out, stream):
+    """The dict-per-record extraction this module replaces, kept as the benchmark baseline."""
+    for ue in ue_list:
+        nr = 'ran_ue_id' in ue
+        ue_id = ue['ran_ue_id'] if nr else ue['enb_ue_id']
+        cell = ue.get('cells', [{}])[0]
+        total_dl_bytes = 0
+        if nr:
+            for qos_flow in ue.get('qos_flow_list', []):
+                total_dl_bytes += int(qos_flow.get('dl_total_bytes', 0))
+        else:
+            for erab in ue.get('erab_list', []):
+                if erab.get('dl_total_bytes', 0) > 0:
+                    total_dl_bytes = erab['dl_total_bytes']
+                    break
+        avg_rate = 0
+        if ue_id in ue_states:
+            last = ue_states[ue_id]
+            time_diff = (timestamp - last['time']).total_seconds()
+            if time_diff > 0 and total_dl_bytes >= last['bytes']:
+                avg_rate = (total_dl_bytes - last['bytes']) * 8 / (time_diff * 1_000_000)
+        ue_states[ue_id] = {'bytes': total_dl_bytes, 'time': timestamp}
+        fields = NR_CELL_FIELDS if nr else LTE_CELL_FIELDS
+        record = {'timestamp': timestamp.strftime('%Y-%m-%d %H:%M:%S.%f'), 'ue_id': ue_id,
+                  'RAT': 'NR' if nr else 'LTE', 'instant_rate_mbps': cell.get('dl_bitrate', 0) / 1_000_000,
+                  'avg_rate_mbps': avg_rate, 'total_dl_bytes': total_dl_bytes}
+        for f in FLOAT_COLUMNS[2:-3]:
+            record[f] = cell.get(f) if f in fields else None
+        record.update(gain_4g=0, gain_5g=0, noise=None)
+        print(f"{'NR' if nr else 'LTE'} record: {record}", file=stream)
+        out.append(record)
+        print(f"Logged UE[{ue_id}] data at {timestamp.strftime('%H:%M:%S')}", file=stream)
+
+
+def run_extraction_benchmark(n_frames=2000, n_ues=16, chunk_rows=DEFAULT_CHUNK_ROWS, keep=False):
+    """
+    Decode n_frames synthetic ue_get responses with n_ues UEs each and write them to CSV,
+    once through the old dict/print/DataFrame path and once through UEMonitor's column path.
+    Both CSV files are read back and compared column by column; they are removed afterwards unless keep is set.
+    """
+    import io
+    import json
+    import shutil
+    import tempfile
+    from datetime import datetime, timedelta
+
+    import pandas as pd
+
+    from Collect.mock_callbox import MockCallbox
+    from Collect.record_sink import CsvRecordSink
+    from Collect.ue_monitor import UEMonitor, HAS_ORJSON
+
+    callbox = MockCallbox(n_nr=n_ues - n_ues // 4, n_lte=n_ues // 4)
+    frames = [json.dumps(callbox.handle({'message': 'ue_get', 'message_id': i})) for i in range(n_frames)]
+    start_ns = time.time_ns()
+    ts_ns = [start_ns + i * 1_000_000_000 for i in range(n_frames)]
+    n_records = n_frames * n_ues
+    out_dir = tempfile.mkdtemp(prefix='extract_bench_')
+
+    try:
+        # Before: dict per record, strftime, two prints per record, DataFrame + reindex at save time.
+        before_path = os.path.join(out_dir, 'before.csv')
+        stream = io.StringIO()
+        started = time.perf_counter()
+        records, ue_states = [], {}
+        for ts, frame in zip(ts_ns, frames):
+            timestamp = datetime.fromtimestamp(ts / 1e9)
+            _legacy_extract(json.loads(frame)['ue_list'], timestamp, ue_states, records, stream)
+        pd.DataFrame(records).reindex(columns=CSV_HEADER).to_csv(before_path, index=False)
+        before = time.perf_counter() - started
+
+        # After: column chunks handed to the CSV sink (drained synchronously when closed).
+        after_path = os.path.join(out_dir, 'after.csv')
+        sink = CsvRecordSink(after_path, fsync='never')
+        monitor = UEMonitor('ws://benchmark/', after_path, sink=sink, chunk_rows=chunk_rows, flush_interval_ms=10**9)
+        started = time.perf_counter()
+        for ts, frame in zip(ts_ns, frames):
+            monitor._handle_message(frame, ts)
+        monitor.records.flush()
+        extract = time.perf_counter() - started
+        sink.close()
+        after = time.perf_counter() - started
+
+        a, b = pd.read_csv(before_path), pd.read_csv(after_path)
+        assert list(b.columns) == CSV_HEADER and len(a) == len(b) == n_records, "row/column mismatch"
+        for col in CSV_HEADER:
+            if col == 'timestamp':
+                # The old path formatted via float seconds; allow sub-microsecond rounding.
+                diff = (pd.to_datetime(a[col]) - pd.to_datetime(b[col])).abs().max()
+                assert diff <= timedelta(microseconds=1), f"timestamp differs by {diff}"
+            else:
+                pd.testing.assert_series_equal(a[col], b[col], check_dtype=False, check_exact=False)
+    finally:
+        if not keep:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    decoder = 'orjson' if HAS_ORJSON else 'json'
+    print(f"{n_frames} frames x {n_ues} UEs = {n_records} records")
+    print(f"before (dict + print + DataFrame): {before:.3f}s, {n_records / before:,.0f} records/s")
+    print(f"after  (column chunks, {decoder}):  {after:.3f}s, {n_records / after:,.0f} records/s "
+          f"(extraction {n_records / extract:,.0f} records/s)")
+    kept = f", kept in {out_dir}" if keep else ''
+    print(f"speedup x{before / after:.1f}; outputs identical{kept}")
+    return n_records / before, n_records / after
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark record extraction, old dict path vs column chunks.')
+    parser.add_argument('--frames', type=int, default=2000, help='Number of ue_get responses (default: 2000).')
+    parser.add_argument('--ues', type=int, default=16, help='UEs per response (default: 16).')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help=f'Rows per column chunk (default: {DEFAULT_CHUNK_ROWS}).')
+    parser.add_argument('--keep', action='store_true', help='Keep the output files instead of deleting them.')
+    args = parser.parse_args()
+    run_extraction_benchmark(args.frames, args.ues, args.chunk_rows, keep=args.keep)
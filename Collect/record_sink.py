@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+import abc
+import os
+import sys
+import time
+import queue
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Define all possible columns for the CSV file to ensure consistency.
+CSV_HEADER = [
+    'timestamp', 'ue_id', 'RAT', 'instant_rate_mbps', 'avg_rate_mbps', 'total_dl_bytes',
+    'epre', 'ul_path_loss', 'p_ue', 'ul_phr', 'pucch1_snr', 'pusch_snr',
+    'cqi', 'ri', 'dl_mcs', 'ul_mcs', 'ul_n_layer', 'ul_rank', 'dl_retx',
+    'ul_retx', 'dl_err', 'ul_err', 'gain_4g', 'gain_5g', 'noise'
+]
+
+# Float columns holding whole numbers (counters, indices, set gains): CsvRecordSink writes whole
+# values in them as integers. Every other float column is always written as a float.
+INTEGER_COLUMNS = ['cqi', 'ri', 'dl_mcs', 'ul_mcs', 'ul_n_layer', 'ul_rank', 'dl_retx', 'ul_retx', 'dl_err',
+                   'ul_err', 'gain_4g', 'gain_5g']
+
+SINK_FORMATS = ['csv', 'binary', 'segments']
+FSYNC_POLICIES = ['never', 'batch', 'interval']
+SEGMENT_ROLLS = ['size', 'hour']
+DEFAULT_SEGMENT_BYTES = 64 * 2**20
+SEGMENT_SUFFIX = '.bin'
+SEGMENT_INDEX_SUFFIX = '.idx.json'
+
+
+def write_frame(f, columns):
+    """
+    Append {column: numpy array} as one frame of .npy arrays: the column names, then each column
+    in that order. Object (string) columns are stored as fixed-width unicode, so frames are read
+    back without pickle and do not depend on the numpy/pandas version that wrote them.
+    """
+    np.save(f, np.array(list(columns), dtype=str), allow_pickle=False)
+    for values in columns.values():
+        np.save(f, values.astype(str) if values.dtype == object else values, allow_pickle=False)
+
+
+def read_frame(f):
+    """Next frame written by write_frame; EOFError at the end of the file, ValueError for a torn frame."""
+    names = np.load(f, allow_pickle=False)
+    try:
+        return {str(name): np.load(f, allow_pickle=False) for name in names}
+    except EOFError as e:
+        raise ValueError("frame ends early") from e
+
+
+def format_timestamps(ts_ns):
+    """Epoch-ns int64 array -> local time strings in the collector's '%Y-%m-%d %H:%M:%S.%f' format."""
+    if len(ts_ns) == 0:
+        return np.array([], dtype=object)
+    # One UTC offset per chunk; a chunk spans at most a few seconds.
+    offset_ns = time.localtime(int(ts_ns[0]) // 1_000_000_000).tm_gmtoff * 1_000_000_000
+    local = (np.asarray(ts_ns, dtype='int64') + offset_ns).astype('datetime64[ns]').astype('datetime64[us]')
+    return np.char.replace(np.datetime_as_string(local, unit='us'), 'T', ' ').astype(object)
+
+
+class RecordSinkError(RuntimeError):
+    """Raised by RecordSink.close() when a batch could not be written."""
+
+
+class RecordSink(abc.ABC):
+    """
+    Write-through record sink. The collector's RecordBuffer queues ColumnChunks (a batch of
+    records in typed columns); a dedicated writer thread converts and writes whatever chunks
+    are queued as one batch.
+
+    fsync policy:
+      never    - only flush to the OS; fastest, survives a process kill but not power loss
+      batch    - fsync after every batch
+      interval - fsync at most every `fsync_interval` seconds
+
+    With append=True an existing output file is continued instead of overwritten (resumed runs).
+
+    The first failed write (e.g. a full disk) is kept in `error` and every later batch is
+    discarded and counted in `records_lost`, so the file is not left with gaps in the middle;
+    the collector polls `error` to stop, and close() raises RecordSinkError.
+    """
+
+    def __init__(self, output_file, fsync='interval', fsync_interval=5.0, columns=CSV_HEADER, append=False):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.output_file = output_file
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.columns = list(columns)
+        self.append = append
+        self.records_written = 0
+        self.records_lost = 0
+        self.error = None
+        self._file = None
+        self._last_fsync = time.monotonic()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._closed = False
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='record-sink', daemon=True)
+            self._thread.start()
+
+    def write(self, chunk):
+        self._queue.put(chunk)
+
+    def close(self):
+        """
+        Flush everything still queued, fsync and close the file. Safe to call twice.
+        Raises RecordSinkError if any records could not be written.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is None:
+            # Never started: drain synchronously.
+            self._drain_and_write()
+        else:
+            self._queue.put(None)
+            self._thread.join()
+        if self._file:
+            try:
+                self._sync(force=True)
+                self._file.close()
+            except OSError as e:
+                self.error = self.error or e
+            self._file = None
+        if self.error is not None:
+            raise RecordSinkError(f"{self.records_lost} records could not be written to {self.output_file} "
+                                  f"({self.records_written} written): {self.error}") from self.error
+
+    def _drain(self, chunks):
+        """Move every chunk already queued into `chunks`; returns False once the None sentinel is seen."""
+        while True:
+            try:
+                chunk = self._queue.get_nowait()
+            except queue.Empty:
+                return True
+            if chunk is None:
+                return False
+            chunks.append(chunk)
+
+    def _drain_and_write(self):
+        chunks = []
+        self._drain(chunks)
+        self._write(chunks)
+
+    def _run(self):
+        running = True
+        while running:
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            chunks = [chunk]
+            running = self._drain(chunks)
+            self._write(chunks)
+
+    def _write(self, chunks):
+        n = sum(len(chunk) for chunk in chunks)
+        if not n:
+            return
+        if self.error is not None:
+            self.records_lost += n
+            return
+        try:
+            if self._file is None:
+                # Opened lazily so that a run without data does not leave an empty file behind.
+                self._file = self._open()
+            parts = [chunk.to_columns() for chunk in chunks]
+            columns = parts[0] if len(parts) == 1 else {col: np.concatenate([p[col] for p in parts])
+                                                         for col in parts[0]}
+            self._write_batch(columns)
+            self._file.flush()
+            self.records_written += n
+            self._sync()
+        except Exception as e:
+            self.error = e
+            self.records_lost += n
+            print(f"Error writing {n} records to {self.output_file}: {e}; discarding further records.",
+                  file=sys.stderr)
+
+    def _sync(self, force=False):
+        if self.fsync == 'never' and not force:
+            return
+        now = time.monotonic()
+        if force or self.fsync == 'batch' or now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    @abc.abstractmethod
+    def _open(self):
+        """Open the output; called before the first batch is written."""
+
+    @abc.abstractmethod
+    def _write_batch(self, columns):
+        """columns: {name: numpy array} as returned by ColumnChunk.to_columns()."""
+
+
+class CsvRecordSink(RecordSink):
+    """
+    Appends records as CSV rows in the fixed column order. Timestamps are formatted as
+    local time and missing values are written as empty fields. Whole values in
+    `integer_columns` are written as integers; the format depends only on the column, so a
+    value is written the same way in every batch.
+    """
+
+    def __init__(self, output_file, integer_columns=INTEGER_COLUMNS, **kwargs):
+        super().__init__(output_file, **kwargs)
+        self.integer_columns = set(integer_columns)
+
+    def _open(self):
+        if self.append and os.path.exists(self.output_file) and os.path.getsize(self.output_file):
+            return open(self.output_file, 'a', newline='', encoding='utf-8')
+        f = open(self.output_file, 'w', newline='', encoding='utf-8')
+        f.write(','.join(self.columns) + '\n')
+        return f
+
+    def _write_batch(self, columns):
+        frame = {}
+        for col in self.columns:
+            values = columns[col]
+            if col == 'timestamp':
+                values = format_timestamps(values)
+            elif col in self.integer_columns and values.dtype.kind == 'f':
+                values = _whole_as_int(values)
+            frame[col] = values
+        pd.DataFrame(frame, copy=False).to_csv(self._file, header=False, index=False)
+
+
+def _whole_as_int(values):
+    """Float array -> int64 array if every value is whole, else an object array with whole values as int."""
+    whole = np.isfinite(values) & (values == np.trunc(values))
+    if whole.all():
+        return values.astype('int64')
+    out = values.astype(object)
+    out[whole] = values[whole].astype('int64')
+    return out
+
+
+class BinaryRecordSink(RecordSink):
+    """
+    Appends each batch as one write_frame() frame of .npy column arrays with epoch-ns timestamps.
+    Much cheaper to write than CSV; read back with read_binary_records().
+    """
+
+    def _open(self):
+        # Frames are self-delimiting, so appending to an earlier run's file needs no header handling.
+        return open(self.output_file, 'ab' if self.append else 'wb')
+
+    def _write_batch(self, columns):
+        write_frame(self._file, {col: columns[col] for col in self.columns})
+
+
+def segment_dir(output_file):
+    return os.path.splitext(output_file)[0] + '.segments'
+
+
+def column_range(values):
+    """[min, max] of one column as JSON-friendly values; None when it has no values."""
+    if values.dtype.kind == 'f':
+        values = values[~np.isnan(values)]
+    elif values.dtype == object:
+        values = np.array([v for v in values if isinstance(v, str)], dtype=object)
+    if not len(values):
+        return None
+    lo, hi = values.min(), values.max()
+    return [lo.item() if hasattr(lo, 'item') else lo, hi.item() if hasattr(hi, 'item') else hi]
+
+
+def merge_ranges(a, b):
+    if a is None or b is None:
+        return a if b is None else b
+    return [min(a[0], b[0]), max(a[1], b[1])]
+
+
+def write_segment_index(path, index):
+    """Write a segment sidecar atomically so readers never see a torn index."""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(tmp, path)
+
+
+class SegmentedRecordSink(RecordSink):
+    """
+    Rolling segments for long unattended runs, in the directory <output>.segments/. Batches are
+    appended to the current segment as BinaryRecordSink frames (write_frame); a new segment starts once the
+    current one reaches segment_bytes, and with roll='hour' also at every local hour (a batch
+    spanning the hour is split). Each seg-<start>-<n>.bin has a sidecar .idx.json with the time
+    range (epoch ns), row count, size and per-column [min, max], rewritten after every batch;
+    'complete' is set once the segment is closed. Feature/segment_store.py reads and compacts them.
+    """
+
+    def __init__(self, output_file, segment_bytes=DEFAULT_SEGMENT_BYTES, roll='size', **kwargs):
+        if roll not in SEGMENT_ROLLS:
+            raise ValueError(f"Unknown segment roll: {roll}")
+        super().__init__(output_file, **kwargs)
+        self.directory = segment_dir(output_file)
+        self.segment_bytes = segment_bytes
+        self.roll = roll
+        self.segments = 0
+        self._index = None
+        self._index_path = None
+        self._hour_end = None
+
+    def _open(self):
+        # Segments are named after their first record, so the first one is opened by _write_batch.
+        os.makedirs(self.directory, exist_ok=True)
+        return None
+
+    def _start_segment(self, ts_ns):
+        self.segments += 1
+        name = time.strftime('seg-%Y%m%d-%H%M%S', time.localtime(ts_ns / 1e9)) + f'-{os.getpid()}-{self.segments:04d}'
+        path = os.path.join(self.directory, name + SEGMENT_SUFFIX)
+        self._index_path = os.path.join(self.directory, name + SEGMENT_INDEX_SUFFIX)
+        self._index = {'segment': name + SEGMENT_SUFFIX, 'first_ts': None, 'last_ts': None, 'rows': 0, 'bytes': 0,
+                       'complete': False, 'columns': {}}
+        self._hour_end = None
+        return open(path, 'wb')
+
+    def _close_segment(self):
+        self._sync(force=True)
+        self._file.close()
+        self._index['complete'] = True
+        write_segment_index(self._index_path, self._index)
+
+    def _write_batch(self, columns):
+        ts = columns['timestamp']
+        if self._file is None:
+            self._file = self._start_segment(int(ts[0]))
+        # Coalesced batches can be large, so they are split to keep segments near segment_bytes.
+        row_bytes = max(sum(columns[col].nbytes for col in self.columns) // len(ts), 1)
+        while len(ts):
+            if self._index['rows'] and self._file.tell() >= self.segment_bytes:
+                self._close_segment()
+                self._file = self._start_segment(int(ts[0]))
+            n = min(len(ts), max((self.segment_bytes - self._file.tell()) // row_bytes, 1))
+            if self.roll == 'hour':
+                if self._hour_end is None:
+                    self._hour_end = self._next_hour(int(ts[0]))
+                n = min(n, int(np.searchsorted(ts, self._hour_end)))
+                if n == 0:
+                    if self._index['rows']:
+                        self._close_segment()
+                        self._file = self._start_segment(int(ts[0]))
+                    self._hour_end = self._next_hour(int(ts[0]))
+                    continue
+            part = {col: columns[col][:n] for col in self.columns} if n < len(ts) else \
+                {col: columns[col] for col in self.columns}
+            self._append_frame(part)
+            columns = {col: values[n:] for col, values in columns.items()}
+            ts = columns['timestamp']
+
+    @staticmethod
+    def _next_hour(ts_ns):
+        """Epoch ns of the next local full hour after ts_ns."""
+        t = time.localtime(ts_ns // 1_000_000_000)
+        start = time.mktime((t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, 0, 0, 0, 0, -1))
+        return int(start + 3600) * 1_000_000_000
+
+    def _append_frame(self, part):
+        write_frame(self._file, part)
+        index = self._index
+        ts = part['timestamp']
+        if index['first_ts'] is None:
+            index['first_ts'] = int(ts[0])
+        index['last_ts'] = int(ts[-1])
+        index['rows'] += len(ts)
+        index['bytes'] = self._file.tell()
+        for col, values in part.items():
+            index['columns'][col] = merge_ranges(index['columns'].get(col), column_range(values))
+        # The data must be on disk before an index that points at it.
+        self._file.flush()
+        write_segment_index(self._index_path, index)
+
+    def close(self):
+        # The last segment may only be opened while close() drains the queue, so check afterwards.
+        try:
+            super().close()
+        finally:
+            if self._index is not None and not self._index['complete']:
+                self._index['complete'] = True
+                try:
+                    write_segment_index(self._index_path, self._index)
+                except OSError as e:
+                    print(f"Error completing segment index {self._index_path}: {e}", file=sys.stderr)
+
+
+def read_binary_records(path):
+    """
+    Load a file written by BinaryRecordSink into a DataFrame with CSV_HEADER columns;
+    timestamps are formatted like the CSV output.
+    """
+    frames = []
+    with open(path, 'rb') as f:
+        while True:
+            offset = f.tell()
+            try:
+                frames.append(pd.DataFrame(read_frame(f)))
+            except EOFError:
+                break
+            except ValueError as e:
+                if offset == 0:
+                    # Not .npy frames at all, e.g. a file from the earlier pickle-based format.
+                    raise ValueError(f"{path} is not a binary record file: {e}") from e
+                # A torn final frame after a crash; everything before it is intact.
+                print(f"Truncated frame at offset {f.tell()} in {path}, ignoring the rest.", file=sys.stderr)
+                break
+    if not frames:
+        return pd.DataFrame(columns=CSV_HEADER)
+    df = pd.concat(frames, ignore_index=True)
+    if pd.api.types.is_integer_dtype(df['timestamp']):
+        df['timestamp'] = format_timestamps(df['timestamp'].to_numpy())
+    return df
+
+
+def create_sink(sink_format, output_file, **kwargs):
+    if sink_format == 'csv':
+        return CsvRecordSink(output_file, **kwargs)
+    if sink_format == 'binary':
+        return BinaryRecordSink(output_file, **kwargs)
+    if sink_format == 'segments':
+        return SegmentedRecordSink(output_file, **kwargs)
+    raise ValueError(f"Unknown sink format: {sink_format}")
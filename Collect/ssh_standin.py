@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Local SSH server stand-in for testing the traffic controller without the callbox host.
+Accepts password logins, runs exec requests (and shell lines, as invoke_shell sends them)
+as local shell commands and streams their output back. Ctrl+C on the channel sends SIGINT
+to the command; closing the channel terminates it, like the SIGHUP a pty would deliver.
+
+    python Collect/ssh_standin.py --port 2222
+    python Collect/ue_monitor.py --ssh-host 127.0.0.1 --ssh-port 2222 --ssh-user sdr --ssh-pass 123123 \\
+        --iperf-cmd "python Collect/fake_iperf.py -c 192.168.2.2 -u -b 230m -t 1000000 -i 1" ...
+"""
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import argparse
+import threading
+import subprocess
+
+import paramiko
+
+
+logging.getLogger('paramiko.standin').setLevel(logging.CRITICAL)
+
+
+class _StandInServer(paramiko.ServerInterface):
+    def __init__(self, user, password, runner):
+        self.user = user
+        self.password = password
+        self.runner = runner
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_auth_password(self, username, password):
+        if username == self.user and password == self.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self.runner, args=(channel, command.decode('utf-8'), True), daemon=True).start()
+        return True
+
+    def check_channel_shell_request(self, channel):
+        threading.Thread(target=self.runner, args=(channel, None, False), daemon=True).start()
+        return True
+
+
+def _run_command(channel, command):
+    """Run one command, forwarding output to the channel and Ctrl+C / channel close to the process."""
+    proc = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            start_new_session=True)
+
+    def pump():
+        for line in iter(proc.stdout.readline, b''):
+            try:
+                # A pty turns '\n' into '\r\n'; do the same so clients see what a real sshd sends.
+                channel.sendall(line.replace(b'\n', b'\r\n'))
+            except OSError:
+                break
+
+    pumper = threading.Thread(target=pump, daemon=True)
+    pumper.start()
+    while proc.poll() is None:
+        if channel.recv_ready():
+            data = channel.recv(1024)
+            if b'\x03' in data:
+                os.killpg(proc.pid, signal.SIGINT)
+        elif channel.closed or channel.eof_received:
+            os.killpg(proc.pid, signal.SIGTERM)
+            break
+        else:
+            time.sleep(0.01)
+    proc.wait()
+    pumper.join(timeout=1)
+    return proc.returncode
+
+
+class SSHStandIn:
+    """Threaded SSH server on host:port (port 0 picks a free port); stop() closes all sessions."""
+
+    def __init__(self, host='127.0.0.1', port=0, user='sdr', password='123123'):
+        self.user = user
+        self.password = password
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(16)
+        self.host, self.port = self.sock.getsockname()
+        self.connections = 0
+        self.commands = 0
+        self._transports = []
+        self._running = True
+        self._thread = threading.Thread(target=self._accept_loop, name='ssh-standin', daemon=True)
+        self._thread.start()
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                client, _ = self.sock.accept()
+            except OSError:
+                break
+            self.connections += 1
+            # OpenSSH's sshd sets TCP_NODELAY on interactive sessions as well.
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            transport = paramiko.Transport(client)
+            # Clients dropping the connection are expected here; keep their socket errors off stderr.
+            transport.set_log_channel('paramiko.standin')
+            transport.add_server_key(self.host_key)
+            self._transports.append(transport)
+            # Channels are served from the exec/shell callbacks, so they are never accept()ed
+            # (an accepted Channel object that goes out of scope closes the channel).
+            try:
+                transport.start_server(server=_StandInServer(self.user, self.password, self._serve_channel))
+            except (paramiko.SSHException, EOFError):
+                continue
+
+    def _serve_channel(self, channel, command, exec_request):
+        if exec_request:
+            self.commands += 1
+            status = _run_command(channel, command)
+            try:
+                # A command killed by signal N exits with 128 + N, as a shell reports it.
+                channel.send_exit_status(status if status >= 0 else 128 - status)
+            except OSError:
+                pass
+            channel.close()
+            return
+        # Interactive shell: run one line at a time until the channel closes.
+        buffer = b''
+        while not channel.closed:
+            data = channel.recv(1024)
+            if not data:
+                break
+            buffer += data
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                if line.strip():
+                    self.commands += 1
+                    _run_command(channel, line.decode('utf-8'))
+        channel.close()
+
+    def stop(self):
+        self._running = False
+        self.sock.close()
+        for transport in self._transports:
+            transport.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local SSH stand-in that runs commands on this machine.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2222)
+    parser.add_argument('--user', default='sdr')
+    parser.add_argument('--password', default='123123')
+    args = parser.parse_args()
+    server = SSHStandIn(args.host, args.port, args.user, args.password)
+    print(f"SSH stand-in listening on {server.host}:{server.port} (user {args.user})", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+        sys.exit(0)
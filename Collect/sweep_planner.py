@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Sweep planner for the heatmap test. Decides which (gain_4g, gain_5g, noise) point to measure
+next from the results so far, so that failures (each costing a recovery: reset, gain ramp,
+iperf restart) are measured as rarely as possible.
+
+Strategies:
+  nested  - the original order: gain pairs as listed, noise as listed; a failure skips the rest
+            of that gain pair, a failure at the first noise level aborts the sweep.
+  planned - gain pairs strongest first, noise cleanest first. Throughput is assumed monotone
+            (less gain or more noise never helps), so a failure prunes the rest of its gain pair
+            and, once it has used all max_retries tries, every point it dominates in weaker gain
+            pairs too. Points whose throughput, extrapolated from the same gain pair and from the
+            nearest stronger gain pair, is already below the pass threshold are pruned without
+            measuring; borderline points get a single try instead of a recovery and retry, so a
+            transient drop there only ends that gain pair.
+
+Estimate expected campaign time for both strategies, or rehearse both against the mock callbox:
+    python Collect/sweep_planner.py --estimate
+    python Collect/sweep_planner.py --mock-run --time-scale 0.05
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SWEEP_STRATEGIES = ['nested', 'planned']
+
+# Heatmap grid of UEMonitor (gain pairs as (gain_4g, gain_5g)).
+DEFAULT_NOISE_GRID = [-120, -100, -90, -85, -80, -72, -64, -53, -42, -33, -24, -18, -10]
+DEFAULT_GAIN_GRID = [(0, 90), (0, 85), (0, 78), (0, 72), (0, 68), (0, 64), (0, 58), (0, 50), (0, 46), (0, 42)]
+
+
+class SweepCosts:
+    """Time model of the heatmap sweep, in seconds; mirrors the recovery steps in UEMonitor."""
+
+    def __init__(self, settle=2.0, pass_dwell=4.0, fail_dwell=3.0, reset_wait=10.0, ramp_step_db=5,
+                 ramp_step_time=5.0, iperf_wait=5.0, tx_max_gain=80):
+        self.settle = settle
+        self.pass_dwell = pass_dwell
+        self.fail_dwell = fail_dwell
+        self.reset_wait = reset_wait
+        self.ramp_step_db = ramp_step_db
+        self.ramp_step_time = ramp_step_time
+        self.iperf_wait = iperf_wait
+        self.tx_max_gain = tx_max_gain
+
+    def ramp_steps(self, gain_4g, gain_5g):
+        """Number of steps _ramp_down_gain takes from tx_max_gain down to the target gains."""
+        steps = 0
+        for g in range(self.tx_max_gain, min(gain_4g, gain_5g) - 1, -self.ramp_step_db):
+            steps += 1
+            if max(g, gain_4g) == gain_4g and max(g, gain_5g) == gain_5g:
+                break
+        return steps
+
+    def recovery(self, gain_4g, gain_5g):
+        return self.reset_wait + self.ramp_steps(gain_4g, gain_5g) * self.ramp_step_time + self.iperf_wait
+
+    def point(self, gain_4g, gain_5g, passed, tries):
+        if passed:
+            return self.settle + self.pass_dwell
+        return tries * (self.settle + self.fail_dwell) + (tries - 1) * self.recovery(gain_4g, gain_5g)
+
+
+class SweepPlanner:
+    """
+    Hands out the next point to measure; report() every result (also results restored from a
+    checkpoint) before asking for the next one. next_point() returns None when the sweep is done.
+    """
+
+    def __init__(self, gain_grid, noise_grid, strategy='nested', min_throughput=1.0, max_retries=2,
+                 borderline_fraction=0.25):
+        if strategy not in SWEEP_STRATEGIES:
+            raise ValueError(f"Unknown sweep strategy: {strategy}")
+        self.strategy = strategy
+        self.min_throughput = min_throughput
+        self.max_retries = max_retries
+        self.borderline_fraction = borderline_fraction
+        if strategy == 'planned':
+            # Sorting by total gain is a linear extension of the componentwise "stronger" order.
+            self.gains = sorted(gain_grid, key=lambda g: -(g[0] + g[1]))
+            self.noises = sorted(noise_grid)
+        else:
+            self.gains = list(gain_grid)
+            self.noises = list(noise_grid)
+        self.results = {}  # {(gain_4g, gain_5g, noise): (passed, mean_mbps, tries)}
+        self.pruned = {}   # {(gain_4g, gain_5g, noise): reason}
+        self.aborted = False
+
+    @property
+    def n_points(self):
+        return len(self.gains) * len(self.noises)
+
+    def report(self, point, passed, mean_mbps, tries=None):
+        """tries: measurements the point took; None (e.g. an old checkpoint) counts as max_retries."""
+        self.results[tuple(point)] = (bool(passed), mean_mbps, self.max_retries if tries is None else tries)
+
+    def next_point(self):
+        if self.strategy == 'nested':
+            return self._next_nested()
+        return self._next_planned()
+
+    def _next_nested(self):
+        for gain_4g, gain_5g in self.gains:
+            for noise_idx, noise in enumerate(self.noises):
+                result = self.results.get((gain_4g, gain_5g, noise))
+                if result is None:
+                    return gain_4g, gain_5g, noise
+                if not result[0]:
+                    if noise_idx == 0:
+                        self.aborted = True
+                        return None
+                    self._prune_rest(gain_4g, gain_5g, noise_idx + 1, f"after failure at {noise}")
+                    break
+        return None
+
+    def _prune_rest(self, gain_4g, gain_5g, noise_idx, reason):
+        for noise in self.noises[noise_idx:]:
+            if (gain_4g, gain_5g, noise) not in self.results:
+                self.pruned.setdefault((gain_4g, gain_5g, noise), reason)
+
+    def _next_planned(self):
+        for gain_idx, (gain_4g, gain_5g) in enumerate(self.gains):
+            for noise_idx, noise in enumerate(self.noises):
+                point = (gain_4g, gain_5g, noise)
+                result = self.results.get(point)
+                if result is not None:
+                    if not result[0]:
+                        self._prune_rest(gain_4g, gain_5g, noise_idx + 1, f"dominated by failure at {point}")
+                        break
+                    continue
+                reason = self._prune_reason(gain_idx, noise_idx)
+                if reason:
+                    # Noisier points of this gain pair can only be worse.
+                    self._prune_rest(gain_4g, gain_5g, noise_idx, reason)
+                    break
+                return point
+        return None
+
+    def _dominating_failure(self, gain_4g, gain_5g, noise):
+        """A failure that rules this point out; only failures that used every retry count across gain pairs."""
+        for (f4, f5, fn), (passed, _, tries) in self.results.items():
+            if not passed and tries >= self.max_retries and gain_4g <= f4 and gain_5g <= f5 and noise >= fn:
+                return f4, f5, fn
+        return None
+
+    def _prune_reason(self, gain_idx, noise_idx):
+        gain_4g, gain_5g = self.gains[gain_idx]
+        noise = self.noises[noise_idx]
+        failure = self._dominating_failure(gain_4g, gain_5g, noise)
+        if failure:
+            return f"dominated by failure at {failure}"
+        predictions = self.predict(gain_idx, noise_idx)
+        column = self._column_rates(gain_idx, noise_idx)
+        if predictions and column and max(predictions) < self.min_throughput \
+                and column[-1][1] < self.borderline_fraction * max(m for _, m in column):
+            return f"predicted {max(predictions):.1f} Mbps"
+        return None
+
+    def _column_rates(self, gain_idx, noise_idx):
+        """[(noise, mean)] of the passed points of this gain pair below noise_idx."""
+        gain_4g, gain_5g = self.gains[gain_idx]
+        rates = []
+        for noise in self.noises[:noise_idx]:
+            result = self.results.get((gain_4g, gain_5g, noise))
+            if result and result[0]:
+                rates.append((noise, result[1]))
+        return rates
+
+    def predict(self, gain_idx, noise_idx):
+        """Throughput predictions for a point from already measured neighbours (may be empty)."""
+        gain_4g, gain_5g = self.gains[gain_idx]
+        noise = self.noises[noise_idx]
+        predictions = []
+
+        # Linear extrapolation along noise within the same gain pair.
+        column = self._column_rates(gain_idx, noise_idx)
+        if len(column) >= 2:
+            (n1, m1), (n2, m2) = column[-2:]
+            slope = (m2 - m1) / (n2 - n1) if n2 != n1 else 0.0
+            predictions.append(max(m2 + min(slope, 0.0) * (noise - n2), 0.0))
+
+        # Nearest stronger gain pair at the same noise, scaled by the ratio at the previous noise.
+        if noise_idx > 0:
+            prev_noise = self.noises[noise_idx - 1]
+            own_prev = self.results.get((gain_4g, gain_5g, prev_noise))
+            for n4, n5 in reversed(self.gains[:gain_idx]):
+                if n4 < gain_4g or n5 < gain_5g:
+                    continue
+                at_noise = self.results.get((n4, n5, noise))
+                at_prev = self.results.get((n4, n5, prev_noise))
+                if at_noise and at_prev and own_prev and at_prev[0] and own_prev[0] and at_prev[1] > 0:
+                    predictions.append((at_noise[1] if at_noise[0] else 0.0) * own_prev[1] / at_prev[1])
+                break
+        return predictions
+
+    def retries_for(self, point):
+        """Borderline points get one try: a failure there is expected, not a transient link drop."""
+        if self.strategy == 'nested':
+            return self.max_retries
+        gain_idx = self.gains.index(tuple(point[:2]))
+        noise_idx = self.noises.index(point[2])
+        predictions = self.predict(gain_idx, noise_idx)
+        if predictions and min(predictions) < 2 * self.min_throughput:
+            return 1
+        return self.max_retries
+
+    def summary(self):
+        measured = len(self.results)
+        failed = sum(1 for passed, _, _ in self.results.values() if not passed)
+        skipped = self.n_points - measured - len(self.pruned)
+        text = f"{measured} points measured ({failed} failed), {len(self.pruned)} pruned"
+        if skipped > 0:
+            text += f", {skipped} not reached"
+        if self.aborted:
+            text += ", sweep aborted"
+        return text
+
+
+def random_link_oracle(gain_grid, noise_grid, rng, rate_mbps=200.0):
+    """
+    A random monotone link for estimation: the highest surviving noise rises linearly with
+    gain_5g at a random slope and offset; throughput fades over the last 20 dB.
+    """
+    slope = rng.uniform(1.0, 3.0)
+    offset = rng.uniform(-140.0, -100.0)
+    g_min = min(g5 for _, g5 in gain_grid)
+
+    def oracle(gain_4g, gain_5g, noise):
+        margin = offset + (gain_5g - g_min) * slope - noise
+        return rate_mbps * min(margin / 20.0, 1.0) if margin >= 0 else 0.0
+    return oracle
+
+
+def simulate_sweep(planner, oracle, costs):
+    """Run a planner against oracle(g4, g5, noise) -> Mbps on a virtual clock; returns (seconds, failures)."""
+    seconds = 0.0
+    failures = 0
+    while True:
+        point = planner.next_point()
+        if point is None:
+            break
+        rate = oracle(*point)
+        passed = rate > planner.min_throughput
+        tries = 1 if passed else planner.retries_for(point)
+        seconds += costs.point(point[0], point[1], passed, tries)
+        failures += not passed
+        planner.report(point, passed, rate, tries)
+    return seconds, failures
+
+
+def estimate_sweep(gain_grid, noise_grid, strategy, costs=None, min_throughput=1.0, max_retries=2, n_draws=200,
+                   seed=0):
+    """Expected campaign time over random monotone links: (mean, p10, p90) seconds and mean failures."""
+    costs = costs or SweepCosts()
+    rng = random.Random(seed)
+    times, failures = [], []
+    for _ in range(n_draws):
+        planner = SweepPlanner(gain_grid, noise_grid, strategy, min_throughput, max_retries)
+        seconds, failed = simulate_sweep(planner, random_link_oracle(gain_grid, noise_grid, rng), costs)
+        times.append(seconds)
+        failures.append(failed)
+    times.sort()
+    return (sum(times) / n_draws, times[n_draws // 10], times[n_draws * 9 // 10], sum(failures) / n_draws)
+
+
+def format_estimate(strategy, estimate):
+    mean, p10, p90, failures = estimate
+    return (f"{strategy:>7}: expected {mean / 60:.1f} min (p10 {p10 / 60:.1f}, p90 {p90 / 60:.1f}), "
+            f"{failures:.1f} failed points")
+
+
+def run_mock_sweep(strategy, time_scale=0.05, gain_grid=DEFAULT_GAIN_GRID, noise_grid=DEFAULT_NOISE_GRID,
+                   poll_rate=10.0, keep=False):
+    """
+    Run UEMonitor's heatmap test against a local mock callbox with all waits (settle, dwell,
+    recovery, ramp, iperf restart) scaled by time_scale; returns (wall seconds, planner).
+    The recorded CSV is removed afterwards unless keep is set.
+    """
+    import asyncio
+    import shutil
+    import tempfile
+
+    from Collect.mock_callbox import serve
+    from Collect.dwell import DwellPolicy
+    from Collect.ue_monitor import UEMonitor
+
+    loop = asyncio.new_event_loop()
+    server, _ = loop.run_until_complete(serve('127.0.0.1', 0, n_nr=1))
+    port = server.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    out_dir = tempfile.mkdtemp(prefix=f'sweep_{strategy}_')
+    policy = DwellPolicy(settle=2.0 * time_scale, min_dwell=max(3.0 * time_scale, 0.3),
+                         max_dwell=max(15.0 * time_scale, 0.6), min_samples=2)
+    monitor = UEMonitor(f'ws://127.0.0.1:{port}/', os.path.join(out_dir, 'heatmap.csv'), heatmap_test=True,
+                        poll_rate=poll_rate, dwell_policy=policy, sweep_strategy=strategy)
+    monitor.gain_grid = list(gain_grid)
+    monitor.noise_grid = list(noise_grid)
+    monitor.recovery_wait *= time_scale
+    monitor.ramp_step_time *= time_scale
+    monitor.iperf_restart_wait *= time_scale
+
+    async def shutdown():
+        server.close()
+        await server.wait_closed()
+
+    try:
+        started = time.perf_counter()
+        monitor.start_monitoring()
+        elapsed = time.perf_counter() - started
+    finally:
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+        if not keep:
+            shutil.rmtree(out_dir, ignore_errors=True)
+        else:
+            print(f"[{strategy}] output kept in {out_dir}")
+    return elapsed, monitor.planner
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Heatmap sweep planner: time estimates and mock rehearsal.')
+    parser.add_argument('--estimate', action='store_true',
+                        help='Estimate campaign time of both strategies over random monotone links.')
+    parser.add_argument('--mock-run', action='store_true',
+                        help='Run the heatmap test with both strategies against a local mock callbox.')
+    parser.add_argument('--time-scale', type=float, default=0.05,
+                        help='Scale factor for all waits in --mock-run (default: 0.05).')
+    parser.add_argument('--keep', action='store_true', help='Keep the --mock-run output instead of deleting it.')
+    args = parser.parse_args()
+    if not (args.estimate or args.mock_run):
+        args.estimate = True
+
+    if args.estimate:
+        print(f"{len(DEFAULT_GAIN_GRID)} gain pairs x {len(DEFAULT_NOISE_GRID)} noise levels")
+        for strategy in SWEEP_STRATEGIES:
+            print(format_estimate(strategy, estimate_sweep(DEFAULT_GAIN_GRID, DEFAULT_NOISE_GRID, strategy)))
+
+    if args.mock_run:
+        walls = {}
+        for strategy in SWEEP_STRATEGIES:
+            walls[strategy], planner = run_mock_sweep(strategy, args.time_scale, keep=args.keep)
+            print(f"[{strategy}] {walls[strategy]:.1f}s wall ({walls[strategy] / args.time_scale / 60:.1f} min "
+                  f"unscaled): {planner.summary()}")
+        print(f"planned sweep took {walls['planned'] / walls['nested']:.0%} of the nested sweep's time")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Checkpoint file for the heatmap sweep. After every finished point the sweep stores the point's
+outcome and aggregate throughput in a small JSON file (written atomically), so an interrupted
+campaign can be resumed with --resume and only the remaining points are measured.
+"""
+import os
+import sys
+import json
+import time
+
+STATE_VERSION = 1
+POINT_STATUSES = ['passed', 'failed']
+
+
+def default_state_file(output_file):
+    return os.path.splitext(output_file)[0] + '.sweep.json'
+
+
+def point_key(gain_4g, gain_5g, noise):
+    return f"{gain_4g},{gain_5g},{noise}"
+
+
+class SweepState:
+    """{point_key: result dict} persisted to `path`; load() only when resuming."""
+
+    def __init__(self, path):
+        self.path = path
+        self.points = {}
+        self.started_at = time.time()
+
+    def load(self):
+        """Read an existing state file; returns the number of finished points found."""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            print(f"No sweep state at {self.path}, starting from the first point.")
+            return 0
+        except (OSError, ValueError) as e:
+            print(f"Cannot read sweep state {self.path}: {e}; starting from the first point.", file=sys.stderr)
+            return 0
+        if state.get('version') != STATE_VERSION:
+            print(f"Sweep state {self.path} has version {state.get('version')}, expected {STATE_VERSION}; "
+                  f"starting from the first point.", file=sys.stderr)
+            return 0
+        self.points = state.get('points', {})
+        self.started_at = state.get('started_at', self.started_at)
+        return len(self.points)
+
+    def get(self, gain_4g, gain_5g, noise):
+        return self.points.get(point_key(gain_4g, gain_5g, noise))
+
+    def record(self, gain_4g, gain_5g, noise, status, mean_mbps, dwell_s, converged, tries, per_ue):
+        """
+        Store one finished point and write the file. per_ue is {ue_id: (count, mean, std, ci_halfwidth)}
+        as returned by UERateStats.snapshot().
+        """
+        if status not in POINT_STATUSES:
+            raise ValueError(f"Unknown point status: {status}")
+        self.points[point_key(gain_4g, gain_5g, noise)] = {
+            'gain_4g': gain_4g, 'gain_5g': gain_5g, 'noise': noise,
+            'status': status,
+            'mean_mbps': round(mean_mbps, 4),
+            'dwell_s': round(dwell_s, 2),
+            'converged': bool(converged),
+            'tries': tries,
+            'per_ue': {str(ue_id): {'count': c, 'mean_mbps': round(m, 4), 'std_mbps': round(sd, 4)}
+                       for ue_id, (c, m, sd, _) in per_ue.items()},
+            'finished_at': time.time(),
+        }
+        self.save()
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': STATE_VERSION, 'started_at': self.started_at, 'points': self.points}, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        # Atomic on POSIX and Windows: a crash leaves either the old or the new state, never a torn file.
+        os.replace(tmp, self.path)
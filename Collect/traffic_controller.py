@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+iperf traffic control over one persistent SSH connection. The transport is opened once and
+kept alive; every start runs iperf on a fresh exec channel, so a restart during heatmap
+recovery costs a channel open instead of a TCP + SSH handshake and login.
+
+The UDP client only reports the rate it offers, so link metrics come from the receiving side:
+with a receiver, an iperf server (IPERF_SERVER_COMMAND) is run on the host behind the UE over
+its own persistent connection, restarted together with the client, and its per-interval
+reports (received rate, jitter, lost/total datagrams) are parsed into a time-stamped metric
+stream (<output>.iperf.csv) that can be merged with the UE records by timestamp.
+
+    python Collect/traffic_controller.py bench --restarts 10
+    python Collect/traffic_controller.py merge run.csv [run.iperf.csv] -o run.merged.csv
+"""
+import io
+import os
+import re
+import sys
+import time
+import socket
+import argparse
+import contextlib
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import paramiko
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Collect.record_sink import CsvRecordSink, RecordSinkError
+
+IPERF_COMMAND = "iperf -c 192.168.2.2 -u -b 230m -t 1000000 -i 1"
+IPERF_SERVER_COMMAND = "iperf -s -u -i 1"
+IPERF_COLUMNS = ['timestamp', 'run', 'interval_start', 'interval_end', 'transfer_bytes', 'bandwidth_mbps',
+                 'jitter_ms', 'lost', 'total']
+DEFAULT_REPORT_HISTORY = 600
+
+# "[  3]  0.0- 1.0 sec  27.4 MBytes   230 Mbits/sec" (iperf 2), "[  5]   0.00-1.00   sec ..." (iperf 3);
+# server-side UDP reports add "  0.012 ms    0/19563 (0%)".
+_REPORT = re.compile(r'\[\s*(?:\d+|SUM)\]\s+([\d.]+)\s*-\s*([\d.]+)\s+sec\s+([\d.]+)\s+([KMGT]?)Bytes\s+'
+                     r'([\d.]+)\s+([KMGT]?)bits/sec(?:\s+([\d.]+)\s+ms\s+(\d+)/\s*(\d+))?')
+_BYTE_UNITS = {'': 1, 'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+_BIT_UNITS = {'': 1e-6, 'K': 1e-3, 'M': 1.0, 'G': 1e3, 'T': 1e6}
+
+
+def default_stream_file(output_file):
+    return os.path.splitext(output_file)[0] + '.iperf.csv'
+
+
+def parse_iperf_line(line):
+    """
+    (interval_start, interval_end, transfer_bytes, bandwidth_mbps, jitter_ms, lost, total) for an
+    iperf interval report line, None for anything else; jitter/lost/total are NaN when absent.
+    """
+    m = _REPORT.search(line)
+    if m is None:
+        return None
+    start, end, size, size_unit, rate, rate_unit, jitter, lost, total = m.groups()
+    return (float(start), float(end), float(size) * _BYTE_UNITS[size_unit], float(rate) * _BIT_UNITS[rate_unit],
+            float(jitter) if jitter else np.nan, float(lost) if lost else np.nan, float(total) if total else np.nan)
+
+
+class _ReportChunk:
+    """One batch of interval reports in the shape RecordSink expects from a ColumnChunk."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def to_columns(self):
+        columns = list(zip(*self.rows))
+        return {'timestamp': np.array(columns[0], dtype='int64'), 'run': np.array(columns[1], dtype='int64'),
+                **{col: np.array(values, dtype='float64') for col, values in zip(IPERF_COLUMNS[2:], columns[2:])}}
+
+
+class TrafficController:
+    """
+    Starts and stops iperf on `host` over one SSH transport. Reports are kept in `reports`
+    as (ts_ns, run, *parse_iperf_line fields) and, with stream_file, written to a CSV through
+    a CsvRecordSink. `run` counts starts, so intervals of different iperf runs stay apart.
+
+    `receiver` is another TrafficController running the iperf server; it is started before and
+    stopped after this one, so its run counter follows the client's, and wait_report() waits
+    for its first report. Only the receiver's reports carry jitter and loss.
+    """
+
+    def __init__(self, host, user, password, command=IPERF_COMMAND, port=22, stream_file=None,
+                 connect_timeout=10, keepalive=15, history=DEFAULT_REPORT_HISTORY, receiver=None,
+                 label='iperf'):
+        self.host = host
+        self.user = user
+        self.password = password
+        self.command = command
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.keepalive = keepalive
+        self.client = None
+        self.channel = None
+        self.reports = deque(maxlen=history)
+        self.sink = CsvRecordSink(stream_file, fsync='never', columns=IPERF_COLUMNS,
+                                   integer_columns=['transfer_bytes', 'lost', 'total']) if stream_file else None
+        self.receiver = receiver
+        self.label = label
+        self.runs = 0
+        self.connects = 0
+        self.start_times = []
+        self._reader = None
+        self._first_report = threading.Event()
+
+    @property
+    def connected(self):
+        transport = self.client.get_transport() if self.client else None
+        return transport is not None and transport.is_active()
+
+    def connect(self):
+        """Open the SSH connection unless the current one is still alive."""
+        if self.connected:
+            return
+        if self.client:
+            self.client.close()
+        print(f"Connecting to {self.user}@{self.host}:{self.port}...")
+        self.client = paramiko.SSHClient()
+        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        self.client.connect(self.host, port=self.port, username=self.user, password=self.password,
+                            timeout=self.connect_timeout, allow_agent=False, look_for_keys=False)
+        transport = self.client.get_transport()
+        # Keepalives stop NAT or an idle sshd from dropping the connection between restarts.
+        transport.set_keepalive(self.keepalive)
+        # Channel open, pty and exec requests are small back-to-back packets; without TCP_NODELAY
+        # Nagle's algorithm holds each one back until the previous reply is ACKed.
+        transport.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connects += 1
+
+    def start(self):
+        """Run iperf on a new exec channel; returns False if it could not be started."""
+        if self.channel is not None:
+            return True
+        # The server must be listening before the client sends; without it the client still
+        # runs, only the link metrics are missing.
+        if self.receiver is not None and not self.receiver.start():
+            print("iperf receiver not running, no link metrics for this run.", file=sys.stderr)
+        started = time.perf_counter()
+        try:
+            self.connect()
+            channel = self.client.get_transport().open_session()
+            # With a pty iperf line-buffers its reports, and Ctrl+C / channel close stop it like a terminal would.
+            channel.get_pty()
+            channel.exec_command(self.command)
+        except Exception as e:
+            print(f"Failed to start {self.label}: {e}", file=sys.stderr)
+            if self.client:
+                self.client.close()
+            self.client = None
+            return False
+        self.channel = channel
+        self.runs += 1
+        self._first_report.clear()
+        if self.sink is not None:
+            self.sink.start()
+        self._reader = threading.Thread(target=self._read, args=(channel, self.runs), name='iperf-reader',
+                                        daemon=True)
+        self._reader.start()
+        self.start_times.append(time.perf_counter() - started)
+        print(f"{self.label} started (run {self.runs}).")
+        return True
+
+    def stop(self):
+        """Stop the running iperf; the SSH connection stays open for the next start."""
+        channel, self.channel = self.channel, None
+        if channel is None:
+            if self.receiver is not None:
+                self.receiver.stop()
+            return
+        try:
+            print(f"Stopping {self.label}...")
+            channel.send('\x03')
+            channel.close()
+            print(f"{self.label} stopped.")
+        except Exception as e:
+            print(f"Error stopping {self.label}: {e}", file=sys.stderr)
+        if self._reader is not None:
+            self._reader.join(timeout=2)
+            self._reader = None
+        if self.receiver is not None:
+            self.receiver.stop()
+
+    def restart(self):
+        self.stop()
+        return self.start()
+
+    def close(self):
+        self.stop()
+        if self.receiver is not None:
+            self.receiver.close()
+        if self.client:
+            self.client.close()
+            self.client = None
+            print("SSH connection closed.")
+        if self.sink is not None:
+            try:
+                self.sink.close()
+            except RecordSinkError as e:
+                # The interval reports are a side output; losing them must not stop the UE records being saved.
+                print(f"iperf report stream: {e}", file=sys.stderr)
+
+    def wait_report(self, timeout=None):
+        """Block until the current run has produced its first interval report (the receiver's, if any)."""
+        if self.receiver is not None:
+            return self.receiver.wait_report(timeout)
+        return self._first_report.wait(timeout)
+
+    @property
+    def latest(self):
+        return self.reports[-1] if self.reports else None
+
+    def _read(self, channel, run):
+        buffer = b''
+        seen = False
+        while True:
+            try:
+                data = channel.recv(4096)
+            except OSError:
+                break
+            if not data:
+                break
+            ts_ns = time.time_ns()
+            buffer += data
+            *lines, buffer = buffer.split(b'\n')
+            rows = []
+            for line in lines:
+                report = parse_iperf_line(line.decode('utf-8', 'replace'))
+                # The whole-run summary iperf prints when stopped also starts at 0; keep interval reports only.
+                if report is not None and not (report[0] == 0 and seen):
+                    rows.append((ts_ns, run) + report)
+                    seen = True
+            if rows:
+                self.reports.extend(rows)
+                if self.sink is not None:
+                    self.sink.write(_ReportChunk(rows))
+                self._first_report.set()
+
+    def summary(self):
+        if not self.start_times:
+            return f"{self.runs} {self.label} runs"
+        avg_ms = sum(self.start_times) / len(self.start_times) * 1000
+        summary = (f"{self.runs} {self.label} runs over {self.connects} SSH connections, start avg {avg_ms:.0f} ms, "
+                   f"{len(self.reports)} recent interval reports")
+        if self.receiver is not None:
+            summary += f"; {self.receiver.label}: {self.receiver.summary()}"
+        return summary
+
+
+def merge_iperf_stream(records, stream, tolerance_s=1.5):
+    """
+    Attach to every UE record the latest receiver interval report received at or before it
+    (within tolerance_s), as iperf_* columns. Both frames need a 'timestamp' column in the
+    collector's local time format.
+    """
+    left = records.assign(_ts=pd.to_datetime(records['timestamp'])).sort_values('_ts', kind='stable')
+    right = stream.rename(columns={c: f'iperf_{c}' for c in stream.columns if c != 'timestamp'})
+    right = right.assign(_ts=pd.to_datetime(right.pop('timestamp'))).sort_values('_ts', kind='stable')
+    merged = pd.merge_asof(left, right, on='_ts', direction='backward', tolerance=pd.Timedelta(seconds=tolerance_s))
+    return merged.drop(columns='_ts')
+
+
+def benchmark_restarts(restarts=10, time_scale=0.1):
+    """
+    Against a local SSH stand-in running fake_iperf.py, restart iperf `restarts` times either
+    reconnecting for every run (the old start_iperf) or reusing the transport; the initial
+    connection is not timed. On localhost the handshake is cheap, so the gap is far larger
+    against a real host across the network. Returns
+    {mode: (seconds until iperf is running, seconds until its first interval report)} averages.
+    """
+    from Collect.ssh_standin import SSHStandIn
+    server = SSHStandIn()
+    fake = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_iperf.py')
+    command = f"{sys.executable} {fake} -c 192.168.2.2 -u -b 230m -t 1000000 -i 1 --time-scale {time_scale}"
+    results = {}
+    try:
+        for mode in ('reconnect', 'persistent'):
+            controller = TrafficController(server.host, server.user, server.password, command, port=server.port)
+            # Measure restarts only: the first connection is made before timing in both modes.
+            controller.connect()
+            running = []
+            first_report = []
+            for _ in range(restarts):
+                controller.stop()
+                if mode == 'reconnect':
+                    controller.close()
+                started = time.perf_counter()
+                controller.start()
+                running.append(time.perf_counter() - started)
+                controller.wait_report(timeout=10)
+                first_report.append(time.perf_counter() - started)
+            controller.close()
+            results[mode] = (sum(running) / restarts, sum(first_report) / restarts)
+    finally:
+        server.stop()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='iperf traffic controller tools.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_bench = sub.add_parser('bench', help='Restart latency: reconnect per run vs persistent connection.')
+    p_bench.add_argument('--restarts', type=int, default=10)
+    p_bench.add_argument('--time-scale', type=float, default=0.1,
+                         help='Fake iperf wall seconds per reported second (default: 0.1).')
+    p_merge = sub.add_parser('merge', help='Merge an iperf metric stream into a UE record CSV.')
+    p_merge.add_argument('records')
+    p_merge.add_argument('stream', nargs='?', help='iperf stream CSV (default: <records>.iperf.csv).')
+    p_merge.add_argument('-o', '--output', help='Output CSV (default: <records>.merged.csv).')
+    p_merge.add_argument('--tolerance', type=float, default=1.5, help='Maximum report age in seconds.')
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = benchmark_restarts(args.restarts, args.time_scale)
+        for mode, (running_s, report_s) in results.items():
+            print(f"{mode:>10}: iperf running after {running_s * 1000:6.1f} ms, "
+                  f"first interval report after {report_s * 1000:6.1f} ms")
+    else:
+        stream = args.stream or default_stream_file(args.records)
+        output = args.output or os.path.splitext(args.records)[0] + '.merged.csv'
+        merged = merge_iperf_stream(pd.read_csv(args.records), pd.read_csv(stream), args.tolerance)
+        merged.to_csv(output, index=False)
+        print(f"{len(merged)} records merged with {stream} -> {output}")
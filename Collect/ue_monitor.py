@@ -2,39 +2,111 @@
 import websocket
 import json
 import time
-from datetime import datetime
 import threading
-import pandas as pd
 import argparse
 import sys
-import paramiko
-
-# Define all possible columns for the CSV file to ensure consistency.
-CSV_HEADER = [
-    'timestamp', 'ue_id', 'RAT', 'instant_rate_mbps', 'avg_rate_mbps', 'total_dl_bytes',
-    'epre', 'ul_path_loss', 'p_ue', 'ul_phr', 'pucch1_snr', 'pusch_snr',
-    'cqi', 'ri', 'dl_mcs', 'ul_mcs', 'ul_n_layer', 'ul_rank', 'dl_retx',
-    'ul_retx', 'dl_err', 'ul_err', 'gain_4g', 'gain_5g', 'noise'
-]
+import os
+import queue
+from collections import deque
+
+# Allow running as `python Collect/ue_monitor.py` as well as importing as Collect.ue_monitor.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Collect.record_sink import (CSV_HEADER, SINK_FORMATS, FSYNC_POLICIES, SEGMENT_ROLLS, DEFAULT_SEGMENT_BYTES,
+                                 CsvRecordSink, RecordSinkError, create_sink)
+from Collect.record_buffer import RecordBuffer, RAT_NR, RAT_LTE, DEFAULT_CHUNK_ROWS, DEFAULT_FLUSH_MS
+from Collect.poll_scheduler import TickScheduler, PollStats, DEFAULT_POLL_RATE_HZ, SCENARIO_RATE_HZ
+from Collect.dwell import UERateStats, DwellPolicy, point_throughput, CONVERGENCE_CRITERIA
+from Collect.sweep_state import SweepState, default_state_file
+from Collect.grid_aggregator import GridAggregator, default_grid_file, DEFAULT_TAIL_N
+from Collect.raw_capture import RawCaptureWriter, default_capture_file
+from Collect.traffic_controller import TrafficController, IPERF_COMMAND, IPERF_SERVER_COMMAND, default_stream_file
+from Collect.sweep_planner import SweepPlanner, SweepCosts, SWEEP_STRATEGIES, estimate_sweep, format_estimate
+
+# orjson decodes ue_get responses several times faster than the json module; optional.
+try:
+    import orjson
+    HAS_ORJSON = True
+    decode_message = orjson.loads
+except ImportError:
+    HAS_ORJSON = False
+    decode_message = json.loads
+
+# Number of most recent records kept in memory for the heatmap logic; everything
+# else goes straight to the record sink.
+DEFAULT_TAIL_SIZE = 1000
+
+# Maximum number of raw frames waiting between the WebSocket receive callback and the
+# processing worker; frames arriving while it is full are dropped and counted.
+DEFAULT_RX_QUEUE_SIZE = 1000
+
+UE_GET_REQUEST = {
+    "stats": True,
+    "message": "ue_get",
+    "message_id": "ue_monitor_script"
+}
 
 class UEMonitor:
     # def __init__(self, ws_url, output_file, time_limit=None, ssh_host=None, ssh_user=None, ssh_pass=None, nr_lte_switch=False, elevator_switch=False, noise_switch=False):
     def __init__(self, ws_url, output_file, time_limit=None, ssh_host=None, ssh_user=None, ssh_pass=None,
-                 nr_lte_switch=False, elevator_switch=False, noise_switch=False, heatmap_test=False):
+                 nr_lte_switch=False, elevator_switch=False, noise_switch=False, heatmap_test=False,
+                 sink=None, tail_size=DEFAULT_TAIL_SIZE, rx_queue_size=DEFAULT_RX_QUEUE_SIZE,
+                 chunk_rows=DEFAULT_CHUNK_ROWS, flush_interval_ms=DEFAULT_FLUSH_MS, verbose=False,
+                 poll_rate=DEFAULT_POLL_RATE_HZ, dwell_policy=None, state_file=None, resume=False,
+                 sweep_strategy='nested', grid_file=None, grid_tail=DEFAULT_TAIL_N, capture_file=None,
+                 ssh_port=22, iperf_command=IPERF_COMMAND, iperf_stream_file=None, iperf_server_host=None,
+                 iperf_server_port=22, iperf_server_command=IPERF_SERVER_COMMAND):
         self.ws_url = ws_url
         self.output_file = output_file
         self.time_limit = time_limit
         self.start_time = None
-        self.data = []
+        # Monotonic origin shared by the ue_get polling scheduler and the scenario loops.
+        self.timebase = None
+        self.poll_rate = poll_rate
+        self.poll_ticks = None
+        self.poll_stats = PollStats(UE_GET_REQUEST['message_id'])
+        # Records are written into typed column chunks that go straight to the sink; only a bounded
+        # tail of (timestamp_ns, ue_id, avg_rate_mbps) tuples stays in memory for the heatmap logic.
+        self.sink = sink if sink is not None else CsvRecordSink(output_file)
+        self.records = RecordBuffer(self.sink.write, chunk_rows, flush_interval_ms)
+        self.recent = deque(maxlen=tail_size)
+        self.record_count = 0
+        self.verbose = verbose
+        # Rolling avg_rate_mbps statistics per UE, used by the heatmap sweep to detect convergence.
+        self.rate_stats = UERateStats()
+        # Per-(RAT, gain_4g, gain_5g, noise) aggregates written as a grid file heat_map.py plots directly;
+        # enabled for heatmap tests or when a grid file is given.
+        self.grid_file = grid_file or (default_grid_file(output_file) if heatmap_test else None)
+        self.grid = GridAggregator(tail_n=grid_tail) if self.grid_file else None
+        # Raw frames are queued by the receive callback and decoded by a separate worker so that
+        # slow processing never delays socket reads or skews the receive timestamps.
+        self.rx_queue = queue.Queue(maxsize=rx_queue_size)
+        self.rx_worker = None
+        self.rx_frames = 0
+        self.rx_dropped = 0
+        self.rx_latency_total = 0.0
+        self.rx_latency_max = 0.0
+        # Optional raw capture of every processed frame, replayable with Collect/raw_capture.py.
+        self.capture = RawCaptureWriter(capture_file) if capture_file else None
+        self._captured_labels = None
         self.ws = None
         self.running = False
-        # Dictionary to store the last state (bytes, time) for each UE to calculate average rate.
+        # Last (bytes, epoch ns) for each UE to calculate average rate.
         self.ue_states = {}
         self.ssh_host = ssh_host
         self.ssh_user = ssh_user
         self.ssh_pass = ssh_pass
-        self.ssh_client = None
-        self.ssh_channel = None
+        # iperf runs over one persistent SSH connection. The link metrics come from the iperf server on
+        # iperf_server_host (same credentials); its interval reports go to <output>.iperf.csv.
+        self.traffic = None
+        if all([ssh_host, ssh_user, ssh_pass]):
+            receiver = None
+            if iperf_server_host:
+                receiver = TrafficController(iperf_server_host, ssh_user, ssh_pass, iperf_server_command,
+                                             port=iperf_server_port, label='iperf server',
+                                             stream_file=iperf_stream_file or default_stream_file(output_file))
+            self.traffic = TrafficController(ssh_host, ssh_user, ssh_pass, iperf_command, port=ssh_port,
+                                             receiver=receiver)
         self.nr_lte_switch = nr_lte_switch
         self.elevator_switch = elevator_switch
         self.noise_switch = noise_switch
@@ -80,36 +152,95 @@ class UEMonitor:
                 (0, 90), (0, 85), (0, 78), (0, 72), (0, 68),
                 (0, 64), (0, 58), (0, 50), (0, 46), (0, 42)
             ]
-            self.dwell = 15  # 每个(增益,噪声)点的驻留测量时间（秒）
+            # 自适应驻留：每个(增益,噪声)点等待 settle 秒后至少测量 min_dwell 秒，吞吐收敛即结束，最多 max_dwell 秒
+            self.dwell_policy = dwell_policy or DwellPolicy()
+            self.dwell = self.dwell_policy.max_dwell
+
+            # 断点续测：每完成一个测试点就写入状态文件，--resume 时跳过已完成的点
+            self.sweep_state = SweepState(state_file or default_state_file(output_file))
+            self.resume = resume
+            if resume and self.grid is not None:
+                print(f"Grid file {self.grid_file}: {self.grid.load(self.grid_file)} cells restored.")
 
             # 新增：用于处理断网重连的参数
             self.min_throughput_mbps = 1.0  # 定义"断网"的最小吞吐量阈值 (Mbps)
             self.max_retries = 2  # 每个测试点的最大重试次数
             self.tx_max_gain = 80  # 已知可以建连的最高增益 [cite: 1]
+            self.recovery_wait = 10  # 恢复时在安全状态下的等待时间（秒）
+            self.ramp_step_time = 5  # 增益斜坡每一步的等待时间（秒）
+            self.iperf_restart_wait = 5  # 重启 iperf 后等待网络稳定的时间（秒）
+
+            # 测试点顺序与剪枝：nested 为原始的嵌套顺序，planned 由 SweepPlanner 决定
+            self.sweep_strategy = sweep_strategy
+            self.planner = None
 
             # 计算总测试时间
  
 
     def on_message(self, ws, message):
+        # Runs on the websocket-client thread: only timestamp and enqueue the raw frame.
+        try:
+            self.rx_queue.put_nowait((time.time_ns(), time.monotonic(), message))
+        except queue.Full:
+            self.rx_dropped += 1
+
+    def _process_frames(self):
+        """Worker loop: decode queued frames and extract records until a None sentinel arrives."""
+        while True:
+            item = self.rx_queue.get()
+            if item is None:
+                break
+            ts_ns, received, message = item
+            if received is None:
+                # Labels replayed from a capture's state line, in order with its frames.
+                self.gain_4g, self.gain_5g, self.noise = message['gain_4g'], message['gain_5g'], message['noise']
+                continue
+            latency = time.monotonic() - received
+            self.rx_frames += 1
+            self.rx_latency_total += latency
+            self.rx_latency_max = max(self.rx_latency_max, latency)
+            if self.capture is not None:
+                self._capture_frame(ts_ns, message)
+            self._handle_message(message, ts_ns, received)
+
+    def _capture_frame(self, ts_ns, message):
+        """Capture a frame, preceded by a state line whenever the labels it will get have changed."""
+        labels = (self.gain_4g, self.gain_5g, self.noise)
+        if labels != self._captured_labels:
+            self.capture.write_state(ts_ns, dict(zip(('gain_4g', 'gain_5g', 'noise'), labels)))
+            self._captured_labels = labels
+        self.capture.write(ts_ns, message)
+
+    def _handle_message(self, message, ts_ns, received=None):
+        """
+        Extract one record per UE from a raw frame received at ts_ns (epoch nanoseconds);
+        `received` is the time.monotonic() receive time used for request/response latency.
+        """
         try:
-            data = json.loads(message)
+            data = decode_message(message)
+            if data.get('message') == 'ue_get':
+                self.poll_stats.response(data.get('message_id'), received)
             if 'ue_list' in data and data['ue_list']:
-                timestamp = datetime.now()
                 for ue in data['ue_list']:
-                    # Use 'ran_ue_id' for 5G/NR and 'enb_ue_id' for 4G/LTE, as requested.
-                    if 'ran_ue_id' in ue:
-                        self._process_nr_ue(ue, timestamp)
-                    elif 'enb_ue_id' in ue:
-                        self._process_lte_ue(ue, timestamp)
-                    # Silently ignore UEs that don't have a recognized ID.
+                    # One malformed UE entry must not drop the other UEs of the frame.
+                    try:
+                        # Use 'ran_ue_id' for 5G/NR and 'enb_ue_id' for 4G/LTE, as requested.
+                        if 'ran_ue_id' in ue:
+                            self._process_nr_ue(ue, ts_ns)
+                        elif 'enb_ue_id' in ue:
+                            self._process_lte_ue(ue, ts_ns)
+                        # Silently ignore UEs that don't have a recognized ID.
+                    except (TypeError, ValueError, KeyError, AttributeError, IndexError) as e:
+                        print(f"Skipping malformed UE entry ({type(e).__name__}: {e}): {ue}", file=sys.stderr)
             
-        except json.JSONDecodeError:
+        except ValueError:
+            # json.JSONDecodeError and orjson.JSONDecodeError are both ValueErrors.
             print(f"Error decoding message: {message}", file=sys.stderr)
         except Exception as e:
             print(f"Error processing message: {e}", file=sys.stderr)
             print(f"Message content: {message}", file=sys.stderr)
 
-    def _process_nr_ue(self, ue, timestamp):
+    def _process_nr_ue(self, ue, ts_ns):
         ue_id = ue['ran_ue_id']
         
         # Safely get the first cell, or an empty dict if it doesn't exist.
@@ -122,40 +253,14 @@ class UEMonitor:
                 if isinstance(qos_flow, dict):
                     total_dl_bytes += int(qos_flow.get('dl_total_bytes', 0))
 
-        avg_rate_mbps = self._calculate_avg_rate(ue_id, total_dl_bytes, timestamp)
-        
-        record = {
-            'timestamp': timestamp.strftime('%Y-%m-%d %H:%M:%S.%f'),
-            'ue_id': ue_id,
-            'RAT': 'NR',
-            'instant_rate_mbps': cell.get('dl_bitrate', 0) / 1_000_000,
-            'avg_rate_mbps': avg_rate_mbps,
-            'total_dl_bytes': total_dl_bytes,
-            'epre': cell.get('epre'),
-            'ul_path_loss': cell.get('ul_path_loss'),
-            'p_ue': cell.get('p_ue'),
-            'ul_phr': cell.get('ul_phr'),
-            'pusch_snr': cell.get('pusch_snr'),
-            'cqi': cell.get('cqi'),
-            'ri': cell.get('ri'),
-            'dl_mcs': cell.get('dl_mcs'),
-            'ul_mcs': cell.get('ul_mcs'),
-            'ul_n_layer': cell.get('ul_n_layer'),
-            'ul_rank': cell.get('ul_rank'),
-            'dl_retx': cell.get('dl_retx'),
-            'ul_retx': cell.get('ul_retx'),
-            'dl_err': cell.get('dl_err'),
-            'ul_err': cell.get('ul_err'),
-            'pucch1_snr': None, # This field is specific to 4G/LTE.
-            'gain_4g': self.gain_4g,
-            'gain_5g': self.gain_5g,
-            'noise': self.noise,
-        }
-        print(f"NR record: {record}")
-        self.data.append(record)
-        print(f"Logged NR UE[{ue_id}] data at {timestamp.strftime('%H:%M:%S')}")
-
-    def _process_lte_ue(self, ue, timestamp):
+        avg_rate_mbps = self._calculate_avg_rate(ue_id, total_dl_bytes, ts_ns)
+        # pucch1_snr is specific to 4G/LTE and stays empty for NR.
+        instant_rate_mbps = cell.get('dl_bitrate', 0) / 1_000_000
+        self.records.append(RAT_NR, ts_ns, ue_id, cell, instant_rate_mbps, avg_rate_mbps,
+                            total_dl_bytes, self.gain_4g, self.gain_5g, self.noise)
+        self._record_appended(ts_ns, ue_id, instant_rate_mbps, avg_rate_mbps, 'NR')
+
+    def _process_lte_ue(self, ue, ts_ns):
         ue_id = ue['enb_ue_id']
         
         cell = ue.get('cells', [{}])[0]
@@ -169,47 +274,37 @@ class UEMonitor:
                     total_dl_bytes = dl_bytes
                     break
         
-        avg_rate_mbps = self._calculate_avg_rate(ue_id, total_dl_bytes, timestamp)
-        
-        record = {
-            'timestamp': timestamp.strftime('%Y-%m-%d %H:%M:%S.%f'),
-            'ue_id': ue_id,
-            'RAT': 'LTE',
-            'instant_rate_mbps': cell.get('dl_bitrate', 0) / 1_000_000,
-            'avg_rate_mbps': avg_rate_mbps,
-            'total_dl_bytes': total_dl_bytes,
-            'epre': cell.get('epre'),
-            'ul_path_loss': cell.get('ul_path_loss'),
-            'p_ue': cell.get('p_ue'),
-            'pucch1_snr': cell.get('pucch1_snr'),
-            'pusch_snr': cell.get('pusch_snr'),
-            'cqi': cell.get('cqi'),
-            'dl_mcs': cell.get('dl_mcs'),
-            'ul_mcs': cell.get('ul_mcs'),
-            'ul_n_layer': cell.get('ul_n_layer'),
-            # These fields are specific to 5G/NR.
-            'ul_phr': None, 'ri': None, 'ul_rank': None, 'dl_retx': None,
-            'ul_retx': None, 'dl_err': None, 'ul_err': None,
-            'gain_4g': self.gain_4g,
-            'gain_5g': self.gain_5g,
-            'noise': self.noise,
-        }
-        print(f"LTE record: {record}")
-        self.data.append(record)
-        print(f"Logged LTE UE[{ue_id}] data at {timestamp.strftime('%H:%M:%S')}")
+        avg_rate_mbps = self._calculate_avg_rate(ue_id, total_dl_bytes, ts_ns)
+        # ul_phr, ri, ul_rank, dl/ul_retx and dl/ul_err are specific to 5G/NR and stay empty for LTE.
+        instant_rate_mbps = cell.get('dl_bitrate', 0) / 1_000_000
+        self.records.append(RAT_LTE, ts_ns, ue_id, cell, instant_rate_mbps, avg_rate_mbps,
+                            total_dl_bytes, self.gain_4g, self.gain_5g, self.noise)
+        self._record_appended(ts_ns, ue_id, instant_rate_mbps, avg_rate_mbps, 'LTE')
         
-    def _calculate_avg_rate(self, ue_id, current_bytes, timestamp):
-        avg_rate = 0
-        if ue_id in self.ue_states:
-            last_state = self.ue_states[ue_id]
-            time_diff = (timestamp - last_state['time']).total_seconds()
-            if time_diff > 0:
-                bytes_diff = current_bytes - last_state['bytes']
+    def _record_appended(self, ts_ns, ue_id, instant_rate_mbps, avg_rate_mbps, rat):
+        self.recent.append((ts_ns, ue_id, avg_rate_mbps))
+        self.rate_stats.push(ue_id, avg_rate_mbps, ts_ns)
+        if self.grid is not None:
+            # Same metric order as DEFAULT_GRID_METRICS.
+            self.grid.add(rat, self.gain_4g, self.gain_5g, self.noise, ts_ns, (avg_rate_mbps, instant_rate_mbps))
+        self.record_count += 1
+        if self.verbose:
+            print(f"Logged {rat} UE[{ue_id}] data at {time.strftime('%H:%M:%S', time.localtime(ts_ns / 1e9))}, "
+                  f"avg {avg_rate_mbps:.2f} Mbps")
+
+    def _calculate_avg_rate(self, ue_id, current_bytes, ts_ns):
+        avg_rate = 0.0
+        last_state = self.ue_states.get(ue_id)
+        if last_state is not None:
+            last_bytes, last_ns = last_state
+            time_diff_ns = ts_ns - last_ns
+            if time_diff_ns > 0:
+                bytes_diff = current_bytes - last_bytes
                 if bytes_diff >= 0:
-                    avg_rate = (bytes_diff * 8) / (time_diff * 1_000_000) # Mbps
+                    avg_rate = bytes_diff * 8000 / time_diff_ns # Mbps
         
-        # Update state for the current UE
-        self.ue_states[ue_id] = {'bytes': current_bytes, 'time': timestamp}
+        # Update state (bytes, epoch ns) for the current UE
+        self.ue_states[ue_id] = (current_bytes, ts_ns)
         return avg_rate
 
     def on_error(self, ws, error):
@@ -220,47 +315,29 @@ class UEMonitor:
 
     def on_open(self, ws):
         print("WebSocket connection opened.")
-        request = {
-            "stats": True,
-            "message": "ue_get",
-            "message_id": "ue_monitor_script"
-        }
-        self.ws.send(json.dumps(request))
+        self.ws.send(self.ue_get_message())
+
+    def ue_get_message(self):
+        """ue_get request whose message_id carries a sequence number for latency matching."""
+        return json.dumps(dict(UE_GET_REQUEST, message_id=self.poll_stats.next_message_id()))
+
+    def _scenario_ticks(self):
+        """1 Hz scheduler for the scenario loops, on the same timebase as ue_get polling."""
+        return TickScheduler(SCENARIO_RATE_HZ, self.timebase)
 
     def start_iperf(self):
-        if not all([self.ssh_host, self.ssh_user, self.ssh_pass]):
+        if self.traffic is None:
             print("SSH credentials not provided, skipping iperf.")
             return
-
-        try:
-            print(f"Connecting to {self.ssh_user}@{self.ssh_host}...")
-            self.ssh_client = paramiko.SSHClient()
-            self.ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            self.ssh_client.connect(self.ssh_host, username=self.ssh_user, password=self.ssh_pass, timeout=10)
-
-            print("Starting iperf...")
-            iperf_command = "iperf -c 192.168.2.2 -u -b 230m -t 1000000 -i 1\n"
-
-            self.ssh_channel = self.ssh_client.invoke_shell()
-            self.ssh_channel.send(iperf_command)
-            print("iperf command sent.")
-            # A small delay to allow the command to start and shell to be ready.
-            time.sleep(1)
-
-        except Exception as e:
-            print(f"Failed to start iperf: {e}", file=sys.stderr)
-            if self.ssh_client:
-                self.ssh_client.close()
-            self.ssh_client = None
-            self.ssh_channel = None
+        self.traffic.start()
 
     def _nr_lte_switch_loop(self):
         """A loop to control NR-LTE gain switching."""
         print("NR-LTE switch test started.")
-        switch_start_time = time.time()
+        ticks = self._scenario_ticks()
 
         while self.running:
-            elapsed_time = time.time() - switch_start_time
+            elapsed_time = ticks.elapsed()
 
             if elapsed_time > self.total_switch_time:
                 print("NR-LTE switch test finished.")
@@ -302,15 +379,15 @@ class UEMonitor:
                 }
                 self.ws.send(json.dumps(gain_msg))
             
-            time.sleep(1)
+            ticks.wait()
 
     def _elevator_switch_loop(self):
         """A loop to control gain for elevator simulation."""
         print("Elevator simulation test started.")
-        switch_start_time = time.time()
+        ticks = self._scenario_ticks()
 
         while self.running:
-            elapsed_time = time.time() - switch_start_time
+            elapsed_time = ticks.elapsed()
 
             if elapsed_time > self.elevator_total_time:
                 print("Elevator simulation test finished.")
@@ -333,15 +410,15 @@ class UEMonitor:
                 }
                 self.ws.send(json.dumps(gain_msg))
             
-            time.sleep(1)
+            ticks.wait()
 
     def _noise_switch_loop(self):
         """A loop to control noise for the noise switch test."""
         print("Noise switch test started.")
-        switch_start_time = time.time()
+        ticks = self._scenario_ticks()
 
         while self.running:
-            elapsed_time = time.time() - switch_start_time
+            elapsed_time = ticks.elapsed()
 
             if elapsed_time > self.total_noise_time:
                 print("Noise switch test finished.")
@@ -373,93 +450,170 @@ class UEMonitor:
                 }
                 self.ws.send(json.dumps(noise_msg))
             
-            time.sleep(1)
+            ticks.wait()
 
     def _heatmap_test_loop(self):
-        """步进-保持-测量模式，支持独立的4G/5G增益和恢复逻辑"""
+        """步进-保持-测量模式，支持独立的4G/5G增益和恢复逻辑，以及断点续测；测试顺序由 SweepPlanner 决定"""
         print("Heatmap data collection test started with disconnection handling.")
-
-        # 新增：用于提前终止测试的标志
-        abort_all = False
-
-        # 外层循环：遍历(gain_4g, gain_5g)坐标点 (X轴)
-        for gain_idx, (gain_4g, gain_5g) in enumerate(self.gain_grid):
-            if not self.running or abort_all: break
-
-            # 内层循环：遍历噪声等级 (Y轴)
-            for noise_idx, noise_level in enumerate(self.noise_grid):
-                if not self.running or abort_all: break
-
-                is_first_point = (gain_idx == 0 and noise_idx == 0)
-                retries = self.max_retries
-                successful_measurement = False
-
-                while not successful_measurement and retries > 0:
-                    print(
-                        f"--- Testing point (Gain 4G: {gain_4g}, 5G: {gain_5g}, Noise: {noise_level}) for {self.dwell}s. Tries left: {retries} ---")
-
-                    # 设置当前的增益和噪声
-                    self._send_gain(gain_4g, gain_5g)
-                    self._send_noise(noise_level)
-
-                    self.gain_4g = gain_4g
-                    self.gain_5g = gain_5g
-                    self.noise = noise_level
-
-                    # 等待并采集数据
-                    time.sleep(5)
-                    # 采集 dwell 秒数据
-                    time.sleep(self.dwell)
-
-                    # 直接用 self.data 的最后 dwell 条数据计算均值
-                    if len(self.data) >= self.dwell:
-                        recent_data = self.data[-self.dwell:]
-                    else:
-                        recent_data = self.data[:]
-                    if recent_data:
-                        avg_rates = [item.get('avg_rate_mbps', 0) for item in recent_data if isinstance(item, dict)]
-                        mean_throughput = sum(avg_rates) / len(avg_rates) if avg_rates else 0
-                    else:
-                        mean_throughput = 0
-
-                    # 判断测量是否成功
-                    if mean_throughput > self.min_throughput_mbps:
-                        print(f"\033[32mPASSED: Mean throughput = {mean_throughput:.2f} Mbps\033[0m")
-                        successful_measurement = True
-                    else:
-                        retries -= 1
-                        print(
-                            f"\033[31mFAILED: Mean throughput = {mean_throughput:.2f} Mbps. Starting recovery procedure...\033[0m")
-
-                        if retries > 0:
-                            self.stop_iperf()
-
-                            print(f"Resetting to safe state (Gain: {self.tx_max_gain}, Noise: 0) and wait 10s.")
-                            self._send_noise(-120)
-                            self._send_gain(self.tx_max_gain, self.tx_max_gain)
-                            time.sleep(10)
-
-                            self._ramp_down_gain(gain_4g, gain_5g)
-
-                            print(f"Restoring noise to {noise_level} and restarting iperf.")
-                            self._send_noise(noise_level)
-                            self.start_iperf()
-                            time.sleep(5)  # 等待网络稳定
-
-                # 新增逻辑：如果在最低噪声下（idx==0）且所有重试都失败，终止所有后续测试
-                if noise_idx == 0 and not successful_measurement:
-                    print(f"\033[31mABORT: Gain (4G: {gain_4g}, 5G: {gain_5g}) at lowest noise has zero throughput. Stopping all further tests.\033[0m")
-                    abort_all = True
-                    break
-
-                if not successful_measurement:
-                    print(
-                        f"--- All retries failed for Gain pair ({gain_4g}, {gain_5g}). Skipping remaining noise levels for this pair. ---")
-                    break
-
+        state = self.sweep_state
+        planner = self.planner = SweepPlanner(self.gain_grid, self.noise_grid, self.sweep_strategy,
+                                              self.min_throughput_mbps, self.max_retries)
+        points_resumed = 0
+        if self.resume:
+            state.load()
+            # 已完成的点直接沿用状态文件中的结果，失败点照常参与后续的跳过/剪枝判断
+            for point in state.points.values():
+                key = (point['gain_4g'], point['gain_5g'], point['noise'])
+                planner.report(key, point['status'] == 'passed', point['mean_mbps'], point.get('tries'))
+                points_resumed += 1
+            print(f"Resuming from {state.path}: {points_resumed} points already finished.")
+
+        estimate = estimate_sweep(self.gain_grid, self.noise_grid, self.sweep_strategy, self._sweep_costs(),
+                                  self.min_throughput_mbps, self.max_retries)
+        print(f"Sweep of {planner.n_points} points, {format_estimate(self.sweep_strategy, estimate).strip()}")
+
+        points_measured = points_converged = 0
+        dwell_total = 0.0
+        while self.running:
+            point = planner.next_point()
+            if point is None:
+                break
+            gain_4g, gain_5g, noise_level = point
+            successful_measurement = self._measure_with_retries(gain_4g, gain_5g, noise_level,
+                                                                planner.retries_for(point))
+            if successful_measurement is None:
+                break  # 停止监控时中断，当前点不写入状态文件
+            planner.report(point, successful_measurement, self._last_mean, self._tries)
+            points_measured += self._tries
+            dwell_total += self._dwell_spent
+            points_converged += self._converged_count
+            if not successful_measurement:
+                print(f"--- Point ({gain_4g}, {gain_5g}, {noise_level}) failed; points it rules out are skipped. ---")
+
+        if planner.aborted:
+            print("\033[31mABORT: a gain pair had zero throughput at the lowest noise. Stopped all further tests.\033[0m")
         print("\nHeatmap data collection finished.")
+        print(f"Sweep: {planner.summary()}.")
+        if points_resumed:
+            print(f"{points_resumed} points taken from {state.path}.")
+        if points_measured:
+            print(f"{points_measured} measurements, {points_converged} converged before max dwell, "
+                  f"{dwell_total / 60:.1f} min measuring (avg {dwell_total / points_measured:.1f}s per point).")
         self.stop_monitoring()
 
+    def _sweep_costs(self):
+        policy = self.dwell_policy
+        return SweepCosts(settle=policy.settle, pass_dwell=(policy.min_dwell + policy.max_dwell) / 2,
+                          fail_dwell=policy.min_dwell, reset_wait=self.recovery_wait,
+                          ramp_step_time=self.ramp_step_time, iperf_wait=self.iperf_restart_wait,
+                          tx_max_gain=self.tx_max_gain)
+
+    def _measure_with_retries(self, gain_4g, gain_5g, noise_level, retries=None):
+        """
+        测量一个点，失败时执行恢复流程后重试（最多 retries 次，默认 max_retries）。结果写入状态文件；
+        返回是否成功，监控被停止时返回 None
+        """
+        retries = self.max_retries if retries is None else retries
+        self._tries = self._converged_count = 0
+        self._dwell_spent = 0.0
+
+        while retries > 0:
+            print(
+                f"--- Testing point (Gain 4G: {gain_4g}, 5G: {gain_5g}, Noise: {noise_level}) for "
+                f"{self.dwell_policy.min_dwell:g}-{self.dwell_policy.max_dwell:g}s. Tries left: {retries} ---")
+
+            # 设置当前的增益和噪声
+            self._send_gain(gain_4g, gain_5g)
+            self._send_noise(noise_level)
+
+            self.gain_4g = gain_4g
+            self.gain_5g = gain_5g
+            self.noise = noise_level
+
+            # 等待链路稳定后自适应驻留测量，按 UE 分别统计后取各 UE 均值的平均
+            mean_throughput, dwell_time, converged, per_ue = self._measure_point()
+            if not self.running:
+                return None
+            self._tries += 1
+            self._dwell_spent += self.dwell_policy.settle + dwell_time
+            self._converged_count += converged
+            self._last_mean = mean_throughput
+            dwell_note = (f"{dwell_time:.1f}s, {sum(s[0] for s in per_ue.values())} samples, "
+                          f"{'converged' if converged else 'max dwell reached'}")
+
+            # 判断测量是否成功
+            if mean_throughput > self.min_throughput_mbps:
+                print(f"\033[32mPASSED: Mean throughput = {mean_throughput:.2f} Mbps ({dwell_note})\033[0m")
+                self._checkpoint(gain_4g, gain_5g, noise_level, 'passed', mean_throughput, dwell_time,
+                                 converged, per_ue)
+                return True
+
+            retries -= 1
+            print(
+                f"\033[31mFAILED: Mean throughput = {mean_throughput:.2f} Mbps ({dwell_note}). "
+                f"Starting recovery procedure...\033[0m")
+
+            if retries > 0:
+                self.stop_iperf()
+
+                print(f"Resetting to safe state (Gain: {self.tx_max_gain}, Noise: 0) and wait {self.recovery_wait:g}s.")
+                self._send_noise(-120)
+                self._send_gain(self.tx_max_gain, self.tx_max_gain)
+                time.sleep(self.recovery_wait)
+
+                self._ramp_down_gain(gain_4g, gain_5g)
+
+                print(f"Restoring noise to {noise_level} and restarting iperf.")
+                self._send_noise(noise_level)
+                self.start_iperf()
+                time.sleep(self.iperf_restart_wait)  # 等待网络稳定
+
+        self._checkpoint(gain_4g, gain_5g, noise_level, 'failed', mean_throughput, dwell_time, converged, per_ue)
+        return False
+
+    def _checkpoint(self, gain_4g, gain_5g, noise_level, status, mean_throughput, dwell_time, converged, per_ue):
+        # 先把该点的原始记录交给输出，再写状态文件，续测时不会出现有结果但无记录的点
+        self.records.flush()
+        if self.sink.error is not None:
+            # 记录已无法写入输出，不再标记该点完成，续测时重新测量
+            return
+        try:
+            self.sweep_state.record(gain_4g, gain_5g, noise_level, status, mean_throughput, dwell_time,
+                                    converged, self._tries, per_ue)
+        except OSError as e:
+            print(f"Failed to write sweep state {self.sweep_state.path}: {e}", file=sys.stderr)
+        self._write_grid()
+
+    def _write_grid(self):
+        if self.grid is None:
+            return
+        try:
+            self.grid.write(self.grid_file)
+        except OSError as e:
+            print(f"Failed to write grid file {self.grid_file}: {e}", file=sys.stderr)
+
+    def _measure_point(self):
+        """
+        等待 settle 秒后清空每个 UE 的滚动统计（此后才收到的样本才计入），按轮询节拍检查收敛，
+        返回 (吞吐均值, 驻留秒数, 是否收敛, 各 UE 统计 {ue_id: (样本数, 均值, 标准差, 置信区间半宽)})
+        """
+        policy = self.dwell_policy
+        time.sleep(policy.settle)
+        # 丢弃 settle 期间的样本，包括仍在接收队列中、收到时间早于此刻的样本；
+        # 窗口按 max_dwell * 轮询频率设置，均值覆盖整个驻留时间而不只是最后一段
+        self.rate_stats.reset(time.time_ns(), window=policy.window(self.poll_rate))
+        ticks = TickScheduler(self.poll_rate, self.timebase)
+        start = time.monotonic()
+        elapsed, converged, snapshot = 0.0, False, {}
+        while self.running:
+            ticks.wait()
+            elapsed = time.monotonic() - start
+            snapshot = self.rate_stats.snapshot()
+            finished, converged = policy.done(elapsed, snapshot)
+            if finished:
+                break
+        return point_throughput(snapshot), elapsed, converged, snapshot
+
     def _ramp_down_gain(self, target_gain_4g, target_gain_5g):
         """【新增】一个辅助函数，用于将增益从最大值平滑地降低到各自的目标值"""
         print(f"Ramping gain down from {self.tx_max_gain} towards (4G: {target_gain_4g}, 5G: {target_gain_5g}).")
@@ -473,7 +627,7 @@ class UEMonitor:
             current_5g = max(g, target_gain_5g)
 
             self._send_gain(current_4g, current_5g)
-            time.sleep(5)
+            time.sleep(self.ramp_step_time)
 
             # 如果两个增益都已达到其目标值，则可以提前结束斜坡
             if current_4g == target_gain_4g and current_5g == target_gain_5g:
@@ -506,21 +660,33 @@ class UEMonitor:
             self.ws.send(json.dumps(noise_msg))
 
     def stop_iperf(self):
-        if self.ssh_channel:
-            try:
-                print("Stopping iperf...")
-                # Send Ctrl+C
-                self.ssh_channel.send('\x03')
-                self.ssh_channel.close()
-                print("iperf stopped.")
-            except Exception as e:
-                print(f"Error stopping iperf: {e}", file=sys.stderr)
-
-        if self.ssh_client:
-            self.ssh_client.close()
-            print("SSH connection closed.")
+        """Stop iperf but keep the SSH connection for the next start_iperf()."""
+        if self.traffic is not None:
+            self.traffic.stop()
+
+    def start_processing(self):
+        if self.rx_worker is None:
+            self.rx_worker = threading.Thread(target=self._process_frames, name='rx-worker', daemon=True)
+            self.rx_worker.start()
+
+    def stop_processing(self):
+        """Let the worker finish every frame already received, then stop it."""
+        if self.rx_worker is not None:
+            self.rx_queue.put(None)
+            self.rx_worker.join()
+            self.rx_worker = None
+        if self.rx_frames or self.rx_dropped:
+            avg_ms = self.rx_latency_total / self.rx_frames * 1000 if self.rx_frames else 0
+            print(f"Receive queue: {self.rx_frames} frames processed, {self.rx_dropped} dropped on overflow, "
+                  f"queue latency avg {avg_ms:.1f} ms / max {self.rx_latency_max * 1000:.1f} ms")
+        if self.capture is not None:
+            self.capture.close()
+            print(f"Raw capture {self.capture.path}: {self.capture.summary()}")
+            self.capture = None
 
     def start_monitoring(self):
+        self.sink.start()
+        self.start_processing()
         self.start_iperf()
         websocket.enableTrace(False)
         
@@ -534,6 +700,8 @@ class UEMonitor:
 
         self.running = True
         self.start_time = time.time()
+        self.timebase = time.monotonic()
+        self.poll_ticks = TickScheduler(self.poll_rate, self.timebase)
         ws_thread = threading.Thread(target=self.ws.run_forever, daemon=True)
         ws_thread.start()
 
@@ -553,19 +721,23 @@ class UEMonitor:
         try:
             while self.running:
                 if self.ws and self.ws.sock and self.ws.sock.connected:
-                    request = {
-                        "stats": True,
-                        "message": "ue_get",
-                        "message_id": "ue_monitor_script"
-                    }
-                    self.ws.send(json.dumps(request))
+                    self.ws.send(self.ue_get_message())
                 
-                if self.time_limit and (time.time() - self.start_time) >= self.time_limit:
+                # Hand a partly filled chunk to the sink once it is older than the flush interval.
+                self.records.flush(force=False)
+
+                if self.sink.error is not None:
+                    print(f"\nRecord sink failed ({self.sink.error}), stopping.", file=sys.stderr)
+                    self.stop_monitoring()
+                    return
+
+                if self.time_limit and self.poll_ticks.elapsed() >= self.time_limit:
                     print(f"\nTime limit of {self.time_limit} seconds reached.")
                     self.stop_monitoring()
                     return
-                    
-                time.sleep(1)
+
+                # Sleep until the next deadline rather than a fixed time, so the period does not drift.
+                self.poll_ticks.wait()
         except KeyboardInterrupt:
             self.stop_monitoring()
 
@@ -574,25 +746,32 @@ class UEMonitor:
         self.running = False
         if self.ws:
             self.ws.close()
-        self.stop_iperf()
+        self.stop_processing()
+        if self.poll_ticks:
+            print(f"Polling: {self.poll_ticks.summary()}")
+            print(f"ue_get: {self.poll_stats.summary()}")
+        if self.traffic is not None:
+            print(f"iperf: {self.traffic.summary()}")
+            self.traffic.close()
         self.save_data()
 
     def save_data(self):
-        if not self.data:
+        # Records have already been streamed to the sink; flush what is still buffered and close it.
+        self.records.flush()
+        if not self.record_count:
+            self.sink.close()
             print("No data collected, not writing file.")
             return
 
-        print(f"\nSaving {len(self.data)} records to {self.output_file}...")
-        df = pd.DataFrame(self.data)
-        
-        # Reorder columns according to the header and fill missing with None.
-        df = df.reindex(columns=CSV_HEADER)
-        
+        print(f"\nFlushing {self.record_count} records to {getattr(self.sink, 'directory', self.sink.output_file)}...")
         try:
-            df.to_csv(self.output_file, index=False)
-            print("Save complete.")
-        except Exception as e:
-            print(f"Error saving data to CSV: {e}", file=sys.stderr)
+            self.sink.close()
+        finally:
+            # The grid is written even if the record output failed; it holds its own aggregates.
+            if self.grid is not None:
+                self._write_grid()
+                print(f"Grid of {len(self.grid)} cells written to {self.grid_file}.")
+        print(f"Save complete ({self.sink.records_written} records written).")
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Monitor 4G/5G UE parameters via WebSocket and log to CSV.')
@@ -604,6 +783,17 @@ def parse_arguments():
     parser.add_argument('--ssh-host', type=str, default="192.168.50.66", help='SSH host IP.')
     parser.add_argument('--ssh-user', type=str, default="sdr", help='SSH username.')
     parser.add_argument('--ssh-pass', type=str, default="123123", help='SSH password.')
+    parser.add_argument('--ssh-port', type=int, default=22, help='SSH port (default: 22).')
+    parser.add_argument('--iperf-cmd', type=str, default=IPERF_COMMAND,
+                        help=f'iperf command run on the SSH host (default: "{IPERF_COMMAND}").')
+    parser.add_argument('--iperf-server-host', type=str,
+                        help='Host receiving the iperf traffic, reached over SSH with the same credentials; '
+                             'its iperf server reports give the link metrics (default: none, no iperf stream).')
+    parser.add_argument('--iperf-server-port', type=int, default=22, help='SSH port of the iperf server host.')
+    parser.add_argument('--iperf-server-cmd', type=str, default=IPERF_SERVER_COMMAND,
+                        help=f'iperf server command run on the receiving host (default: "{IPERF_SERVER_COMMAND}").')
+    parser.add_argument('--iperf-stream', type=str,
+                        help='CSV for the per-interval iperf server reports (default: <output file>.iperf.csv).')
     parser.add_argument('--nr-lte-switch', action='store_true',
                         help='Enable NR-LTE switch test with dynamic gain control.')
     parser.add_argument('--elevator-switch', action='store_true',
@@ -612,19 +802,106 @@ def parse_arguments():
                         help='Enable noise switch test.')
     parser.add_argument('--heatmap-test', action='store_true',
                         help='Enable heatmap data collection test.')
+    parser.add_argument('--settle', type=float, default=2.0,
+                        help='Heatmap test: seconds to wait after changing gain/noise before measuring (default: 2).')
+    parser.add_argument('--min-dwell', type=float, default=3.0,
+                        help='Heatmap test: minimum measuring time per point in seconds (default: 3).')
+    parser.add_argument('--max-dwell', type=float, default=15.0,
+                        help='Heatmap test: maximum measuring time per point in seconds (default: 15).')
+    parser.add_argument('--converge', choices=CONVERGENCE_CRITERIA, default='ci',
+                        help='Heatmap test: end a point when the CI half-width (ci) or the standard deviation (std) '
+                             'of every UE\'s throughput is within tolerance (default: ci).')
+    parser.add_argument('--rel-tol', type=float, default=0.05,
+                        help='Convergence tolerance relative to the mean throughput (default: 0.05).')
+    parser.add_argument('--abs-tol', type=float, default=0.5,
+                        help='Convergence tolerance floor in Mbps, for points near zero throughput (default: 0.5).')
+    parser.add_argument('--sweep', choices=SWEEP_STRATEGIES, default='nested',
+                        help='Heatmap test point order: nested (original grid order; default) or planned '
+                             '(strongest first, prune points implied to fail).')
+    parser.add_argument('--state-file', type=str,
+                        help='Heatmap test: sweep checkpoint file (default: <output file>.sweep.json).')
+    parser.add_argument('--resume', action='store_true',
+                        help='Heatmap test: skip points already finished in the state file and append to the output file.')
+    parser.add_argument('--grid-file', type=str,
+                        help='Write per-(RAT, gain, noise) aggregates to this grid file for heat_map.py '
+                             '(default for --heatmap-test: <output file>.grid.csv).')
+    parser.add_argument('--grid-tail', type=int, default=DEFAULT_TAIL_N,
+                        help=f'Last-N samples kept per grid cell (default: {DEFAULT_TAIL_N}).')
+    parser.add_argument('--capture-raw', nargs='?', const='', metavar='PATH',
+                        help='Also keep every raw ue_get frame in a compressed, indexed JSONL capture for later '
+                             'replay (default path: <output file>.capture.jsonl.gz).')
+    parser.add_argument('--endpoints', nargs='+', metavar='WS_URL',
+                        help='Collect from several callboxes concurrently with the asyncio engine; '
+                             'each endpoint writes to its own output file tagged with host and port.')
+    parser.add_argument('--poll-rate', type=float, default=DEFAULT_POLL_RATE_HZ,
+                        help=f'ue_get polling rate in Hz per endpoint, e.g. 10 for handover studies '
+                             f'(default: {DEFAULT_POLL_RATE_HZ:g}).')
+    parser.add_argument('--sink-format', choices=SINK_FORMATS, default='csv',
+                        help='Record sink format: csv (CSV_HEADER column order), binary (columnar batches) or '
+                             'segments (rolling time-indexed binary segments in <output file>.segments/).')
+    parser.add_argument('--segment-mb', type=float, default=DEFAULT_SEGMENT_BYTES / 2**20,
+                        help=f'segments: start a new segment at this size in MB '
+                             f'(default: {DEFAULT_SEGMENT_BYTES // 2**20}).')
+    parser.add_argument('--segment-roll', choices=SEGMENT_ROLLS, default='hour',
+                        help='segments: roll by size only, or also at every local hour (default: hour).')
+    parser.add_argument('--flush-records', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help=f'Write a batch every N records (default: {DEFAULT_CHUNK_ROWS}).')
+    parser.add_argument('--flush-ms', type=int, default=DEFAULT_FLUSH_MS,
+                        help=f'Write a batch at least every T milliseconds (default: {DEFAULT_FLUSH_MS}).')
+    parser.add_argument('--fsync', choices=FSYNC_POLICIES, default='interval',
+                        help='fsync policy: never, after every batch, or at most every 5s (default: interval).')
+    parser.add_argument('--rx-queue-size', type=int, default=DEFAULT_RX_QUEUE_SIZE,
+                        help=f'Maximum raw frames waiting for processing (default: {DEFAULT_RX_QUEUE_SIZE}).')
+    parser.add_argument('--tail-size', type=int, default=DEFAULT_TAIL_SIZE,
+                        help=f'Number of recent records kept in memory (default: {DEFAULT_TAIL_SIZE}).')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='Print a line for every logged record.')
     return parser.parse_args()
 
 def main():
     args = parse_arguments()
+    if args.endpoints:
+        from Collect.async_collector import run_async_collector
+        print(f"Starting asyncio collection from {len(args.endpoints)} endpoints...")
+        print("Press Ctrl+C to stop.")
+        try:
+            run_async_collector(args.endpoints, args.output_file, 1 / args.poll_rate, args.time_limit,
+                                args.sink_format, fsync=args.fsync, chunk_rows=args.flush_records,
+                                flush_interval_ms=args.flush_ms, verbose=args.verbose)
+        except RecordSinkError:
+            sys.exit(1)
+        return
+
+    sink_options = {}
+    if args.sink_format == 'segments':
+        sink_options = dict(segment_bytes=int(args.segment_mb * 2**20), roll=args.segment_roll)
+    sink = create_sink(args.sink_format, args.output_file, fsync=args.fsync,
+                       append=args.resume and args.heatmap_test, **sink_options)
     monitor = UEMonitor(args.ws_url, args.output_file, args.time_limit,
                         args.ssh_host, args.ssh_user, args.ssh_pass,
-                        args.nr_lte_switch, args.elevator_switch, args.noise_switch, args.heatmap_test)
+                        args.nr_lte_switch, args.elevator_switch, args.noise_switch, args.heatmap_test,
+                        sink=sink, tail_size=args.tail_size, rx_queue_size=args.rx_queue_size,
+                        chunk_rows=args.flush_records, flush_interval_ms=args.flush_ms, verbose=args.verbose,
+                        poll_rate=args.poll_rate,
+                        dwell_policy=DwellPolicy(args.settle, args.min_dwell, args.max_dwell, args.converge,
+                                                 args.rel_tol, args.abs_tol),
+                        state_file=args.state_file, resume=args.resume, sweep_strategy=args.sweep,
+                        grid_file=args.grid_file, grid_tail=args.grid_tail,
+                        capture_file=None if args.capture_raw is None else
+                        args.capture_raw or default_capture_file(args.output_file),
+                        ssh_port=args.ssh_port, iperf_command=args.iperf_cmd, iperf_stream_file=args.iperf_stream,
+                        iperf_server_host=args.iperf_server_host, iperf_server_port=args.iperf_server_port,
+                        iperf_server_command=args.iperf_server_cmd)
 
     print("Starting UE monitoring...")
     if args.time_limit:
         print(f"Monitoring will automatically stop after {args.time_limit} seconds.")
     print("Press Ctrl+C to stop.")
-    monitor.start_monitoring()
+    try:
+        monitor.start_monitoring()
+    except RecordSinkError as e:
+        print(f"Save FAILED: {e}", file=sys.stderr)
+        sys.exit(1)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,191 @@
+# python
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+COMPARE_OPS = {
+    'diff': ('-', lambda a, b: a - b),
+    'ratio': ('/', lambda a, b: a / b),
+}
+
+
+def _sorted_axis(df, x_col, fields):
+    """
+    取出 x 轴与字段列并按 x 升序排列（已有序时不再排序），x 统一转换为 float
+    datetime 类型的 x 轴转换为纳秒整数
+    """
+    sub = df[[x_col] + [f for f in fields if f in df.columns]].dropna(subset=[x_col])
+    x = sub[x_col]
+    if pd.api.types.is_datetime64_any_dtype(x):
+        x = x.astype('int64')
+    x = x.to_numpy(dtype='float64')
+    if len(x) > 1 and not np.all(x[1:] >= x[:-1]):
+        order = np.argsort(x, kind='stable')
+        x = x[order]
+        sub = sub.iloc[order]
+    return x, sub
+
+
+def check_alignable_axis(data_dict, x_col):
+    """对齐需要数值或时间类型的 x 轴，否则抛出 ValueError"""
+    for file_name, df in data_dict.items():
+        if x_col not in df.columns:
+            raise ValueError(f"文件 {file_name} 中没有 X 轴列 {x_col}")
+        x = df[x_col]
+        if not (pd.api.types.is_numeric_dtype(x) or pd.api.types.is_datetime64_any_dtype(x)) \
+                or pd.api.types.is_bool_dtype(x):
+            raise ValueError(f"对齐对比需要数值或时间类型的 X 轴，{file_name} 的 {x_col} 为 {x.dtype}")
+
+
+def align_datasets(data_dict, fields, x_col='delta_seconds', method='asof', step=1.0, tolerance=0.5,
+                   reference=None, ue_id=None, rat=None, by=None):
+    """
+    把多个数据集的字段对齐到同一时间轴，返回宽表：x_col 列加上 "文件名:字段" 列
+    method='grid': 在所有文件重叠的时间范围内按 step 生成公共网格，线性插值，
+                   离最近原始采样点超过 tolerance 的网格点置为 NaN
+    method='asof': 以 reference 文件（默认第一个）的采样时刻为基准，
+                   其它文件用 merge_asof 取 tolerance 内最近的采样
+    x 为 datetime 时 step/tolerance 的单位仍为秒。
+    ue_id / rat 只对齐指定的 UE 与制式；by 为分组列（如 ('RAT', 'ue_id')）时各组分别对齐后纵向拼接，
+    结果带有分组列。多 UE 文件的采样时刻相同，不分组时 asof 会把不同 UE 的行配对
+    """
+    if not data_dict:
+        return pd.DataFrame(columns=[x_col])
+    check_alignable_axis(data_dict, x_col)
+
+    filtered = {}
+    for file_name, df in data_dict.items():
+        if ue_id is not None and 'ue_id' in df.columns:
+            df = df[df['ue_id'] == ue_id]
+        if rat is not None and 'RAT' in df.columns:
+            df = df[df['RAT'] == rat]
+        filtered[file_name] = df
+
+    by = [col for col in (by or ()) if all(col in df.columns for df in filtered.values())]
+    if not by:
+        return _align_group(filtered, fields, x_col, method, step, tolerance, reference)
+
+    reference = reference or next(iter(filtered))
+    groups = {name: dict(list(df.groupby(by, sort=True))) for name, df in filtered.items()}
+    # asof 以参考文件中出现的组为准；grid 只对齐所有文件都有的组
+    keys = set(groups[reference]) if method == 'asof' else set.intersection(*(set(g) for g in groups.values()))
+    parts = []
+    for key in sorted(keys):
+        part = _align_group({name: g.get(key, filtered[name].iloc[:0]) for name, g in groups.items()},
+                            fields, x_col, method, step, tolerance, reference)
+        for col, value in zip(by, key):
+            part[col] = value
+        parts.append(part)
+    if not parts:
+        return pd.DataFrame(columns=[x_col, *by])
+    aligned = pd.concat(parts, ignore_index=True)
+    return aligned[[x_col, *by, *[c for c in aligned.columns if c != x_col and c not in by]]]
+
+
+def _align_group(data_dict, fields, x_col, method, step, tolerance, reference):
+    is_datetime = pd.api.types.is_datetime64_any_dtype(next(iter(data_dict.values()))[x_col])
+    scale = 1e9 if is_datetime else 1.0
+
+    series = {}
+    for file_name, df in data_dict.items():
+        series[file_name] = _sorted_axis(df, x_col, fields)
+
+    if method == 'grid':
+        non_empty = [x for x, _ in series.values() if len(x)]
+        start = max(x[0] for x in non_empty) if non_empty else 0.0
+        end = min(x[-1] for x in non_empty) if non_empty else -1.0
+        grid = np.arange(start, end + step * scale / 2, step * scale) if end >= start else np.array([])
+        # arange 的终点放宽了半个步长以包含 end 本身，超出重叠范围的点会被插值钳位成虚假样本（容差只吸收浮点误差）
+        grid = grid[grid <= end + step * scale * 1e-9]
+        result = {x_col: grid}
+        for file_name, (x, sub) in series.items():
+            if not len(x):
+                continue
+            # 网格点到最近原始采样点的距离，用于屏蔽数据缺口
+            pos = np.clip(np.searchsorted(x, grid), 1, max(len(x) - 1, 1))
+            nearest = np.minimum(np.abs(grid - x[pos - 1]), np.abs(x[np.minimum(pos, len(x) - 1)] - grid))
+            gap = nearest > tolerance * scale
+            for field in fields:
+                if field not in sub.columns:
+                    continue
+                y = sub[field].to_numpy(dtype='float64')
+                valid = ~np.isnan(y)
+                values = np.interp(grid, x[valid], y[valid]) if valid.any() else np.full(len(grid), np.nan)
+                values[gap] = np.nan
+                result[f"{file_name}:{field}"] = values
+        aligned = pd.DataFrame(result)
+    elif method == 'asof':
+        reference = reference or next(iter(series))
+        ref_x, ref_sub = series[reference]
+        aligned = pd.DataFrame({x_col: ref_x})
+        for file_name, (x, sub) in series.items():
+            values = sub.drop(columns=x_col).reset_index(drop=True)
+            if file_name == reference:
+                aligned = pd.concat([aligned, values.add_prefix(f"{file_name}:")], axis=1)
+                continue
+            right = values.add_prefix(f"{file_name}:")
+            right['__x__'] = x
+            aligned = pd.merge_asof(aligned, right, left_on=x_col, right_on='__x__',
+                                    direction='nearest', tolerance=tolerance * scale).drop(columns='__x__')
+    else:
+        raise ValueError(f"未知的对齐方式: {method}")
+
+    if is_datetime:
+        aligned[x_col] = pd.to_datetime(aligned[x_col].astype('int64'))
+    return aligned
+
+
+def derive_comparison(aligned, file_a, file_b, field, op='diff'):
+    """
+    由对齐结果计算 A-B 或 A/B 序列，比值中的除零结果置为 NaN
+    """
+    _, func = COMPARE_OPS[op]
+    a = aligned[f"{file_a}:{field}"]
+    b = aligned[f"{file_b}:{field}"]
+    return func(a, b).replace([np.inf, -np.inf], np.nan)
+
+
+def comparison_data_dict(aligned, file_a, file_b, fields, x_col, op='diff', by=None):
+    """
+    把对比序列包装成 {标签: DataFrame}，可直接传给 plot_with_* 系列函数。
+    aligned 按 by 分组对齐时每组一条序列，标签后附分组值，如 "A - B [NR 1]"
+    """
+    symbol, _ = COMPARE_OPS[op]
+    label = f"{file_a} {symbol} {file_b}"
+    by = [col for col in (by or ()) if col in aligned.columns]
+    groups = aligned.groupby(by, sort=True) if by else [((), aligned)]
+    result = {}
+    for key, group in groups:
+        derived = {x_col: group[x_col].reset_index(drop=True)}
+        for field in fields:
+            if f"{file_a}:{field}" in group.columns and f"{file_b}:{field}" in group.columns:
+                derived[field] = derive_comparison(group, file_a, file_b, field, op).reset_index(drop=True)
+        suffix = f" [{' '.join(str(v) for v in key)}]" if by else ""
+        result[label + suffix] = pd.DataFrame(derived)
+    return result
+
+
+class AlignmentCache:
+    """
+    缓存对齐结果，键为 (数据指纹, 字段, 对齐参数)，超过 max_entries 时淘汰最久未用的结果
+    """
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+
+    def align(self, data_dict, fields, fingerprints, **kwargs):
+        key = (tuple((name, fingerprints[name]) for name in data_dict), tuple(sorted(fields)),
+               tuple(sorted(kwargs.items())))
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        aligned = align_datasets(data_dict, fields, **kwargs)
+        self._cache[key] = aligned
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return aligned
+
+    def clear(self):
+        self._cache.clear()
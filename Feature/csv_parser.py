@@ -7,6 +7,15 @@ from Feature.logging_config import configure_logging
 
 configure_logging()
 
+# 时间列按优先级查找：采集器输出 timestamp，其它来源常用 datetime
+TIME_COLUMNS = ('timestamp', 'datetime')
+TIMESTAMP_FORMATS = ('%M:%S.%f', '%H:%M:%S.%f', '%Y-%m-%d %H:%M:%S.%f')
+
+
+def find_time_column(columns):
+    """返回第一个存在的时间列名，没有时返回 None"""
+    return next((c for c in TIME_COLUMNS if c in columns), None)
+
 def fix_timestamp(ts):
     """
     修复时间戳格式，支持 MM:SS.ms 和 HH:MM:SS.ms 格式及其它
@@ -26,12 +35,37 @@ def fix_timestamp(ts):
     logging.warning(f"无法解析时间戳: {ts}")
     return None
 
-def parse_complex_csv(file_path):
+def parse_timestamps(series):
+    """
+    fix_timestamp 的向量化版本：按相同的格式优先级整列解析，
+    固定格式都不匹配的值（如整秒的 "2024-05-02 12:00:00"）再逐个按通用格式解析，仍失败的行为 NaT
+    """
+    parsed = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+    for fmt in (*TIMESTAMP_FORMATS, 'mixed'):
+        missing = parsed.isna() & series.notna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(series[missing], format=fmt, errors='coerce')
+
+    failed = parsed.isna() & series.notna()
+    if failed.any():
+        logging.warning(f"无法解析 {failed.sum()} 个时间戳，例如: {series[failed].iloc[0]}")
+    return parsed
+
+def parse_complex_csv(file_path, drop_unparsed=False):
     """
     解析CSV文件，转换时间戳并返回DataFrame
+    file_path 可以是文件路径，也可以是文件对象（如 Streamlit 上传的文件）
+    时间取 timestamp 列，没有时取 datetime 列，两者都没有时抛出 ValueError；
+    drop_unparsed=True 时丢弃时间无法解析的行
     """
     df = pd.read_csv(file_path)
-    df['pd_time'] = df['timestamp'].apply(fix_timestamp)
+    time_col = find_time_column(df.columns)
+    if time_col is None:
+        raise ValueError(f"缺少时间列（需要 {' 或 '.join(TIME_COLUMNS)}）")
+    df['pd_time'] = parse_timestamps(df[time_col])
+    if drop_unparsed:
+        df = df.dropna(subset=['pd_time']).reset_index(drop=True)
 
     current_time = datetime.now().strftime('%Y-%m-%d_%H-%M-%S.%f')
 
@@ -0,0 +1,188 @@
+# python
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+import pandas as pd
+from Feature.logging_config import configure_logging
+
+configure_logging()
+
+DEFAULT_BUDGET_MB = 1024
+
+
+class DatasetMemoryManager(MutableMapping):
+    """
+    带内存预算的数据集管理器。
+    以 (文件名, 列名) 为单位统计内存，超出预算时按最近最少使用顺序把列溢出到本地二进制缓存，
+    再次访问时自动从缓存重新加载。对外表现为 {filename: DataFrame} 字典。
+    """
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB, cache_dir=None):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._owns_cache_dir = cache_dir is None
+        self.cache_dir = cache_dir or tempfile.mkdtemp(prefix='plotter_cache_')
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._columns = OrderedDict()   # {name: [col, ...]} 保持原始列顺序
+        self._index = {}                # {name: pd.Index}
+        self._resident = {}             # {(name, col): pd.Series} 驻留内存的列
+        self._spilled = {}              # {(name, col): 缓存文件路径}
+        self._col_bytes = {}            # {(name, col): 字节数}
+        self._lru = OrderedDict()       # 驻留列的访问顺序，最久未用的在最前
+
+    # ---- Mapping 接口 ----
+    def __setitem__(self, name, df):
+        if name in self._columns:
+            del self[name]
+
+        self._columns[name] = list(df.columns)
+        self._index[name] = df.index
+        for col in df.columns:
+            key = (name, col)
+            series = df[col]
+            self._resident[key] = series
+            self._col_bytes[key] = int(series.memory_usage(index=False, deep=True))
+            self._lru[key] = None
+        self._enforce_budget()
+
+    def __getitem__(self, name):
+        return self.get_columns(name)
+
+    def __delitem__(self, name):
+        for col in self._columns.pop(name):
+            key = (name, col)
+            self._resident.pop(key, None)
+            self._lru.pop(key, None)
+            self._col_bytes.pop(key, None)
+            path = self._spilled.pop(key, None)
+            if path and os.path.exists(path):
+                os.remove(path)
+        self._index.pop(name, None)
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self):
+        return len(self._columns)
+
+    def clear(self):
+        for name in list(self._columns):
+            del self[name]
+
+    # ---- 按列访问 ----
+    def columns(self, name):
+        """
+        返回数据集的列名，不触发加载
+        """
+        return list(self._columns[name])
+
+    def get_columns(self, name, columns=None):
+        """
+        返回数据集指定列组成的DataFrame（默认全部列），被溢出的列会从缓存中重新加载
+        """
+        wanted = self._resolve(name, columns)
+        df = self._assemble(name, wanted)
+        self._enforce_budget(pinned={(name, col) for col in wanted})
+        return df
+
+    def view(self, columns):
+        """
+        返回 {filename: DataFrame}，每个DataFrame只包含 columns 中存在的列。
+        本次用到的列保持驻留，其余列在超出预算时优先溢出。
+        """
+        result = {}
+        pinned = set()
+        for name in self._columns:
+            wanted = self._resolve(name, columns)
+            result[name] = self._assemble(name, wanted)
+            pinned.update((name, col) for col in wanted)
+        self._enforce_budget(pinned=pinned)
+        return result
+
+    # ---- 预算与统计 ----
+    def set_budget(self, budget_mb):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._enforce_budget()
+
+    def memory_usage(self):
+        """
+        当前驻留内存的字节数
+        """
+        return sum(self._col_bytes[key] for key in self._resident)
+
+    def dataset_usage(self):
+        """
+        返回 {filename: (驻留字节数, 总字节数)}
+        """
+        usage = {}
+        for name, cols in self._columns.items():
+            total = resident = 0
+            for col in cols:
+                key = (name, col)
+                total += self._col_bytes[key]
+                if key in self._resident:
+                    resident += self._col_bytes[key]
+            usage[name] = (resident, total)
+        return usage
+
+    def close(self):
+        self.clear()
+        if self._owns_cache_dir:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    # ---- 内部实现 ----
+    def _resolve(self, name, columns):
+        if columns is None:
+            return list(self._columns[name])
+        wanted = set(columns)
+        return [col for col in self._columns[name] if col in wanted]
+
+    def _assemble(self, name, wanted):
+        data = {}
+        for col in wanted:
+            key = (name, col)
+            if key not in self._resident:
+                self._resident[key] = pd.read_pickle(self._spilled[key])
+                logging.info(f"从缓存重新加载 {name}:{col}")
+            self._lru[key] = None
+            self._lru.move_to_end(key)
+            data[col] = self._resident[key]
+        return pd.DataFrame(data, index=self._index[name], copy=False)
+
+    def _spill_path(self, key):
+        digest = hashlib.md5(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.pkl")
+
+    def _evict(self, key):
+        # 数据不会被修改，已经写过缓存的列直接丢弃即可
+        if key not in self._spilled:
+            path = self._spill_path(key)
+            self._resident[key].to_pickle(path)
+            self._spilled[key] = path
+        del self._resident[key]
+        del self._lru[key]
+
+    def _enforce_budget(self, pinned=frozenset()):
+        usage = self.memory_usage()
+        if usage <= self.budget_bytes:
+            return
+        for key in list(self._lru):
+            if usage <= self.budget_bytes:
+                break
+            if key in pinned:
+                continue
+            usage -= self._col_bytes[key]
+            self._evict(key)
+        if usage > self.budget_bytes:
+            logging.warning(f"当前绘图所需数据 {usage / 2**20:.1f} MB 超出内存预算 "
+                            f"{self.budget_bytes / 2**20:.1f} MB")
+
+
+def frame_nbytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
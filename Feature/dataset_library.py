@@ -0,0 +1,200 @@
+# python
+import os
+import glob
+import json
+import hashlib
+import logging
+import threading
+
+import pandas as pd
+from Feature.csv_parser import parse_complex_csv, parse_timestamps, find_time_column
+from Feature.logging_config import configure_logging
+
+configure_logging()
+
+try:
+    import pyarrow  # noqa: F401  parquet 列式缓存为可选功能
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+INDEX_FILE = '.dataset_index.json'
+CACHE_DIR = '.columnar_cache'
+INDEX_CHUNK_ROWS = 1_000_000
+
+
+def resolve_data_dir(base_dir, data_dir):
+    """
+    把用户输入的数据目录解析为 base_dir 下的绝对路径（相对路径按 base_dir 解析），
+    解析后（含符号链接）不在 base_dir 之内时抛出 ValueError
+    """
+    base = os.path.realpath(base_dir)
+    path = os.path.realpath(os.path.join(base, data_dir))
+    if os.path.commonpath([base, path]) != base:
+        raise ValueError(f"数据目录必须位于 {base} 之内: {data_dir}")
+    return path
+
+
+def summarize_csv(file_path, chunksize=INDEX_CHUNK_ROWS):
+    """
+    分块扫描CSV，统计列名、行数、时间范围、RAT 分布和 ue_id 列表，不把整个文件读入内存
+    """
+    columns = list(pd.read_csv(file_path, nrows=0).columns)
+    time_col = find_time_column(columns)
+    usecols = [c for c in (time_col, 'RAT', 'ue_id') if c in columns]
+
+    rows = 0
+    t_min = t_max = None
+    rat_counts = {}
+    ue_ids = set()
+    if usecols:
+        for chunk in pd.read_csv(file_path, usecols=usecols, chunksize=chunksize):
+            rows += len(chunk)
+            if time_col is not None:
+                ts = parse_timestamps(chunk[time_col]).dropna()
+                if not ts.empty:
+                    t_min = ts.min() if t_min is None else min(t_min, ts.min())
+                    t_max = ts.max() if t_max is None else max(t_max, ts.max())
+            if 'RAT' in chunk.columns:
+                for rat, count in chunk['RAT'].value_counts().items():
+                    rat_counts[str(rat)] = rat_counts.get(str(rat), 0) + int(count)
+            if 'ue_id' in chunk.columns:
+                ue_ids.update(chunk['ue_id'].dropna().unique().tolist())
+    else:
+        rows = sum(len(chunk) for chunk in pd.read_csv(file_path, usecols=[0], chunksize=chunksize))
+
+    return {
+        'columns': columns,
+        'rows': rows,
+        'start': t_min.isoformat() if t_min is not None else None,
+        'end': t_max.isoformat() if t_max is not None else None,
+        'rat_mix': rat_counts,
+        'ue_ids': sorted(ue_ids, key=str),
+    }
+
+
+class DatasetLibrary:
+    """
+    服务器端数据目录：维护目录下所有CSV的持久化索引，按需从本地磁盘或列式缓存加载数据
+    索引保存在 data_dir/.dataset_index.json，文件大小或修改时间变化时重新统计
+    目录不可写时退化为仅内存索引、不写列式缓存；实例可被多个会话共享，refresh/load 由锁保护
+    """
+
+    def __init__(self, data_dir, index_file=None, cache_dir=None):
+        self.data_dir = os.path.abspath(data_dir)
+        self.index_file = index_file or os.path.join(self.data_dir, INDEX_FILE)
+        self.cache_dir = cache_dir or os.path.join(self.data_dir, CACHE_DIR)
+        # 写索引或缓存出现 OSError 后置为 False，之后不再尝试写入
+        self.writable = True
+        self._lock = threading.RLock()
+        self.index = self._read_index()
+
+    def _read_index(self):
+        if os.path.isfile(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"数据索引读取失败，将重新生成: {e}")
+        return {}
+
+    def _write_index(self):
+        if not self.writable:
+            return
+        tmp_file = self.index_file + '.tmp'
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, ensure_ascii=False, indent=1, default=str)
+            os.replace(tmp_file, self.index_file)
+        except OSError as e:
+            self._disable_writes(e)
+
+    def _disable_writes(self, error):
+        logging.warning(f"数据目录 {self.data_dir} 不可写，索引只保存在内存中且不使用列式缓存: {error}")
+        self.writable = False
+
+    def refresh(self):
+        """
+        扫描目录，更新新增或改动的文件并移除已删除的文件，返回索引条目列表
+        """
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self):
+        pattern = os.path.join(self.data_dir, '**', '*.csv')
+        found = {}
+        for path in glob.glob(pattern, recursive=True):
+            rel_path = os.path.relpath(path, self.data_dir)
+            if rel_path.startswith(CACHE_DIR):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # 扫描期间被删除的文件
+                continue
+            found[rel_path] = (stat.st_size, stat.st_mtime)
+
+        changed = set(self.index) - set(found)
+        for rel_path in changed:
+            self._drop_cache(self.index.pop(rel_path))
+
+        for rel_path, (size, mtime) in found.items():
+            entry = self.index.get(rel_path)
+            if entry and entry['size'] == size and entry['mtime'] == mtime:
+                continue
+            if entry:
+                self._drop_cache(entry)
+            try:
+                summary = summarize_csv(os.path.join(self.data_dir, rel_path))
+            except Exception as e:
+                logging.error(f"索引文件 {rel_path} 失败: {e}")
+                continue
+            summary.update(path=rel_path, size=size, mtime=mtime,
+                           fingerprint=hashlib.sha1(f"{rel_path}|{size}|{mtime}".encode('utf-8')).hexdigest())
+            self.index[rel_path] = summary
+            changed.add(rel_path)
+
+        if changed or not os.path.isfile(self.index_file):
+            self._write_index()
+        return self.entries()
+
+    def entries(self):
+        with self._lock:
+            return [self.index[k] for k in sorted(self.index)]
+
+    def _cache_path(self, entry):
+        return os.path.join(self.cache_dir, f"{entry['fingerprint']}.parquet")
+
+    def _drop_cache(self, entry):
+        cache_path = self._cache_path(entry)
+        try:
+            if os.path.isfile(cache_path):
+                os.remove(cache_path)
+        except OSError as e:
+            logging.warning(f"删除列式缓存失败 {cache_path}: {e}")
+
+    def load(self, rel_path, columns=None):
+        """
+        加载数据集。存在有效的列式缓存时只读取需要的列，否则解析CSV并写入缓存
+        """
+        with self._lock:
+            entry = self.index[rel_path]
+        cache_path = self._cache_path(entry)
+        if HAS_PARQUET and os.path.isfile(cache_path):
+            return pd.read_parquet(cache_path, columns=columns)
+
+        df = parse_complex_csv(os.path.join(self.data_dir, rel_path), drop_unparsed=True)
+        if HAS_PARQUET and self.writable:
+            # 临时文件名带线程号，多个会话同时加载同一文件时互不覆盖
+            tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                df.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                self._disable_writes(e)
+            except Exception as e:
+                logging.warning(f"写入列式缓存失败 {rel_path}: {e}")
+        if columns is not None:
+            df = df[[c for c in df.columns if c in columns]]
+        return df
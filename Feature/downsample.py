@@ -0,0 +1,69 @@
+# python
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_POINTS = 2000
+
+
+def minmax_decimate(x, y, max_points=DEFAULT_MAX_POINTS, x_range=None):
+    """
+    对按 x 升序排列的序列做 min-max 降采样：先用二分查找截取 x_range 内的数据，
+    再把可见数据等分为 max_points/2 个桶，每个桶保留最小值和最大值两个点，
+    曲线的峰谷不会因降采样丢失。返回 (x, y)
+    """
+    if x_range is not None:
+        lo = np.searchsorted(x, x_range[0], side='left')
+        hi = np.searchsorted(x, x_range[1], side='right')
+        # 两侧各多保留一个点，保证曲线延伸到可视范围边缘
+        x, y = x[max(lo - 1, 0):hi + 1], y[max(lo - 1, 0):hi + 1]
+
+    n = len(x)
+    n_buckets = max_points // 2
+    if n <= max_points or n_buckets == 0:
+        return x, y
+
+    size = -(-n // n_buckets)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+    idx_min = offsets + np.argmin(np.where(np.isnan(buckets), np.inf, buckets), axis=1)
+    idx_max = offsets + np.argmax(np.where(np.isnan(buckets), -np.inf, buckets), axis=1)
+    idx = np.unique(np.concatenate([idx_min, idx_max]))
+    idx = idx[idx < n]
+    return x[idx], y[idx]
+
+
+class SeriesStore:
+    """
+    缓存排序后的 (x, y) numpy 数组，键为 (数据指纹, x 列, 字段)。
+    缩放时只需在缓存数组上二分查找和降采样，不再访问 DataFrame。
+    datetime 类型的 x 以纳秒整数保存。
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._arrays = OrderedDict()
+
+    def get(self, fingerprint, df, x_col, field):
+        key = (fingerprint, x_col, field)
+        if key in self._arrays:
+            self._arrays.move_to_end(key)
+            return self._arrays[key]
+
+        sub = df[[x_col, field]].dropna(subset=[x_col])
+        x = sub[x_col]
+        if pd.api.types.is_datetime64_any_dtype(x):
+            x = x.astype('int64')
+        x = x.to_numpy(dtype='float64')
+        y = pd.to_numeric(sub[field], errors='coerce').to_numpy(dtype='float64')
+        if len(x) > 1 and not np.all(x[1:] >= x[:-1]):
+            order = np.argsort(x, kind='stable')
+            x, y = x[order], y[order]
+
+        self._arrays[key] = (x, y)
+        if len(self._arrays) > self.max_entries:
+            self._arrays.popitem(last=False)
+        return x, y
@@ -0,0 +1,204 @@
+# python
+import time
+import argparse
+import warnings
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_TAIL_N = 10
+DEFAULT_GAIN_STEP = 2.5
+DEFAULT_NOISE_STEP = 5
+DEFAULT_STATS = ('mean', 'median', 'count', 'std', 'p5', 'p95')
+GROUP_KEYS = ['gain_5g', 'noise']
+
+
+def tail_n(df, keys=GROUP_KEYS, n=DEFAULT_TAIL_N):
+    """
+    每组保留最后 n 行（保持原始行顺序），等价于 groupby(keys).apply(lambda g: g.tail(n))，
+    但用 cumcount(ascending=False) 得到组内倒序名次，一次向量化比较完成，不逐组调用 Python 函数
+    """
+    reverse_rank = df.groupby(keys, sort=False, dropna=True).cumcount(ascending=False)
+    return df[reverse_rank.to_numpy() < n]
+
+
+def bin_index(values, step):
+    """
+    数值按 step 分箱为整数箱号（四舍五入到最近的箱中心，与 pandas round 一样逢半取偶），箱中心为 箱号 * step；
+    用整数做分组键，避免浮点箱中心比较带来的误差
+    """
+    return np.rint(np.asarray(values, dtype='float64') / step).astype('int64')
+
+
+def _percentile_name(stat):
+    return float(stat[1:]) / 100 if stat.startswith('p') and stat[1:].replace('.', '', 1).isdigit() else None
+
+
+def _dense_codes(bins):
+    """
+    整数箱号 -> (出现过的箱号升序, 每行在其中的序号)；箱号范围有限，用 bincount + 查表代替 np.unique 的排序
+    """
+    if len(bins) == 0:
+        return bins, bins
+    low = bins.min()
+    offset = bins - low
+    present = np.bincount(offset) > 0
+    lookup = np.cumsum(present) - 1
+    return np.flatnonzero(present) + low, lookup[offset]
+
+
+class BinnedGrid:
+    """
+    bin_aggregate 的结果：x/y 为出现过的箱中心（升序），values[(指标, 统计量)] 为 len(y) x len(x) 的二维数组，空箱为 NaN
+    """
+
+    def __init__(self, x, y, values, x_col, y_col):
+        self.x = x
+        self.y = y
+        self.values = values
+        self.x_col = x_col
+        self.y_col = y_col
+
+    def pivot(self, metric, stat='mean'):
+        """与 pivot_table(index=y 箱, columns=x 箱, values=metric, aggfunc=stat) 形式相同的 DataFrame"""
+        return pd.DataFrame(self.values[(metric, stat)], index=pd.Index(self.y, name=f'{self.y_col}_bin'),
+                            columns=pd.Index(self.x, name=f'{self.x_col}_bin'))
+
+    def to_frame(self):
+        """长表：每个非空箱一行，列为 x 箱、y 箱和各 "指标_统计量" """
+        yy, xx = np.meshgrid(self.y, self.x, indexing='ij')
+        data = {f'{self.x_col}_bin': xx.ravel(), f'{self.y_col}_bin': yy.ravel()}
+        for (metric, stat), grid in self.values.items():
+            data[f'{metric}_{stat}'] = grid.ravel()
+        frame = pd.DataFrame(data)
+        counts = [c for c in frame.columns if c.endswith('_count')]
+        return frame[(frame[counts] > 0).any(axis=1)].reset_index(drop=True) if counts else frame
+
+
+def bin_aggregate(df, metrics, x_col='gain_5g', y_col='noise', x_step=DEFAULT_GAIN_STEP, y_step=DEFAULT_NOISE_STEP,
+                  stats=DEFAULT_STATS):
+    """
+    按 (y 箱, x 箱) 一次计算多个指标的统计量：count/mean/std 由 bincount 求和得到，
+    median 与 pN 百分位在按 (箱, 值) 排序后的连续段上按线性插值取得（与 pandas quantile 默认一致）。
+    std 为样本标准差 (ddof=1)；各指标的 NaN 单独剔除，坐标为 NaN 的行不参与分箱（与 pivot_table 相同）
+    """
+    keys = df[[x_col, y_col]].to_numpy(dtype='float64')
+    if np.isnan(keys).any():
+        df = df[~np.isnan(keys).any(axis=1)]
+    x_ids, x_code = _dense_codes(bin_index(df[x_col], x_step))
+    y_ids, y_code = _dense_codes(bin_index(df[y_col], y_step))
+    n_cells = len(x_ids) * len(y_ids)
+    shape = (len(y_ids), len(x_ids))
+    cell = y_code.astype('int64') * len(x_ids) + x_code
+
+    want_quantiles = {stat: (0.5 if stat == 'median' else _percentile_name(stat)) for stat in stats
+                      if stat == 'median' or _percentile_name(stat) is not None}
+    values = {}
+    for metric in metrics:
+        v = df[metric].to_numpy(dtype='float64')
+        valid = ~np.isnan(v)
+        c, v = (cell, v) if valid.all() else (cell[valid], v[valid])
+        count = np.bincount(c, minlength=n_cells).astype('float64')
+        total = np.bincount(c, weights=v, minlength=n_cells)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+            if 'std' in stats:
+                # 先减去箱均值再平方求和，避免 sumsq - n*mean^2 在大数值下的抵消误差
+                dev = v - mean[c]
+                var = np.bincount(c, weights=dev * dev, minlength=n_cells) / (count - 1)
+                values[(metric, 'std')] = np.where(count > 1, np.sqrt(var), np.nan).reshape(shape)
+        if 'count' in stats:
+            values[(metric, 'count')] = count.reshape(shape)
+        if 'mean' in stats:
+            values[(metric, 'mean')] = mean.reshape(shape)
+        if want_quantiles:
+            # 先按值排序，再按箱号稳定排序：每个箱的值落在连续一段且段内有序。
+            # 箱数少于 65536 时箱号用 uint16，numpy 的稳定排序对 16 位整数走基数排序，比 lexsort 快数倍
+            order = np.argsort(v)
+            key = c[order].astype('uint16' if n_cells <= np.iinfo('uint16').max else 'int64')
+            order = order[np.argsort(key, kind='stable')]
+            sorted_v = v[order]
+            starts = np.concatenate(([0], np.cumsum(count)[:-1])).astype('int64')
+            n = count.astype('int64')
+            for stat, q in want_quantiles.items():
+                pos = starts + q * np.maximum(n - 1, 0)
+                lo = np.floor(pos).astype('int64')
+                hi = np.minimum(lo + 1, starts + np.maximum(n - 1, 0))
+                frac = pos - lo
+                if len(sorted_v):
+                    lo_v = sorted_v[np.minimum(lo, len(sorted_v) - 1)]
+                    hi_v = sorted_v[np.minimum(hi, len(sorted_v) - 1)]
+                    result = lo_v + (hi_v - lo_v) * frac
+                else:
+                    result = np.zeros(n_cells)
+                values[(metric, stat)] = np.where(n > 0, result, np.nan).reshape(shape)
+    return BinnedGrid(x_ids * x_step, y_ids * y_step, values, x_col, y_col)
+
+
+def legacy_aggregate(df, metrics, stats=DEFAULT_STATS, n=DEFAULT_TAIL_N):
+    """
+    原 heat_map.py 的路径：groupby.apply 取 tail（n 为 None 时不取）、浮点分箱、每个指标每个统计量一次 pivot_table，
+    仅用于基准对比
+    """
+    if n is not None:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', FutureWarning)
+            df = df.groupby(GROUP_KEYS, as_index=False, group_keys=False).apply(lambda g: g.tail(n))
+    df = df.reset_index(drop=True)
+    df['gain_bin'] = (df['gain_5g'] / DEFAULT_GAIN_STEP).round() * DEFAULT_GAIN_STEP
+    df['noise_bin'] = (df['noise'] / DEFAULT_NOISE_STEP).round() * DEFAULT_NOISE_STEP
+    funcs = {'mean': 'mean', 'median': 'median', 'count': 'count', 'std': 'std',
+             'p5': lambda s: s.quantile(0.05), 'p95': lambda s: s.quantile(0.95)}
+    return {(metric, stat): df.pivot_table(index='noise_bin', columns='gain_bin', values=metric,
+                                           aggfunc=funcs[stat])
+            for metric in metrics for stat in stats}
+
+
+def synthetic_heatmap_data(rows, n_gain=40, n_noise=60, seed=0):
+    """rows 行模拟热力图采集数据：每个 (gain_5g, noise) 组合若干条，含两个速率指标"""
+    rng = np.random.default_rng(seed)
+    gains = rng.choice(np.linspace(40, 90, n_gain), rows)
+    noise = rng.choice(np.linspace(-120, -10, n_noise), rows)
+    base = np.clip((gains - 40) * 2.2 - 120 - noise, 0, 200)
+    return pd.DataFrame({
+        'gain_5g': gains, 'noise': noise, 'RAT': 'NR',
+        'avg_rate_mbps': base + rng.normal(0, 5, rows),
+        'instant_rate_mbps': base + rng.normal(0, 10, rows),
+    })
+
+
+def run_benchmark(rows=10_000_000, metrics=('avg_rate_mbps', 'instant_rate_mbps'), tail=DEFAULT_TAIL_N,
+                  legacy=True):
+    df = synthetic_heatmap_data(rows)
+    print(f"{rows} 行, {df.groupby(GROUP_KEYS).ngroups} 个 (gain_5g, noise) 组, 指标 {list(metrics)}")
+
+    started = time.perf_counter()
+    tail_df = tail_n(df, n=tail)
+    t_tail = time.perf_counter() - started
+    started = time.perf_counter()
+    grid = bin_aggregate(tail_df, metrics)
+    t_bin = time.perf_counter() - started
+    print(f"新路径: tail {t_tail:.2f}s + 分箱统计 {t_bin:.3f}s = {t_tail + t_bin:.2f}s")
+
+    started = time.perf_counter()
+    full = bin_aggregate(df, metrics)
+    t_full = time.perf_counter() - started
+    print(f"新路径 (不取 tail，全部行分箱统计): {t_full:.2f}s")
+
+    if legacy:
+        for label, result, n, t_new in (('', grid, tail, t_tail + t_bin), (' (不取 tail)', full, None, t_full)):
+            started = time.perf_counter()
+            old = legacy_aggregate(df, metrics, n=n)
+            t_old = time.perf_counter() - started
+            worst = max(np.nanmax(np.abs(result.pivot(m, s).to_numpy() - old[(m, s)].to_numpy())) for (m, s) in old)
+            print(f"原路径{label}: {t_old:.2f}s (新路径快 {t_old / t_new:.1f}x)，最大差异 {worst:.2e}")
+    return grid, full
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='热力图分箱统计：向量化路径与原 groupby.apply + pivot_table 路径的基准对比')
+    parser.add_argument('--rows', type=int, default=10_000_000, help='输入行数 (默认: 10000000)')
+    parser.add_argument('--tail', type=int, default=DEFAULT_TAIL_N, help='每组保留的最后 N 条 (默认: 10)')
+    parser.add_argument('--no-legacy', action='store_true', help='不运行原路径')
+    args = parser.parse_args()
+    run_benchmark(args.rows, tail=args.tail, legacy=not args.no_legacy)
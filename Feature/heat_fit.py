@@ -0,0 +1,125 @@
+# python
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import griddata
+from scipy.spatial import cKDTree
+
+from Feature.heat_binning import DEFAULT_GAIN_STEP, DEFAULT_NOISE_STEP
+
+# bin: 原有的分箱均值；linear/cubic: Delaunay 三角剖分插值（cubic 截断到测量值范围）；idw/rbf: KD 树 k 近邻的反距离 / 高斯核加权
+FIT_METHODS = ['bin', 'linear', 'cubic', 'idw', 'rbf']
+DEFAULT_RESOLUTION = 400
+DEFAULT_NEIGHBORS = 12
+DEFAULT_POWER = 2
+# rbf 高斯核宽度，单位为箱（gain 2.5 dB、noise 5 为一个箱）
+DEFAULT_RBF_WIDTH = 1.0
+
+
+def create_grid(df, x_col='gain_5g', y_col='noise', resolution=DEFAULT_RESOLUTION):
+    x_min, x_max = df[x_col].min(), df[x_col].max()
+    y_min, y_max = df[y_col].min(), df[y_col].max()
+    grid_x, grid_y = np.mgrid[x_min:x_max:complex(resolution), y_min:y_max:complex(resolution)]
+    return (x_min, x_max, y_min, y_max), grid_x, grid_y
+
+
+def measured_points(df, metric, x_col='gain_5g', y_col='noise'):
+    """
+    同一坐标的重复测量取均值，返回 (坐标 N x 2, 值)；Delaunay 剖分要求点互不重合，KD 树加权也不应偏向测得次数多的点
+    """
+    df = df[[x_col, y_col, metric]].dropna()
+    codes, uniques = pd.MultiIndex.from_frame(df[[x_col, y_col]]).factorize()
+    counts = np.bincount(codes, minlength=len(uniques))
+    values = np.bincount(codes, weights=df[metric].to_numpy(dtype='float64'), minlength=len(uniques)) / counts
+    return np.column_stack([uniques.get_level_values(0), uniques.get_level_values(1)]).astype('float64'), values
+
+
+def fit_surface(df, metric, method='linear', resolution=DEFAULT_RESOLUTION, neighbors=DEFAULT_NEIGHBORS,
+                power=DEFAULT_POWER, rbf_width=DEFAULT_RBF_WIDTH, mask_distance=None,
+                x_step=DEFAULT_GAIN_STEP, y_step=DEFAULT_NOISE_STEP):
+    """
+    把测得的 (gain_5g, noise, metric) 散点插值到 create_grid 的 resolution x resolution 网格上。
+    两轴量纲不同，距离按箱宽 (x_step, y_step) 归一化后计算。
+    mask_distance（单位为箱）给定时，离最近测点超过该距离的格点置为 NaN，不画出无数据支撑的区域；
+    linear/cubic 在测点凸包之外本身就是 NaN。
+    返回与 fitted_grid 相同的 dict：x (nx,)、y (ny,)、z (ny x nx) 及范围与最小值位置
+    """
+    if method not in FIT_METHODS or method == 'bin':
+        raise ValueError(f"未知的拟合方法: {method}，可选 {FIT_METHODS[1:]}")
+    points, values = measured_points(df, metric)
+    (x_min, x_max, y_min, y_max), grid_x, grid_y = create_grid(df, resolution=resolution)
+    scale = np.array([x_step, y_step], dtype='float64')
+    scaled = points / scale
+    targets = np.column_stack([grid_x.ravel(), grid_y.ravel()]) / scale
+
+    tree = None
+    if method in ('linear', 'cubic'):
+        z = griddata(scaled, values, targets, method=method)
+        if method == 'cubic':
+            # Clough-Tocher 三次插值在含噪声的密集散点上会大幅过冲（模拟数据 0~200 上出现 -646），
+            # 截断到测量值范围；linear 与 idw/rbf 是测点的加权平均，本身不会越界
+            z = np.clip(z, values.min(), values.max())
+    else:
+        tree = cKDTree(scaled)
+        k = min(neighbors, len(values))
+        dist, idx = tree.query(targets, k=k, workers=-1)
+        dist, idx = dist.reshape(len(targets), k), idx.reshape(len(targets), k)
+        if method == 'idw':
+            with np.errstate(divide='ignore'):
+                weights = 1.0 / dist ** power
+            # 格点与测点重合时直接取测量值
+            exact = ~np.isfinite(weights)
+            hit = exact.any(axis=1)
+            weights[hit] = exact[hit]
+        else:
+            weights = np.exp(-(dist / rbf_width) ** 2)
+            # 远离所有测点时高斯权重下溢为 0，退化为最近邻
+            weights[weights.sum(axis=1) == 0, 0] = 1.0
+        z = (weights * values[idx]).sum(axis=1) / weights.sum(axis=1)
+
+    if mask_distance is not None:
+        nearest = (tree or cKDTree(scaled)).query(targets, k=1, workers=-1)[0]
+        z = np.where(nearest > mask_distance, np.nan, z)
+
+    # create_grid 的网格按 (x, y) 索引，转置为绘图用的 (y, x)
+    z = z.reshape(grid_x.shape).T
+    x, y = grid_x[:, 0], grid_y[0, :]
+    if np.isnan(z).all():
+        raise ValueError("拟合结果全部为空，检查测点数量或放宽 mask_distance")
+    min_z_idx = np.unravel_index(np.nanargmin(z), z.shape)
+    return dict(x=x, y=y, z=z, x_min=x_min, x_max=x_max, y_min=y_min, y_max=y_max,
+                min_z_x=x[min_z_idx[1]], min_z_y=y[min_z_idx[0]], min_z_val=z[min_z_idx],
+                fill_gaps=False)
+
+
+def synthetic_sweep(points, seed=0):
+    """points 个不规则分布的测点（连续的 gain/noise，含一块未测区域），用于基准测试"""
+    rng = np.random.default_rng(seed)
+    gains = rng.uniform(40, 90, points)
+    noise = rng.uniform(-120, -10, points)
+    keep = ~((gains > 60) & (gains < 70) & (noise > -60) & (noise < -40))
+    gains, noise = gains[keep], noise[keep]
+    rate = np.clip((gains - 40) * 2.2 - 120 - noise, 0, 200) + rng.normal(0, 5, len(gains))
+    return pd.DataFrame({'gain_5g': gains, 'noise': noise, 'avg_rate_mbps': rate})
+
+
+def run_benchmark(points=100_000, resolution=DEFAULT_RESOLUTION, mask_distance=1.0):
+    df = synthetic_sweep(points)
+    print(f"{len(df)} 个测点 -> {resolution}x{resolution} 网格, 置信掩码 {mask_distance} 箱")
+    for method in FIT_METHODS[1:]:
+        started = time.perf_counter()
+        grid = fit_surface(df, 'avg_rate_mbps', method, resolution, mask_distance=mask_distance)
+        elapsed = time.perf_counter() - started
+        print(f"{method:>6}: {elapsed:.2f}s, 空格点 {np.isnan(grid['z']).mean():.1%}, "
+              f"最小值 {grid['min_z_val']:.2f} @ ({grid['min_z_x']:.1f}, {grid['min_z_y']:.1f})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='散点曲面拟合的耗时测试')
+    parser.add_argument('--points', type=int, default=100_000, help='测点数 (默认: 100000)')
+    parser.add_argument('--resolution', type=int, default=DEFAULT_RESOLUTION, help='网格分辨率 (默认: 400)')
+    parser.add_argument('--mask', type=float, default=1.0, help='置信掩码距离，单位为箱 (默认: 1)')
+    args = parser.parse_args()
+    run_benchmark(args.points, args.resolution, args.mask)
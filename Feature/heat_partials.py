@@ -0,0 +1,458 @@
+# python
+import os
+import io
+import glob
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from Feature.heat_binning import (DEFAULT_GAIN_STEP, DEFAULT_NOISE_STEP, DEFAULT_TAIL_N, GROUP_KEYS, bin_index,
+                                  tail_n, synthetic_heatmap_data)
+
+PARTIAL_SUFFIX = '.partial.npz'
+PARTIAL_VERSION = 1
+DEFAULT_PARTIAL_METRICS = ['avg_rate_mbps', 'instant_rate_mbps']
+# 分位数草图：固定宽度的直方图，桶计数直接相加即可合并；超出范围的值落入首尾两个溢出桶，
+# 取分位数时以该箱的 min/max 代替桶边界。桶宽决定分位数误差（不超过半个桶宽）
+SKETCH_LOW = -50.0
+SKETCH_HIGH = 350.0
+SKETCH_WIDTH = 0.5
+SKETCH_BUCKETS = int(round((SKETCH_HIGH - SKETCH_LOW) / SKETCH_WIDTH))
+
+
+def default_partial_file(input_file):
+    return os.path.splitext(input_file)[0] + PARTIAL_SUFFIX
+
+
+def is_partial_file(input_file):
+    return input_file.endswith(PARTIAL_SUFFIX)
+
+
+def _dense_unique(key):
+    """
+    非负整数键 -> (升序唯一键, 每个元素的序号)。键范围不大时用 bincount + 查表，代替 np.unique 的排序
+    """
+    if len(key) == 0:
+        return key, key
+    high = int(key.max()) + 1
+    if high > 8 * len(key) + 2**20:
+        uniq, inverse = np.unique(key, return_inverse=True)
+        return uniq, inverse.ravel()
+    present = np.bincount(key, minlength=high) > 0
+    lookup = np.cumsum(present) - 1
+    return np.flatnonzero(present), lookup[key]
+
+
+def _unique_cells(bins):
+    """(K, 2) 箱号 -> (唯一箱 N x 2, 每行的序号)，两列组合成单个整数键"""
+    if len(bins) == 0:
+        return bins.reshape(0, 2), np.zeros(0, 'int64')
+    low = bins.min(axis=0)
+    span = bins[:, 1].max() - low[1] + 1
+    uniq, inverse = _dense_unique((bins[:, 0] - low[0]) * span + (bins[:, 1] - low[1]))
+    return np.column_stack([uniq // span + low[0], uniq % span + low[1]]), inverse
+
+
+def sketch_bucket(values):
+    """值 -> 桶号，-1 为下溢桶，SKETCH_BUCKETS 为上溢桶"""
+    buckets = np.floor((values - SKETCH_LOW) / SKETCH_WIDTH)
+    return np.clip(buckets, -1, SKETCH_BUCKETS).astype('int32')
+
+
+class PartialAggregate:
+    """
+    一次或多次扫描在 (gain_5g 箱, noise 箱) 上的可合并统计：每个箱、每个指标的 count / sum / sumsq / min / max，
+    以及稀疏存储的分位数草图 (箱序号, 指标序号, 桶号, 计数)。
+    merge 只做求和与取极值，满足结合律与交换律，任意分组、任意顺序合并的结果相同
+    """
+
+    def __init__(self, metrics, cells, count, total, total_sq, minimum, maximum, sketch, sources=(),
+                 x_step=DEFAULT_GAIN_STEP, y_step=DEFAULT_NOISE_STEP, tail=DEFAULT_TAIL_N):
+        self.metrics = list(metrics)
+        self.cells = cells              # (N, 2) int64：gain_5g 箱号、noise 箱号
+        self.count = count              # (N, M) int64
+        self.total = total              # (N, M) float64
+        self.total_sq = total_sq        # (N, M) float64
+        self.minimum = minimum          # (N, M) float64，空为 +inf
+        self.maximum = maximum          # (N, M) float64，空为 -inf
+        self.sketch = sketch            # (cell, metric, bucket, count) 四个等长数组
+        self.sources = list(sources)
+        self.x_step = x_step
+        self.y_step = y_step
+        self.tail = tail
+
+    def __len__(self):
+        return len(self.cells)
+
+    @property
+    def settings(self):
+        return dict(metrics=self.metrics, x_step=self.x_step, y_step=self.y_step, tail=self.tail,
+                    sketch=[SKETCH_LOW, SKETCH_HIGH, SKETCH_WIDTH])
+
+    @classmethod
+    def from_frame(cls, df, metrics=DEFAULT_PARTIAL_METRICS, tail=DEFAULT_TAIL_N, source=None,
+                   x_step=DEFAULT_GAIN_STEP, y_step=DEFAULT_NOISE_STEP):
+        """
+        从一次扫描的记录计算部分聚合。tail 不为 None 时与 heat_map.py 相同，每个 (gain_5g, noise) 只取最后 tail 条
+        """
+        metrics = [m for m in metrics if m in df.columns]
+        df = df.dropna(subset=GROUP_KEYS)
+        if tail is not None:
+            df = tail_n(df, GROUP_KEYS, tail)
+        bins = np.column_stack([bin_index(df['gain_5g'], x_step), bin_index(df['noise'], y_step)])
+        cells, code = _unique_cells(bins)
+        n = len(cells)
+        shape = (n, len(metrics))
+        count = np.zeros(shape, 'int64')
+        total, total_sq = np.zeros(shape), np.zeros(shape)
+        minimum, maximum = np.full(shape, np.inf), np.full(shape, -np.inf)
+        sketches = []
+        for j, metric in enumerate(metrics):
+            v = df[metric].to_numpy(dtype='float64')
+            valid = ~np.isnan(v)
+            c, v = code[valid], v[valid]
+            count[:, j] = np.bincount(c, minlength=n)
+            total[:, j] = np.bincount(c, weights=v, minlength=n)
+            total_sq[:, j] = np.bincount(c, weights=v * v, minlength=n)
+            np.minimum.at(minimum[:, j], c, v)
+            np.maximum.at(maximum[:, j], c, v)
+            sketches.append((c, np.full(len(c), j, 'int32'), sketch_bucket(v), np.ones(len(c), 'int64')))
+        sketch = _compact_sketch(*[np.concatenate(parts) for parts in zip(*sketches)]) if sketches else \
+            [np.zeros(0, 'int64')] * 4
+        return cls(metrics, cells, count, total, total_sq, minimum, maximum, sketch,
+                   [source] if source else [], x_step, y_step, tail)
+
+    @classmethod
+    def merge_all(cls, partials):
+        """
+        合并任意多个部分聚合（一次拼接后按箱求和），箱、指标与草图设置必须一致。
+        来源完全相同的部分聚合只计一次；来源部分重叠（同一扫描已包含在另一个合并结果中）时拒绝合并
+        """
+        partials = [p for p in partials if p is not None]
+        if not partials:
+            raise ValueError("没有可合并的部分聚合")
+        partials = _distinct_sources(partials)
+        first = partials[0]
+        for p in partials[1:]:
+            if p.settings != first.settings:
+                raise ValueError(f"部分聚合的设置不一致: {p.sources} {p.settings} != {first.settings}")
+        cells, code = _unique_cells(np.concatenate([p.cells for p in partials]))
+        n, m = len(cells), len(first.metrics)
+
+        def combine(attr, ufunc, fill, dtype):
+            out = np.full((n, m), fill, dtype=dtype)
+            ufunc.at(out, code, np.concatenate([getattr(p, attr) for p in partials]))
+            return out
+
+        offsets = np.cumsum([0] + [len(p) for p in partials[:-1]])
+        sketch_cell = np.concatenate([code[offset + p.sketch[0]] for offset, p in zip(offsets, partials)])
+        sketch = _compact_sketch(sketch_cell, *[np.concatenate([p.sketch[i] for p in partials]) for i in (1, 2, 3)])
+        return cls(first.metrics, cells, combine('count', np.add, 0, 'int64'), combine('total', np.add, 0.0, 'f8'),
+                   combine('total_sq', np.add, 0.0, 'f8'), combine('minimum', np.minimum, np.inf, 'f8'),
+                   combine('maximum', np.maximum, -np.inf, 'f8'), sketch,
+                   [s for p in partials for s in p.sources], first.x_step, first.y_step, first.tail)
+
+    def merge(self, other):
+        return PartialAggregate.merge_all([self, other])
+
+    def mean(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.total / self.count
+
+    def std(self):
+        """样本标准差 (ddof=1)，由 sum 与 sumsq 求得"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = (self.total_sq - self.total * self.mean()) / (self.count - 1)
+        return np.where(self.count > 1, np.sqrt(np.maximum(var, 0.0)), np.nan)
+
+    def quantile(self, q):
+        """由草图估计每个 (箱, 指标) 的 q 分位数（误差不超过半个桶宽），结果截断到该箱的 [min, max]"""
+        cell, metric, bucket, count = self.sketch
+        m = len(self.metrics)
+        n_total = self.count.ravel()
+        result = np.full(n_total.shape, np.nan)
+        if len(count) == 0:
+            return result.reshape(self.count.shape)
+        cum = np.cumsum(count)
+        starts = np.cumsum(n_total) - n_total
+        has = n_total > 0
+        target = starts[has] + q * (n_total[has] - 1)
+        idx = np.minimum(np.searchsorted(cum, target, side='right'), len(cum) - 1)
+        before = cum[idx] - count[idx]
+        value = SKETCH_LOW + (bucket[idx] + (target - before + 0.5) / count[idx]) * SKETCH_WIDTH
+        lo, hi = self.minimum.ravel()[has], self.maximum.ravel()[has]
+        value = np.where(bucket[idx] < 0, lo, np.where(bucket[idx] >= SKETCH_BUCKETS, hi, value))
+        result[has] = np.clip(value, lo, hi)
+        return result.reshape(self.count.shape)
+
+    def to_frame(self, metric=None):
+        """
+        每个箱一行：箱中心 gain_5g / noise 与各指标的 count、mean、std、p50、p95。
+        指定 metric 时另外给出名为 metric 的均值列，可直接交给 heat_map.py 的绘图函数
+        """
+        frame = pd.DataFrame({'gain_5g': self.cells[:, 0] * self.x_step, 'noise': self.cells[:, 1] * self.y_step})
+        mean, std, p50, p95 = self.mean(), self.std(), self.quantile(0.5), self.quantile(0.95)
+        for j, name in enumerate(self.metrics):
+            frame[f'{name}_count'] = self.count[:, j]
+            frame[f'{name}_mean'] = mean[:, j]
+            frame[f'{name}_std'] = std[:, j]
+            frame[f'{name}_p50'] = p50[:, j]
+            frame[f'{name}_p95'] = p95[:, j]
+        if metric is not None:
+            if metric not in self.metrics:
+                raise ValueError(f"部分聚合中没有指标 '{metric}'，可选 {self.metrics}")
+            frame[metric] = frame[f'{metric}_mean']
+            frame = frame[frame[f'{metric}_count'] > 0].reset_index(drop=True)
+        return frame
+
+    def save(self, path):
+        meta = dict(self.settings, version=PARTIAL_VERSION, sources=self.sources)
+        buffer = io.BytesIO()
+        # 同类数组叠成一个成员：npz 中每个成员都有一次 zip 读取开销，合并上百个文件时以读取为主
+        stats = np.stack([self.count, self.total, self.total_sq, self.minimum, self.maximum]).astype('float64')
+        np.savez_compressed(buffer, meta=np.array(json.dumps(meta, ensure_ascii=False)), cells=self.cells,
+                            stats=stats, sketch=np.stack([np.asarray(a, dtype='int64') for a in self.sketch]))
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('version') != PARTIAL_VERSION or meta.get('sketch') != [SKETCH_LOW, SKETCH_HIGH, SKETCH_WIDTH]:
+                raise ValueError(f"{path}: 部分聚合的版本或草图设置与当前代码不一致，需要重新生成")
+            count, total, total_sq, minimum, maximum = data['stats']
+            return cls(meta['metrics'], data['cells'], count.astype('int64'), total, total_sq, minimum, maximum,
+                       list(data['sketch']), meta['sources'], meta['x_step'], meta['y_step'], meta['tail'])
+
+
+def _source_key(source):
+    return source.get('file'), source.get('size'), source.get('mtime_ns')
+
+
+def _distinct_sources(partials):
+    """去掉来源完全相同的重复部分聚合；同一源文件出现在两个不同的部分聚合中时抛出 ValueError，避免重复计数"""
+    seen_sets, seen_files, distinct = set(), {}, []
+    for p in partials:
+        keys = frozenset(_source_key(s) for s in p.sources)
+        if keys and keys in seen_sets:
+            continue
+        for key in keys:
+            if key[0] in seen_files:
+                raise ValueError(f"源文件 {key[0]} 同时出现在多个部分聚合中（{seen_files[key[0]]} 与 "
+                                 f"{[_source_key(s)[0] for s in p.sources]}），合并会重复计数")
+        for key in keys:
+            seen_files[key[0]] = [_source_key(s)[0] for s in p.sources]
+        if keys:
+            seen_sets.add(keys)
+        distinct.append(p)
+    return distinct
+
+
+def _compact_sketch(cell, metric, bucket, count):
+    """相同 (箱, 指标, 桶) 的计数相加，并按该顺序排序（quantile 依赖此顺序）"""
+    cell, metric, bucket = cell.astype('int64'), metric.astype('int64'), bucket.astype('int64')
+    if len(cell) == 0:
+        return [cell, metric.astype('int32'), bucket.astype('int32'), count.astype('int64')]
+    # 桶号含 -1 与 SKETCH_BUCKETS，偏移 1 后组合成单个整数键
+    span_b = SKETCH_BUCKETS + 2
+    span_m = int(metric.max()) + 1
+    key = (cell * span_m + metric) * span_b + (bucket + 1)
+    uniq, inverse = _dense_unique(key)
+    counts = np.bincount(inverse, weights=count).astype('int64')
+    bucket = uniq % span_b - 1
+    rest = uniq // span_b
+    return [rest // span_m, (rest % span_m).astype('int32'), bucket.astype('int32'), counts]
+
+
+def build_partial(input_file, metrics=DEFAULT_PARTIAL_METRICS, tail=DEFAULT_TAIL_N, output=None):
+    """读取一次扫描的原始 CSV，计算部分聚合并保存到 <文件名>.partial.npz，返回保存路径"""
+    header = pd.read_csv(input_file, nrows=0).columns
+    usecols = [c for c in [*GROUP_KEYS, *metrics] if c in header]
+    df = pd.read_csv(input_file, usecols=usecols)
+    st = os.stat(input_file)
+    source = dict(file=os.path.abspath(input_file), size=st.st_size, mtime_ns=st.st_mtime_ns)
+    output = output or default_partial_file(input_file)
+    PartialAggregate.from_frame(df, metrics, tail, source).save(output)
+    return output
+
+
+def read_meta(partial_file):
+    """只读取部分聚合的元数据（设置与来源），不解压统计数组"""
+    with np.load(partial_file) as data:
+        return json.loads(str(data['meta']))
+
+
+def is_single_run(partial_file):
+    """部分聚合只来自一次扫描（合并结果记录了多个来源）"""
+    try:
+        return len(read_meta(partial_file).get('sources') or []) <= 1
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def is_partial_fresh(input_file, partial_file, metrics=DEFAULT_PARTIAL_METRICS, tail=DEFAULT_TAIL_N):
+    """部分聚合存在，记录的源文件大小与修改时间与当前一致，且指标、tail 与分箱设置与本次要求相同"""
+    try:
+        meta = read_meta(partial_file)
+        st = os.stat(input_file)
+    except (OSError, ValueError, KeyError):
+        return False
+    sources = meta.get('sources') or [{}]
+    if not (meta.get('version') == PARTIAL_VERSION and len(sources) == 1
+            and sources[0].get('size') == st.st_size and sources[0].get('mtime_ns') == st.st_mtime_ns):
+        return False
+    if (meta.get('tail') != tail or meta.get('x_step') != DEFAULT_GAIN_STEP
+            or meta.get('y_step') != DEFAULT_NOISE_STEP):
+        return False
+    if meta.get('metrics') == list(metrics):
+        return True
+    # from_frame 只保留 CSV 中存在的指标，按表头过滤后再比较
+    header = pd.read_csv(input_file, nrows=0).columns
+    return meta.get('metrics') == [m for m in metrics if m in header]
+
+
+def ensure_partials(input_files, metrics=DEFAULT_PARTIAL_METRICS, tail=DEFAULT_TAIL_N, jobs=1):
+    """为缺少、过期或设置不同的原始 CSV 生成部分聚合（jobs > 1 时多进程），返回全部部分聚合路径"""
+    stale = [f for f in input_files if not is_partial_fresh(f, default_partial_file(f), metrics, tail)]
+    if stale:
+        print(f"生成 {len(stale)} 个部分聚合（{len(input_files) - len(stale)} 个已是最新）...")
+        if jobs > 1 and len(stale) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                list(pool.map(build_partial, stale, [metrics] * len(stale), [tail] * len(stale)))
+        else:
+            for f in stale:
+                build_partial(f, metrics, tail)
+    return [default_partial_file(f) for f in input_files]
+
+
+def merge_partial_files(paths, jobs=4):
+    """并行读取部分聚合文件（解压在 zlib 中释放 GIL）后一次合并"""
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        partials = list(pool.map(PartialAggregate.load, paths))
+    return PartialAggregate.merge_all(partials)
+
+
+# 采集端在原始 CSV 旁写出的附属文件：iperf 报告流、合并了 iperf 列的记录、捕获回放的记录。
+# 后两者与原始 CSV 是同一次扫描，当作输入会重复统计
+SIDE_FILE_SUFFIXES = ('.grid.csv', '.iperf.csv', '.merged.csv', '.replay.csv')
+
+
+def is_raw_csv(path, metrics=DEFAULT_PARTIAL_METRICS):
+    """原始扫描 CSV：不是附属文件，有分箱坐标列和至少一个指标列（合并输出的统计表只有 <指标>_mean 等列，不算）"""
+    if path.endswith(SIDE_FILE_SUFFIXES):
+        return False
+    try:
+        header = set(pd.read_csv(path, nrows=0).columns)
+    except (OSError, ValueError):
+        return False
+    return set(GROUP_KEYS) <= header and any(m in header for m in metrics)
+
+
+def _expand_inputs(paths, suffix, keep=None):
+    """目录展开为其中的 *suffix 文件（keep 给定时只保留 keep(f) 为真的），文件原样保留"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(f for f in sorted(glob.glob(os.path.join(path, '*' + suffix))) if keep is None or keep(f))
+        else:
+            files.append(path)
+    return files
+
+
+def run_benchmark(runs=300, rows=20000, directory=None, jobs=4):
+    """runs 次模拟扫描：从部分聚合合并与重新读取全部原始 CSV 计算的耗时与结果对比。
+    未指定 directory 时使用临时目录，测完即删除"""
+    if directory:
+        return _run_benchmark(runs, rows, directory, jobs)
+    import shutil
+    import tempfile
+    directory = tempfile.mkdtemp(prefix='heat_partials_')
+    try:
+        return _run_benchmark(runs, rows, directory, jobs)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _run_benchmark(runs, rows, directory, jobs):
+    os.makedirs(directory, exist_ok=True)
+    csvs = []
+    for i in range(runs):
+        path = os.path.join(directory, f'run{i:03d}.csv')
+        if not os.path.exists(path):
+            synthetic_heatmap_data(rows, n_gain=21, n_noise=23, seed=i).to_csv(path, index=False)
+        csvs.append(path)
+    started = time.perf_counter()
+    partial_files = ensure_partials(csvs, jobs=jobs)
+    print(f"{runs} 个部分聚合就绪: {time.perf_counter() - started:.2f}s（只在新增或改动的扫描上计算）")
+
+    started = time.perf_counter()
+    campaign = merge_partial_files(partial_files, jobs)
+    t_merge = time.perf_counter() - started
+    print(f"合并 {runs} 个部分聚合: {t_merge * 1000:.0f} ms, {len(campaign)} 个箱")
+
+    started = time.perf_counter()
+    raw = pd.concat([tail_n(pd.read_csv(p)) for p in csvs], ignore_index=True)
+    raw['gain_bin'] = bin_index(raw['gain_5g'], DEFAULT_GAIN_STEP)
+    raw['noise_bin'] = bin_index(raw['noise'], DEFAULT_NOISE_STEP)
+    expected = raw.groupby(['gain_bin', 'noise_bin'])['avg_rate_mbps'].agg(['mean', 'std', 'median'])
+    t_raw = time.perf_counter() - started
+    print(f"重新读取全部原始 CSV: {t_raw:.2f}s（合并快 {t_raw / t_merge:.0f}x）")
+
+    j = campaign.metrics.index('avg_rate_mbps')
+    got = pd.DataFrame({'mean': campaign.mean()[:, j], 'std': campaign.std()[:, j],
+                        'median': campaign.quantile(0.5)[:, j]},
+                       index=pd.MultiIndex.from_arrays([campaign.cells[:, 0], campaign.cells[:, 1]]))
+    got = got.reindex(expected.index)
+    print(f"与原始数据的最大差异: 均值 {np.nanmax(np.abs(got['mean'] - expected['mean'])):.2e}, "
+          f"标准差 {np.nanmax(np.abs(got['std'] - expected['std'])):.2e}, "
+          f"中位数 {np.nanmax(np.abs(got['median'] - expected['median'])):.3f}（桶宽 {SKETCH_WIDTH}）")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='多次扫描热力图的可合并部分聚合')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_build = sub.add_parser('build', help='为原始 CSV 生成 <文件名>.partial.npz（已是最新的跳过）')
+    p_build.add_argument('inputs', nargs='+', help='原始 CSV 文件或目录')
+    p_build.add_argument('--metrics', nargs='+', default=DEFAULT_PARTIAL_METRICS)
+    p_build.add_argument('--tail', type=int, default=DEFAULT_TAIL_N,
+                         help='每个 (gain_5g, noise) 只取最后 N 条，0 为全部 (默认: 10)')
+    p_build.add_argument('-j', '--jobs', type=int, default=1)
+    p_merge = sub.add_parser('merge', help='合并部分聚合（目录中的原始 CSV 会先生成部分聚合）')
+    p_merge.add_argument('inputs', nargs='+', help='*.partial.npz、原始 CSV 或目录')
+    p_merge.add_argument('-o', '--output', required=True, help='合并结果，*.partial.npz 或 *.csv 统计表')
+    p_merge.add_argument('-j', '--jobs', type=int, default=4)
+    p_bench = sub.add_parser('bench', help='合并部分聚合与重新读取原始数据的耗时对比')
+    p_bench.add_argument('--runs', type=int, default=300)
+    p_bench.add_argument('--rows', type=int, default=20000)
+    p_bench.add_argument('-d', '--directory', help='模拟扫描的目录，保留其中文件 (默认: 临时目录，测完删除)')
+    p_bench.add_argument('-j', '--jobs', type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        files = [f for f in _expand_inputs(args.inputs, '.csv', lambda f: is_raw_csv(f, args.metrics))
+                 if not f.endswith('.grid.csv')]
+        ensure_partials(files, args.metrics, args.tail or None, args.jobs)
+    elif args.command == 'merge':
+        # 目录中只取单次扫描的部分聚合：之前保存在同一目录的合并结果已包含这些扫描
+        partials = [f for f in _expand_inputs(args.inputs, PARTIAL_SUFFIX, is_single_run) if is_partial_file(f)]
+        csvs = [f for f in _expand_inputs(args.inputs, '.csv', is_raw_csv)
+                if f.endswith('.csv') and not f.endswith('.grid.csv')]
+        paths = sorted(set(partials + ensure_partials(csvs, jobs=args.jobs)))
+        started = time.perf_counter()
+        campaign = merge_partial_files(paths, args.jobs)
+        elapsed = time.perf_counter() - started
+        if is_partial_file(args.output):
+            campaign.save(args.output)
+        else:
+            campaign.to_frame().to_csv(args.output, index=False)
+        print(f"合并 {len(paths)} 个部分聚合（{len(campaign.sources)} 次扫描, {len(campaign)} 个箱）"
+              f"用时 {elapsed * 1000:.0f} ms -> {args.output}")
+    else:
+        run_benchmark(args.runs, args.rows, args.directory, args.jobs)
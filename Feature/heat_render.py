@@ -0,0 +1,229 @@
+# python
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import ListedColormap, BoundaryNorm
+
+from Feature.heat_binning import bin_aggregate, synthetic_heatmap_data, tail_n
+
+# 输出尺寸与 heat_map.py 中 Plotly 图相同；字号按 Plotly 的像素值换算为磅
+WIDTH_PX, HEIGHT_PX = 2400, 1600
+DPI = 100
+PX = 72 / DPI
+
+# 拟合等高线图的色带、等高线范围与分级，heat_map.py 的 Plotly 渲染共用
+CONTOUR_COLORSCALE = [
+    [0.0, "#0c0180"],
+    [0.1, "#1101bc"],
+    [0.2, "#1a2dff"],
+    [0.3, "#247ef2"],
+    [0.4, "#21d9cc"],
+    [0.5, "#2ad921"],
+    [0.6, "#abd921"],
+    [0.7, "#f2cc24"],
+    [0.8, "#f27324"],
+    [0.9, "#e52222"],
+    [1.0, "#e52222"]
+]
+CONTOUR_START = 10
+CONTOUR_END = 210
+N_LEVELS = 10
+# Plotly 默认模板的绘图区背景色
+PLOT_BGCOLOR = '#E5ECF6'
+FONT_FAMILY = ['Manrope Medium', 'Manrope', 'SimHei', 'Microsoft YaHei', 'DejaVu Sans']
+
+
+def colorbar_ticks():
+    """色带刻度：放在各色块的交界处"""
+    tickvals = [CONTOUR_START + p * (CONTOUR_END - CONTOUR_START) for p, _ in CONTOUR_COLORSCALE[:-1]]
+    return tickvals, [f"{val:.0f}" for val in tickvals]
+
+
+def fitted_grid(df, metric):
+    """
+    拟合等高线图的数据：按 gain 2.5、noise 5 的步长分箱求均值，去掉无效列，并找到最小值所在的箱。
+    返回 dict(x, y, z, x_min, x_max, y_min, y_max, min_z_x, min_z_y, min_z_val)
+    """
+    pivot = bin_aggregate(df, [metric], x_step=2.5, y_step=5, stats=('mean',)).pivot(metric, 'mean')
+    z = pivot.values
+    y = pivot.index.values
+    # 计算列的有效性：去掉均值之和为 0 的列
+    valid_cols = np.sum(z, axis=0) != 0
+    x = pivot.columns[valid_cols]
+    z = z[:, valid_cols]
+    min_z_idx = np.unravel_index(np.argmin(z, axis=None), z.shape)
+    return dict(x=x, y=y, z=z, x_min=x.min(), x_max=x.max(), y_min=y.min(), y_max=y.max(),
+                min_z_x=x[min_z_idx[1]], min_z_y=y[min_z_idx[0]], min_z_val=z[min_z_idx])
+
+
+def annotation_offset(grid):
+    """
+    最小值标注的箭头偏移（像素，Plotly 的 ax/ay 约定：ay 为正时文字在点的下方），确保标注在图内。
+    x 轴反向（从大到小）：最小值在右半边时箭头指向左；在上半边时箭头指向下
+    """
+    x_center = (grid['x_min'] + grid['x_max']) / 2
+    y_center = (grid['y_min'] + grid['y_max']) / 2
+    ax_offset = -150 if grid['min_z_x'] < x_center else 150
+    ay_offset = 150 if grid['min_z_y'] > y_center else -150
+    return ax_offset, ay_offset
+
+
+def fill_gaps(z, iterations=100):
+    """
+    与 Plotly contour/heatmap 绘制前的补洞方式相同的思路：空单元先取有效邻居的均值，
+    再对空单元做若干次邻域平均松弛，使等高线在缺测处连续
+    """
+    z = np.array(z, dtype='float64')
+    empty = np.isnan(z)
+    if not empty.any() or empty.all():
+        return z
+    filled = np.where(empty, np.nanmean(z), z)
+    padded = np.empty((z.shape[0] + 2, z.shape[1] + 2))
+    for _ in range(iterations):
+        padded[1:-1, 1:-1] = filled
+        # 边界复制相邻值，边缘单元只平均图内的邻居
+        padded[0, 1:-1], padded[-1, 1:-1] = filled[0], filled[-1]
+        padded[1:-1, 0], padded[1:-1, -1] = filled[:, 0], filled[:, -1]
+        neighbours = (padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:]) / 4
+        filled[empty] = neighbours[empty]
+    return filled
+
+
+def _new_figure():
+    fig = Figure(figsize=(WIDTH_PX / DPI, HEIGHT_PX / DPI), dpi=DPI)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _style_axis(ax, x_title, y_title, title_px=44, tick_px=36):
+    ax.set_xlabel(x_title, fontsize=title_px * PX)
+    ax.set_ylabel(y_title, fontsize=title_px * PX)
+    ax.tick_params(direction='out', length=10 * PX, width=2 * PX, labelsize=tick_px * PX)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    ax.set_facecolor(PLOT_BGCOLOR)
+
+
+def save_raw_heatmap(df, metric, output_file):
+    """
+    Agg 渲染的原始数据点热力图，与 plot_raw_heatmap 相同：以出现过的 (gain_5g, noise) 为格点（重复点取最后一条），
+    viridis 色带，空格点按 Plotly 的方式补齐，x 轴反向
+    """
+    z = df[metric].to_numpy(dtype='float64')
+    xs, x_code = np.unique(df['gain_5g'].to_numpy(dtype='float64'), return_inverse=True)
+    ys, y_code = np.unique(df['noise'].to_numpy(dtype='float64'), return_inverse=True)
+    grid = np.full((len(ys), len(xs)), np.nan)
+    grid[y_code, x_code] = z
+    with matplotlib.rc_context({'font.sans-serif': FONT_FAMILY, 'axes.unicode_minus': False}):
+        fig = _new_figure()
+        fig.subplots_adjust(left=0.06, right=0.9, bottom=0.08, top=0.92)
+        ax = fig.add_subplot()
+        mesh = ax.pcolormesh(xs, ys, fill_gaps(grid), shading='nearest', cmap='viridis',
+                             vmin=np.nanmin(z), vmax=np.nanmax(z))
+        ax.set_xlim(ax.get_xlim()[::-1])
+        _style_axis(ax, '信号增益 (Gain)', '噪声等级 (Noise)', title_px=14, tick_px=12)
+        ax.set_title('原始数据点热力图', loc='left', fontsize=17 * PX)
+        colorbar = fig.colorbar(mesh, ax=ax, fraction=0.02, pad=0.02, aspect=50)
+        colorbar.set_label(metric.replace("_", " ").title(), fontsize=14 * PX)
+        colorbar.outline.set_visible(False)
+        fig.savefig(output_file, dpi=DPI)
+
+
+def save_fitted_heatmap(grid, output_file):
+    """
+    Agg 渲染的拟合等高线图，与 plot_fitted_heatmap 的 Plotly 图一致：相同色带与分级（每级一个色块），
+    色带刻度在色块交界，最小值标注与箭头偏移相同
+    """
+    colors = [c for _, c in CONTOUR_COLORSCALE[:-1]]
+    levels = np.linspace(CONTOUR_START, CONTOUR_END, N_LEVELS + 1)
+    cmap = ListedColormap(colors)
+    tickvals, ticktext = colorbar_ticks()
+    x = np.asarray(grid['x'], dtype='float64')
+    y = np.asarray(grid['y'], dtype='float64')
+    with matplotlib.rc_context({'font.sans-serif': FONT_FAMILY, 'axes.unicode_minus': False}):
+        fig = _new_figure()
+        fig.subplots_adjust(left=0.09, right=0.9, bottom=0.11, top=0.96)
+        ax = fig.add_subplot()
+        # 低于起点/高于终点的区域归入首/末级，色带本身不带延伸箭头（与 Plotly 相同）
+        # 分箱均值的空箱按 Plotly 的方式补齐；散点拟合的空格点是有意留空的（凸包外或置信掩码）
+        z = fill_gaps(grid['z']) if grid.get('fill_gaps', True) else grid['z']
+        z = np.clip(z, CONTOUR_START, CONTOUR_END)
+        filled = ax.contourf(x, y, z, levels=levels, cmap=cmap, norm=BoundaryNorm(levels, cmap.N))
+        ax.set_xlim(grid['x_max'], grid['x_min'])
+        ax.set_ylim(grid['y_min'], grid['y_max'])
+        _style_axis(ax, 'TX_gain (dB)', 'Noise Level')
+
+        ax_offset, ay_offset = annotation_offset(grid)
+        ax.annotate(f"Min z: {grid['min_z_val']:.2f}", xy=(grid['min_z_x'], grid['min_z_y']),
+                    xytext=(ax_offset * PX, -ay_offset * PX), textcoords='offset points',
+                    ha='center', va='center', fontsize=42 * PX, color='#000',
+                    bbox=dict(boxstyle=f'square,pad={12 / 42:.2f}', fc='#fff', ec='#fff'),
+                    arrowprops=dict(arrowstyle='-|>', color='#fff', lw=4 * PX, mutation_scale=30))
+
+        colorbar = fig.colorbar(filled, ax=ax, fraction=0.02, pad=0.02, aspect=50, ticks=tickvals)
+        colorbar.ax.set_yticklabels(ticktext)
+        colorbar.ax.tick_params(labelsize=36 * PX, length=0)
+        colorbar.outline.set_visible(False)
+        fig.savefig(output_file, dpi=DPI)
+
+
+def run_benchmark(figures=5, rows=20000, directory=None):
+    """
+    同一份数据分别用 Plotly (write_image/Kaleido) 与 Agg 渲染 figures 次，输出每张图的平均耗时。
+    未指定 directory 时图片写入临时目录，测完即删除
+    """
+    if directory:
+        timings = _run_benchmark(figures, rows, directory)
+        print(f"输出目录 {directory}")
+        return timings
+    directory = tempfile.mkdtemp(prefix='heat_render_')
+    try:
+        return _run_benchmark(figures, rows, directory)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _run_benchmark(figures, rows, directory):
+    import heat_map
+
+    df = tail_n(synthetic_heatmap_data(rows, n_gain=21, n_noise=23))
+    metric = 'avg_rate_mbps'
+    os.makedirs(directory, exist_ok=True)
+    timings = {}
+    for renderer in ('plotly', 'mpl'):
+        elapsed = []
+        try:
+            for i in range(figures):
+                started = time.perf_counter()
+                heat_map.plot_raw_heatmap(df, metric, os.path.join(directory, f'{renderer}{i}_raw.png'),
+                                          renderer=renderer)
+                heat_map.plot_fitted_heatmap(df, metric, os.path.join(directory, f'{renderer}{i}_fit.png'),
+                                             renderer=renderer)
+                elapsed.append((time.perf_counter() - started) / 2)
+        except Exception as e:
+            print(f"{renderer}: 无法导出静态图 ({type(e).__name__}: {e})")
+            continue
+        timings[renderer] = elapsed
+    print(f"\n{len(df)} 行，每个渲染器 {figures} 组 (原始 + 拟合)，{WIDTH_PX}x{HEIGHT_PX}")
+    for renderer, elapsed in timings.items():
+        print(f"{renderer:>6}: 首张 {elapsed[0]:.2f}s，平均每张 {np.mean(elapsed):.2f}s，"
+              f"不含首张 {np.mean(elapsed[1:]) if len(elapsed) > 1 else elapsed[0]:.2f}s")
+    if len(timings) == 2:
+        print(f"Agg 渲染每张快 {np.mean(timings['plotly']) / np.mean(timings['mpl']):.1f}x")
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='热力图静态导出：Plotly/Kaleido 与 Agg 渲染的耗时对比')
+    parser.add_argument('--figures', type=int, default=5, help='每个渲染器导出的图组数 (默认: 5)')
+    parser.add_argument('--rows', type=int, default=20000, help='模拟数据行数 (默认: 20000)')
+    parser.add_argument('-o', '--output', help='导出图片的目录，保留以便并排比较 (默认: 临时目录，测完删除)')
+    args = parser.parse_args()
+    run_benchmark(args.figures, args.rows, args.output)
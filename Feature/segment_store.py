@@ -0,0 +1,314 @@
+# python
+import os
+import glob
+import json
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from Feature.logging_config import configure_logging
+
+configure_logging()
+
+# 与 Collect/record_sink.py 的 SegmentedRecordSink 写出的格式一致
+SEGMENT_SUFFIX = '.bin'
+SEGMENT_INDEX_SUFFIX = '.idx.json'
+DEFAULT_TARGET_BYTES = 64 * 2**20
+DEFAULT_COMPACT_INTERVAL = 600.0
+
+
+def to_epoch_ns(value):
+    """
+    查询时间转换为 epoch 纳秒：数字视为 epoch 秒，字符串/datetime 视为本地时间
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return int(value * 1e9)
+    if isinstance(value, str):
+        value = pd.Timestamp(value).to_pydatetime()
+    if isinstance(value, pd.Timestamp):
+        value = value.to_pydatetime()
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            return int(value.timestamp() * 1e9)
+        return int(time.mktime(value.timetuple())) * 1_000_000_000 + value.microsecond * 1000
+    raise TypeError(f"无法识别的时间: {value!r}")
+
+
+def write_frame(f, columns):
+    """
+    与 record_sink.write_frame 相同的帧格式：先写列名数组，再按顺序写各列的 .npy 数组；
+    字符串列存为定长 unicode，读取时不需要 pickle
+    """
+    np.save(f, np.array(list(columns), dtype=str), allow_pickle=False)
+    for values in columns.values():
+        np.save(f, values.astype(str) if values.dtype == object else values, allow_pickle=False)
+
+
+def read_frame(f):
+    """读取下一帧；文件结束时抛出 EOFError，帧不完整时抛出 ValueError"""
+    names = np.load(f, allow_pickle=False)
+    try:
+        return {str(name): np.load(f, allow_pickle=False) for name in names}
+    except EOFError as e:
+        raise ValueError("帧不完整") from e
+
+
+def read_segment(path, columns=None):
+    """
+    读取一个段文件中的全部帧，返回 {列名: numpy 数组}；崩溃留下的不完整末帧被忽略
+    """
+    frames = []
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                frame = read_frame(f)
+            except EOFError:
+                break
+            except ValueError:
+                logging.warning(f"段文件 {path} 在偏移 {f.tell()} 处截断，忽略其后的数据")
+                break
+            frames.append(frame if columns is None else {c: frame[c] for c in columns if c in frame})
+    if not frames:
+        return {}
+    if len(frames) == 1:
+        return frames[0]
+    return {col: np.concatenate([fr[col] for fr in frames]) for col in frames[0]}
+
+
+def _write_index(path, index):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(tmp, path)
+
+
+def _merge_range(a, b):
+    if a is None or b is None:
+        return a if b is None else b
+    return [min(a[0], b[0]), max(a[1], b[1])]
+
+
+def local_frame(columns):
+    """
+    段数据转换为与 parse_complex_csv 相同形式的 DataFrame：timestamp 字符串、pd_time、delta_seconds、Duration
+    """
+    df = pd.DataFrame(columns)
+    if df.empty:
+        return df
+    ts = df['timestamp'].to_numpy(dtype='int64')
+    # 与采集端一致：按第一条记录的 UTC 偏移换算为本地时间
+    offset_ns = time.localtime(int(ts[0]) // 1_000_000_000).tm_gmtoff * 1_000_000_000
+    pd_time = pd.to_datetime(ts + offset_ns)
+    df['timestamp'] = np.char.replace(np.datetime_as_string(pd_time.to_numpy().astype('datetime64[us]'), unit='us'),
+                                      'T', ' ').astype(object)
+    df['pd_time'] = pd_time
+    df['delta_seconds'] = (df['pd_time'] - df['pd_time'].min()).dt.total_seconds()
+    df['Duration'] = range(len(df))
+    return df
+
+
+class SegmentStore:
+    """
+    分段存储目录（<输出文件>.segments/）的读取与压缩。
+    每段有一个 sidecar 索引（时间范围、行数、各列 min/max），查询只打开与时间范围和过滤条件重叠的段；
+    compact() 把相邻的小段合并为一段，合并后的索引记录被替代的段名，读取时忽略这些旧段，因此压缩期间查询不会重复或丢失数据
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._compactor = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def segments(self):
+        """所有有效段的索引，按起始时间排序；已被合并替代的段不在其中"""
+        indexes = []
+        for path in glob.glob(os.path.join(self.directory, '*' + SEGMENT_INDEX_SUFFIX)):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                # 正在被压缩删除，或写入时崩溃
+                continue
+            if index.get('rows') and os.path.exists(os.path.join(self.directory, index['segment'])):
+                indexes.append(index)
+        superseded = {name for index in indexes for name in index.get('supersedes', [])}
+        indexes = [index for index in indexes if index['segment'] not in superseded]
+        return sorted(indexes, key=lambda index: index['first_ts'])
+
+    def info(self):
+        rows = [{'segment': s['segment'], 'first': local_frame({'timestamp': [s['first_ts']]})['timestamp'][0],
+                 'last': local_frame({'timestamp': [s['last_ts']]})['timestamp'][0], 'rows': s['rows'],
+                 'MB': s['bytes'] / 2**20, 'complete': s['complete']} for s in self.segments()]
+        return pd.DataFrame(rows, columns=['segment', 'first', 'last', 'rows', 'MB', 'complete'])
+
+    def select(self, start_ns=None, end_ns=None, **equals):
+        """与时间范围 [start_ns, end_ns] 重叠、且列值范围可能包含 equals 中各值的段"""
+        selected = []
+        for index in self.segments():
+            if start_ns is not None and index['last_ts'] < start_ns:
+                continue
+            if end_ns is not None and index['first_ts'] > end_ns:
+                continue
+            ranges = index['columns']
+            if any(ranges.get(col) is None or not ranges[col][0] <= value <= ranges[col][1]
+                   for col, value in equals.items() if col in ranges):
+                continue
+            selected.append(index)
+        return selected
+
+    def query(self, start=None, end=None, columns=None, **equals):
+        """
+        读取时间范围 [start, end] 内的记录（本地时间字符串/datetime 或 epoch 秒），
+        例如 query('2024-05-02 14:00', '2024-05-02 14:05', ue_id=1)。
+        columns 限定返回的列；equals 为等值过滤，同时用于按索引跳过段。返回 parse_complex_csv 形式的 DataFrame
+        """
+        start_ns, end_ns = to_epoch_ns(start), to_epoch_ns(end)
+        wanted = None if columns is None else list(dict.fromkeys(['timestamp', *columns, *equals]))
+        parts = []
+        for index in self.select(start_ns, end_ns, **equals):
+            data = read_segment(os.path.join(self.directory, index['segment']), wanted)
+            if not data:
+                continue
+            ts = data['timestamp']
+            mask = np.ones(len(ts), dtype=bool)
+            if start_ns is not None:
+                mask &= ts >= start_ns
+            if end_ns is not None:
+                mask &= ts <= end_ns
+            for col, value in equals.items():
+                if col in data:
+                    mask &= data[col] == value
+            if mask.all():
+                parts.append(data)
+            elif mask.any():
+                parts.append({col: values[mask] for col, values in data.items()})
+        if not parts:
+            return pd.DataFrame(columns=wanted or [])
+        merged = {col: np.concatenate([p[col] for p in parts]) for col in parts[0]}
+        order = np.argsort(merged['timestamp'], kind='stable')
+        if np.any(order != np.arange(len(order))):
+            merged = {col: values[order] for col, values in merged.items()}
+        df = local_frame(merged)
+        return df if columns is None else df[list(dict.fromkeys([*columns, 'pd_time', 'delta_seconds']))]
+
+    def compact(self, target_bytes=DEFAULT_TARGET_BYTES, small_bytes=None):
+        """
+        把相邻的已完成小段（各自小于 small_bytes，默认 target_bytes / 4）合并，合并后不超过 target_bytes。
+        返回被合并掉的段数
+        """
+        small_bytes = small_bytes or target_bytes // 4
+        with self._lock:
+            groups, group, size = [], [], 0
+            for index in self.segments():
+                small = index['complete'] and index['bytes'] < small_bytes
+                if small and size + index['bytes'] <= target_bytes:
+                    group.append(index)
+                    size += index['bytes']
+                    continue
+                if len(group) > 1:
+                    groups.append(group)
+                group, size = ([index], index['bytes']) if small else ([], 0)
+            if len(group) > 1:
+                groups.append(group)
+            merged = 0
+            for group in groups:
+                self._merge(group)
+                merged += len(group)
+            return merged
+
+    def _merge(self, group):
+        parts = [read_segment(os.path.join(self.directory, index['segment'])) for index in group]
+        columns = {col: np.concatenate([p[col] for p in parts]) for col in parts[0]}
+        name = os.path.splitext(group[0]['segment'])[0] + f'-c{len(group)}'
+        path = os.path.join(self.directory, name + SEGMENT_SUFFIX)
+        with open(path, 'wb') as f:
+            write_frame(f, columns)
+            f.flush()
+            os.fsync(f.fileno())
+        ranges = {}
+        for index in group:
+            for col, value in index['columns'].items():
+                ranges[col] = _merge_range(ranges.get(col), value)
+        # 新索引写入的瞬间旧段即被替代，之后再删除旧文件
+        _write_index(os.path.join(self.directory, name + SEGMENT_INDEX_SUFFIX), {
+            'segment': name + SEGMENT_SUFFIX, 'first_ts': group[0]['first_ts'],
+            'last_ts': max(index['last_ts'] for index in group), 'rows': sum(index['rows'] for index in group),
+            'bytes': os.path.getsize(path), 'complete': True, 'columns': ranges,
+            'supersedes': [index['segment'] for index in group]})
+        for index in group:
+            base = os.path.join(self.directory, os.path.splitext(index['segment'])[0])
+            for suffix in (SEGMENT_INDEX_SUFFIX, SEGMENT_SUFFIX):
+                try:
+                    os.remove(base + suffix)
+                except FileNotFoundError:
+                    pass
+
+    def start_compaction(self, interval=DEFAULT_COMPACT_INTERVAL, target_bytes=DEFAULT_TARGET_BYTES):
+        """后台线程每隔 interval 秒压缩一次小段"""
+        if self._compactor is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    merged = self.compact(target_bytes)
+                    if merged:
+                        logging.info(f"{self.directory}: 合并了 {merged} 个小段")
+                except Exception as e:
+                    logging.error(f"压缩 {self.directory} 失败: {e}")
+
+        self._compactor = threading.Thread(target=run, name='segment-compactor', daemon=True)
+        self._compactor.start()
+
+    def stop_compaction(self):
+        if self._compactor is not None:
+            self._stop.set()
+            self._compactor.join()
+            self._compactor = None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='查询或压缩采集器写出的分段存储目录')
+    parser.add_argument('directory', help='分段目录，例如 run.segments')
+    parser.add_argument('--start', help='起始时间（本地时间，如 "2024-05-02 14:00"）')
+    parser.add_argument('--end', help='结束时间（本地时间）')
+    parser.add_argument('--ue-id', type=int, help='只取该 UE 的记录')
+    parser.add_argument('-o', '--output', help='查询结果保存为 CSV')
+    parser.add_argument('--compact', action='store_true', help='合并相邻的小段')
+    parser.add_argument('--watch', type=float, metavar='SECONDS',
+                        help='持续运行，每隔 SECONDS 秒压缩一次（多日采集期间在后台运行）')
+    parser.add_argument('--target-mb', type=float, default=DEFAULT_TARGET_BYTES / 2**20,
+                        help=f'压缩后单段的最大大小 MB (默认: {DEFAULT_TARGET_BYTES // 2**20})')
+    args = parser.parse_args()
+
+    store = SegmentStore(args.directory)
+    target = int(args.target_mb * 2**20)
+    if args.watch:
+        store.start_compaction(args.watch, target)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            store.stop_compaction()
+    elif args.compact:
+        print(f"合并了 {store.compact(target)} 个小段")
+        print(store.info().to_string(index=False))
+    elif args.start or args.end or args.output:
+        equals = {'ue_id': args.ue_id} if args.ue_id is not None else {}
+        started = time.perf_counter()
+        selected = store.select(to_epoch_ns(args.start), to_epoch_ns(args.end), **equals)
+        df = store.query(args.start, args.end, **equals)
+        print(f"{len(df)} 条记录，打开 {len(selected)}/{len(store.segments())} 个段，"
+              f"用时 {time.perf_counter() - started:.3f}s")
+        if args.output:
+            df.drop(columns=['pd_time', 'delta_seconds', 'Duration']).to_csv(args.output, index=False)
+    else:
+        print(store.info().to_string(index=False))
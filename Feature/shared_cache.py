@@ -0,0 +1,216 @@
+# python
+import time
+import random
+import logging
+import argparse
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from Feature.data_cache import frame_nbytes
+from Feature.logging_config import configure_logging
+
+configure_logging()
+
+DEFAULT_SHARED_CACHE_MB = 4096
+
+
+def make_read_only(df):
+    """
+    返回与 df 共享内存、但数值/时间列底层 numpy 数组不可写的 DataFrame，对这些列的原地修改会抛出 ValueError
+    object 列保持可写，pandas 的部分 Cython 实现要求 object 数组可写
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufcmM':
+            values = series.to_numpy(copy=False)
+            values.flags.writeable = False
+            columns[col] = values
+        else:
+            columns[col] = series
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+class DatasetLease:
+    """
+    共享数据集的租约。持有期间数据不会被淘汰；release() 或对象被回收（如会话结束）时归还
+    """
+
+    def __init__(self, cache, key, df):
+        self.key = key
+        self.df = df
+        self._finalizer = weakref.finalize(self, cache._release, key)
+
+    def release(self):
+        self._finalizer()
+
+    @property
+    def active(self):
+        return self._finalizer.alive
+
+
+class SharedDatasetCache:
+    """
+    进程级、线程安全的数据集缓存，供多个 Streamlit 会话共享同一份解析结果。
+    键为文件指纹；每个条目带引用计数，只有无人使用的条目才会在超出内存上限时按 LRU 顺序淘汰。
+    同一个键被多个会话同时请求时只加载一次，交出的数据为只读，会话之间不需要复制。
+    """
+
+    def __init__(self, max_mb=DEFAULT_SHARED_CACHE_MB):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # {key: [DataFrame, 字节数, 引用计数]}
+        self._loading = {}             # {key: threading.Event} 正在加载的键
+        self._total = 0
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def acquire(self, key, loader):
+        """
+        获取 key 对应数据集的租约，缓存中没有时调用 loader() 加载
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry[2] += 1
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return DatasetLease(self, key, entry[0])
+                event = self._loading.get(key)
+                if event is None:
+                    event = self._loading[key] = threading.Event()
+                    break
+            # 其它线程正在加载同一个键，等待其完成后重新查找
+            event.wait()
+
+        try:
+            df = make_read_only(loader())
+        except Exception:
+            with self._lock:
+                self._loading.pop(key).set()
+            raise
+
+        with self._lock:
+            nbytes = frame_nbytes(df)
+            self._entries[key] = [df, nbytes, 1]
+            self._total += nbytes
+            self.loads += 1
+            self._evict_locked()
+            self._loading.pop(key).set()
+        return DatasetLease(self, key, df)
+
+    def _release(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry[2] = max(entry[2] - 1, 0)
+            self._evict_locked()
+
+    def _evict_locked(self):
+        if self._total <= self.max_bytes:
+            return
+        for key in list(self._entries):
+            if self._total <= self.max_bytes:
+                break
+            df, nbytes, refs = self._entries[key]
+            if refs == 0:
+                del self._entries[key]
+                self._total -= nbytes
+                self.evictions += 1
+        if self._total > self.max_bytes:
+            logging.warning(f"共享缓存中正在使用的数据 {self._total / 2**20:.1f} MB 超出上限 "
+                            f"{self.max_bytes / 2**20:.1f} MB")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total,
+                'in_use': sum(1 for e in self._entries.values() if e[2] > 0),
+                'loads': self.loads,
+                'hits': self.hits,
+                'evictions': self.evictions,
+            }
+
+
+def run_load_test(n_sessions=32, n_datasets=8, rows=200_000, reruns=20, max_mb=256, seed=0):
+    """
+    模拟 n_sessions 个并发会话：每个会话反复随机选择若干数据集、读取并归还，
+    检查每个数据集只被加载一次（内存足够时）、数据只读、全部归还后内存不超过上限
+    """
+    cache = SharedDatasetCache(max_mb=max_mb)
+    load_counts = {}
+    counts_lock = threading.Lock()
+    errors = []
+
+    def loader(i):
+        with counts_lock:
+            load_counts[i] = load_counts.get(i, 0) + 1
+        time.sleep(0.05)  # 模拟解析耗时，放大并发加载的竞争
+        rng = np.random.default_rng(i)
+        return pd.DataFrame({'delta_seconds': np.arange(rows, dtype='float64'),
+                             'avg_rate_mbps': rng.random(rows) * 100})
+
+    def session(sid):
+        rng = random.Random(seed + sid)
+        leases = {}
+        try:
+            for _ in range(reruns):
+                wanted = set(rng.sample(range(n_datasets), rng.randint(1, 3)))
+                for i in set(leases) - wanted:
+                    leases.pop(i).release()
+                for i in wanted - set(leases):
+                    leases[i] = cache.acquire(f"dataset-{i}", lambda i=i: loader(i))
+                for i, lease in leases.items():
+                    if len(lease.df) != rows:
+                        raise AssertionError(f"dataset-{i} 行数错误")
+                    try:
+                        lease.df['avg_rate_mbps'].to_numpy()[0] = -1
+                        raise AssertionError("共享数据可被修改")
+                    except ValueError:
+                        pass
+        except Exception as e:
+            errors.append(e)
+        finally:
+            for lease in leases.values():
+                lease.release()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(sid,)) for sid in range(n_sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    stats = cache.stats()
+    dataset_mb = rows * 2 * 8 / 2**20
+    print(f"{n_sessions} 个会话 x {reruns} 次重跑，耗时 {elapsed:.2f}s")
+    print(f"加载 {stats['loads']} 次，命中 {stats['hits']} 次，淘汰 {stats['evictions']} 次，"
+          f"驻留 {stats['entries']} 个数据集 / {stats['bytes'] / 2**20:.1f} MB（上限 {max_mb} MB）")
+    print(f"不共享时每个会话各自持有副本，最多约需 {n_sessions * 3 * dataset_mb:.0f} MB")
+    if errors:
+        raise errors[0]
+    assert stats['in_use'] == 0, "存在未归还的租约"
+    assert stats['bytes'] <= cache.max_bytes, "全部归还后仍超出内存上限"
+    if n_datasets * dataset_mb <= max_mb:
+        assert all(c == 1 for c in load_counts.values()), f"存在重复加载: {load_counts}"
+    print("负载测试通过")
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='共享数据集缓存的并发会话负载测试')
+    parser.add_argument('--sessions', type=int, default=32, help='并发会话数 (默认: 32)')
+    parser.add_argument('--datasets', type=int, default=8, help='数据集数量 (默认: 8)')
+    parser.add_argument('--rows', type=int, default=200_000, help='每个数据集的行数 (默认: 200000)')
+    parser.add_argument('--reruns', type=int, default=20, help='每个会话的重跑次数 (默认: 20)')
+    parser.add_argument('--max-mb', type=float, default=256, help='缓存内存上限 MB (默认: 256)')
+    args = parser.parse_args()
+    run_load_test(args.sessions, args.datasets, args.rows, args.reruns, args.max_mb)
@@ -0,0 +1,105 @@
+# python
+import hashlib
+import pandas as pd
+
+GROUP_KEYS = ['file', 'field', 'RAT', 'ue_id']
+STAT_COLUMNS = ['count', 'mean', 'min', 'p5', 'p50', 'p95', 'max']
+QUANTILES = {0.05: 'p5', 0.5: 'p50', 0.95: 'p95'}
+
+
+def dataset_fingerprint(df):
+    """
+    根据DataFrame内容计算指纹，内容相同的数据集指纹相同
+    """
+    row_hashes = pd.util.hash_pandas_object(df, index=False).values
+    digest = hashlib.sha1(row_hashes.tobytes())
+    digest.update(','.join(map(str, df.columns)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def numeric_fields(df, fields):
+    return [f for f in fields if f in df.columns and f not in GROUP_KEYS and pd.api.types.is_numeric_dtype(df[f])]
+
+
+def compute_summary_stats(data_dict, fields):
+    """
+    一次 groupby 计算每个 (file, field, RAT, ue_id) 的 count/mean/min/p5/p50/p95/max
+    data_dict: {filename: DataFrame}，fields: 需要统计的字段列表（非数值字段自动忽略）
+    """
+    long_frames = []
+    for file_name, df in data_dict.items():
+        cols = numeric_fields(df, fields)
+        if not cols:
+            continue
+        keys = pd.DataFrame({
+            'RAT': df['RAT'] if 'RAT' in df.columns else 'ALL',
+            'ue_id': df['ue_id'] if 'ue_id' in df.columns else -1,
+        }, index=df.index)
+        long = pd.concat([keys, df[cols]], axis=1).melt(id_vars=['RAT', 'ue_id'], var_name='field',
+                                                         value_name='value')
+        long['file'] = file_name
+        long_frames.append(long)
+
+    if not long_frames:
+        return pd.DataFrame(columns=GROUP_KEYS + STAT_COLUMNS)
+
+    df_all = pd.concat(long_frames, ignore_index=True)
+    df_all['file'] = df_all['file'].astype('category')
+    df_all['field'] = df_all['field'].astype('category')
+
+    grouped = df_all.groupby(GROUP_KEYS, observed=True, dropna=False, sort=True)['value']
+    stats = grouped.agg(['count', 'mean', 'min', 'max'])
+    quantiles = grouped.quantile(list(QUANTILES)).unstack().rename(columns=QUANTILES)
+    stats = stats.join(quantiles)[STAT_COLUMNS].reset_index()
+    stats['file'] = stats['file'].astype(str)
+    stats['field'] = stats['field'].astype(str)
+    return stats
+
+
+class SummaryStatsCache:
+    """
+    按数据集指纹缓存统计结果，新增文件或字段时只计算缺失的 (文件, 字段) 部分
+    """
+
+    def __init__(self):
+        self._cache = {}  # {(fingerprint, field): DataFrame}
+
+    def summarize(self, data_dict, fields, fingerprints=None):
+        fingerprints = dict(fingerprints or {})
+        missing = {}
+        for file_name, df in data_dict.items():
+            if file_name not in fingerprints:
+                fingerprints[file_name] = dataset_fingerprint(df)
+            todo = [f for f in numeric_fields(df, fields) if (fingerprints[file_name], f) not in self._cache]
+            if todo:
+                missing[file_name] = df[[c for c in ('RAT', 'ue_id') if c in df.columns] + todo]
+
+        if missing:
+            fresh = compute_summary_stats(missing, fields)
+            for (file_name, field), part in fresh.groupby(['file', 'field'], sort=False):
+                self._cache[(fingerprints[file_name], field)] = part.drop(columns='file')
+            # 没有任何有效值的字段也记入缓存，避免重复计算
+            for file_name, df in missing.items():
+                for field in numeric_fields(df, fields):
+                    self._cache.setdefault((fingerprints[file_name], field),
+                                           pd.DataFrame(columns=GROUP_KEYS[1:] + STAT_COLUMNS))
+
+        parts = []
+        for file_name, df in data_dict.items():
+            for field in numeric_fields(df, fields):
+                part = self._cache[(fingerprints[file_name], field)]
+                if not part.empty:
+                    parts.append(part.assign(file=file_name))
+        if not parts:
+            return pd.DataFrame(columns=GROUP_KEYS + STAT_COLUMNS)
+        return pd.concat(parts, ignore_index=True)[GROUP_KEYS + STAT_COLUMNS]
+
+    def clear(self):
+        self._cache.clear()
+
+
+def export_summary_csv(stats, output_file):
+    """
+    导出统计结果为CSV（utf-8-sig，便于Excel直接打开）
+    """
+    stats.to_csv(output_file, index=False, encoding='utf-8-sig')
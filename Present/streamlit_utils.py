@@ -0,0 +1,239 @@
+# python
+import os
+import sys
+import math
+import hashlib
+from io import BytesIO
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+# streamlit run 只把脚本所在目录加入 sys.path，这里补上项目根目录以便导入 Feature
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Feature.csv_parser import parse_complex_csv
+from Feature.dataset_library import DatasetLibrary, resolve_data_dir
+from Feature.downsample import SeriesStore, minmax_decimate, DEFAULT_MAX_POINTS
+from Feature.shared_cache import SharedDatasetCache, DEFAULT_SHARED_CACHE_MB
+from Feature.statistics import SummaryStatsCache
+
+# 所有会话共享的解析结果缓存的内存上限，可通过环境变量 VIS_SHARED_CACHE_MB 指定
+SHARED_CACHE_MB = float(os.environ.get('VIS_SHARED_CACHE_MB', DEFAULT_SHARED_CACHE_MB))
+
+# 图表模式：静态图逐点绘制；交互图只向浏览器发送按可视范围降采样后的数据
+CHART_MODES = ["静态图(matplotlib)", "交互图(降采样)"]
+
+# 服务器端数据根目录，可通过环境变量 VIS_DATA_DIR 指定；页面只能选择其下的子目录
+DATA_ROOT = os.path.realpath(os.environ.get('VIS_DATA_DIR', 'data'))
+
+
+@st.cache_resource
+def _shared_cache():
+    """
+    进程级共享缓存：同一台分析服务器上的所有会话共用一份解析结果
+    """
+    return SharedDatasetCache(max_mb=SHARED_CACHE_MB)
+
+
+def _acquire_datasets(requests):
+    """
+    requests: [(文件名, 缓存键, 加载函数)]。向共享缓存租用这些数据集，
+    租约保存在会话中，本次不再需要的数据集立即归还；会话结束时租约随会话状态一起回收。
+    返回 ({文件名: 只读DataFrame}, {文件名: 缓存键})；解析失败（如缺少时间列）的文件在页面上报错并跳过
+    """
+    if 'dataset_leases' not in st.session_state:
+        st.session_state.dataset_leases = {}
+    held = st.session_state.dataset_leases
+    cache = _shared_cache()
+
+    dfs, fingerprints = {}, {}
+    for name, key, loader in requests:
+        lease = held.get(key)
+        if lease is None or not lease.active:
+            try:
+                lease = held[key] = cache.acquire(key, loader)
+            except ValueError as e:
+                st.error(f"{name} 解析失败：{e}")
+                continue
+        dfs[name] = lease.df
+        fingerprints[name] = key
+
+    for key in set(held) - set(fingerprints.values()):
+        held.pop(key).release()
+    return dfs, fingerprints
+
+
+def load_uploads(uploaded_files):
+    """
+    解析上传的CSV文件，返回 ({文件名: DataFrame}, {文件名: 内容哈希})。
+    解析与桌面端共用 parse_complex_csv，结果按内容哈希保存在共享缓存中，
+    页面重跑或其他会话上传相同文件时都不会重复解析。
+    """
+    if 'upload_digests' not in st.session_state:
+        st.session_state.upload_digests = {}
+    digests = st.session_state.upload_digests
+
+    requests = []
+    for file in uploaded_files:
+        # 同一个上传对象只计算一次内容哈希
+        file_id = getattr(file, 'file_id', None)
+        digest = digests.get(file_id) if file_id else None
+        if digest is None:
+            digest = hashlib.sha1(file.getvalue()).hexdigest()
+            if file_id:
+                digests[file_id] = digest
+
+        requests.append((file.name, digest, lambda file=file: parse_complex_csv(BytesIO(file.getvalue()), drop_unparsed=True)))
+    return _acquire_datasets(requests)
+
+
+@st.cache_resource(show_spinner="正在索引数据目录...")
+def _get_library(data_dir):
+    library = DatasetLibrary(data_dir)
+    library.refresh()
+    return library
+
+
+def load_library_datasets(data_dir):
+    """
+    从服务器端数据目录选择数据集，返回 ({文件名: DataFrame}, {文件名: 指纹})。
+    数据按需从本地磁盘或列式缓存加载，不经过浏览器上传。
+    """
+    if not os.path.isdir(data_dir):
+        st.warning(f"数据目录不存在：{data_dir}")
+        return {}, {}
+
+    library = _get_library(os.path.abspath(data_dir))
+    if st.sidebar.button("重新扫描数据目录"):
+        library.refresh()
+    entries = library.entries()
+    if not entries:
+        st.info("数据目录中没有CSV文件")
+        return {}, {}
+
+    with st.expander(f"数据目录索引（{len(entries)} 个文件）", expanded=False):
+        st.dataframe(pd.DataFrame([{
+            '文件': e['path'], '行数': e['rows'], '开始时间': e['start'], '结束时间': e['end'],
+            'RAT': ', '.join(f"{k}:{v}" for k, v in e['rat_mix'].items()),
+            'ue_id': ', '.join(map(str, e['ue_ids'])), '大小(MB)': round(e['size'] / 2**20, 1),
+        } for e in entries]), use_container_width=True)
+
+    selected = st.multiselect("选择数据集", [e['path'] for e in entries])
+    with st.spinner("正在加载数据集..."):
+        return _acquire_datasets([(rel_path, library.index[rel_path]['fingerprint'],
+                                   lambda rel_path=rel_path: library.load(rel_path))
+                                  for rel_path in selected])
+
+
+def select_datasets(upload_label):
+    """
+    页面的数据入口：浏览器上传或服务器端数据目录，两种方式返回相同结构
+    """
+    source = st.sidebar.radio("数据来源", ["上传文件", "服务器数据目录"])
+    if source == "上传文件":
+        uploaded_files = st.file_uploader(upload_label, type="csv", accept_multiple_files=True)
+        if not uploaded_files:
+            return {}, {}
+        return load_uploads(uploaded_files)
+
+    sub_dir = st.sidebar.text_input(f"数据目录（{DATA_ROOT} 下的子目录）", value=".")
+    try:
+        data_dir = resolve_data_dir(DATA_ROOT, sub_dir)
+    except ValueError as e:
+        st.warning(str(e))
+        return {}, {}
+    return load_library_datasets(data_dir)
+
+
+def render_stats_panel(dfs, fields, fingerprints=None):
+    """
+    统计面板：按 (file, field, RAT, ue_id) 汇总统计，结果按数据指纹缓存在会话中
+    """
+    if 'stats_cache' not in st.session_state:
+        st.session_state.stats_cache = SummaryStatsCache()
+
+    with st.expander("统计面板", expanded=False):
+        stats = st.session_state.stats_cache.summarize(dfs, fields, fingerprints=fingerprints)
+        st.dataframe(stats, use_container_width=True)
+        st.download_button(
+            label="导出统计结果CSV",
+            data=stats.to_csv(index=False).encode('utf-8-sig'),
+            file_name=f"summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv"
+        )
+
+
+def render_interactive_charts(dfs, fingerprints, fields, x_axis, n_cols=1):
+    """
+    交互图：曲线数据以排序后的 numpy 数组缓存在会话中，
+    每次只把可视范围内的数据按 min-max 降采样到每条曲线不超过设定点数后发送到浏览器。
+    拖动“可视范围”放大时，会从缓存数组中重新取出该范围并以更高的分辨率降采样。
+    """
+    if 'series_store' not in st.session_state:
+        st.session_state.series_store = SeriesStore()
+    store = st.session_state.series_store
+
+    sample_x = next(iter(dfs.values()))[x_axis]
+    is_datetime = pd.api.types.is_datetime64_any_dtype(sample_x)
+    if not is_datetime and not pd.api.types.is_numeric_dtype(sample_x):
+        st.warning(f"交互图需要数值或时间类型的 X 轴，当前字段 {x_axis} 不支持")
+        return
+
+    arrays = {}
+    for field in fields:
+        for name, df in dfs.items():
+            if field in df.columns and x_axis in df.columns:
+                arrays[(field, name)] = store.get(fingerprints[name], df, x_axis, field)
+
+    non_empty = [x for x, _ in arrays.values() if len(x)]
+    if not non_empty:
+        st.info("没有可绘制的数据")
+        return
+    x_min = min(x[0] for x in non_empty)
+    x_max = max(x[-1] for x in non_empty)
+
+    control_cols = st.columns([3, 1])
+    x_range = (x_min, x_max)
+    if x_max > x_min:
+        with control_cols[0]:
+            if is_datetime:
+                lo, hi = st.slider("可视范围（X轴）", min_value=pd.Timestamp(int(x_min)).to_pydatetime(),
+                                   max_value=pd.Timestamp(int(x_max)).to_pydatetime(),
+                                   value=(pd.Timestamp(int(x_min)).to_pydatetime(),
+                                          pd.Timestamp(int(x_max)).to_pydatetime()),
+                                   key=f"x_range_{x_axis}")
+                x_range = (pd.Timestamp(lo).value, pd.Timestamp(hi).value)
+            else:
+                x_range = st.slider("可视范围（X轴）", min_value=float(x_min), max_value=float(x_max),
+                                    value=(float(x_min), float(x_max)), key=f"x_range_{x_axis}")
+    with control_cols[1]:
+        max_points = st.select_slider("每条曲线点数", options=[500, 1000, 2000, 5000, 10000],
+                                      value=DEFAULT_MAX_POINTS)
+
+    n_rows = math.ceil(len(fields) / n_cols)
+    fig = make_subplots(rows=n_rows, cols=n_cols, subplot_titles=fields, shared_xaxes=True)
+    colors = {name: f"hsl({int(360 * i / len(dfs))}, 70%, 45%)" for i, name in enumerate(dfs)}
+    shown = total = 0
+    for idx, field in enumerate(fields):
+        for name in dfs:
+            if (field, name) not in arrays:
+                continue
+            x, y = arrays[(field, name)]
+            xs, ys = minmax_decimate(x, y, max_points, x_range)
+            shown += len(xs)
+            total += len(x)
+            if is_datetime:
+                xs = pd.to_datetime(xs.astype('int64'))
+            fig.add_trace(go.Scattergl(x=xs, y=ys, mode='lines', name=name, legendgroup=name,
+                                       showlegend=(idx == 0), line=dict(color=colors[name])),
+                          row=idx // n_cols + 1, col=idx % n_cols + 1)
+
+    x_display = [pd.Timestamp(int(v)) for v in x_range] if is_datetime else list(x_range)
+    fig.update_xaxes(range=x_display)
+    fig.update_layout(height=max(400, 300 * n_rows), hovermode='x unified', uirevision=x_axis,
+                      margin=dict(l=40, r=20, t=40, b=40))
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"当前显示 {shown:,} / {total:,} 个数据点")
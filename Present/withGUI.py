@@ -11,18 +11,28 @@ from io import BytesIO
 import win32clipboard
 from PIL import Image
 
+# 对齐对比模式：显示文本 -> Feature.alignment 中的运算
+COMPARE_MODES = {"关闭": None, "A - B": "diff", "A / B": "ratio"}
+ALIGN_GROUP_KEYS = ('RAT', 'ue_id')
+
 # 中文支持
 rcParams['font.sans-serif'] = ['SimHei']
 rcParams['axes.unicode_minus'] = False
 
 from Feature import parse_complex_csv, plot_with_matplotlib, plot_with_seaborn, plot_with_plotly
+from Feature.data_cache import DatasetMemoryManager, DEFAULT_BUDGET_MB
+from Feature.alignment import AlignmentCache, check_alignable_axis, comparison_data_dict
+from Feature.statistics import SummaryStatsCache, dataset_fingerprint, export_summary_csv, GROUP_KEYS, STAT_COLUMNS
 
 class MultiFilePlotterApp:
     def __init__(self, root):
         self.root = root
-        self.all_data = {}  # {filename: DataFrame}
+        self.all_data = DatasetMemoryManager(budget_mb=DEFAULT_BUDGET_MB)  # {filename: DataFrame}，超出预算的列溢出到本地缓存
         self.selected_fields = {}
         self.available_fields = set()
+        self.fingerprints = {}  # {filename: 数据指纹}，用于统计与对齐结果缓存
+        self.stats_cache = SummaryStatsCache()
+        self.align_cache = AlignmentCache()
 
         self.setup_ui()
         self.plot_style = {
@@ -70,6 +80,17 @@ class MultiFilePlotterApp:
         # self.col_count_var.trace("w", lambda *args: self.update_plot())
 
         tk.Button(control_frame, text="图表风格设置", command=self.open_style_config).pack(pady=10)
+        tk.Button(control_frame, text="统计面板", command=self.open_stats_panel).pack(pady=5)
+
+        # 内存预算设置与占用显示
+        tk.Label(control_frame, text="内存预算 (MB)：", font=('Arial', 12)).pack(pady=(10, 0))
+        budget_frame = tk.Frame(control_frame)
+        budget_frame.pack()
+        self.budget_var = tk.StringVar(value=str(DEFAULT_BUDGET_MB))
+        tk.Entry(budget_frame, textvariable=self.budget_var, width=8).pack(side=tk.LEFT, padx=5)
+        tk.Button(budget_frame, text="应用", command=self.apply_memory_budget).pack(side=tk.LEFT)
+        self.memory_label = tk.Label(control_frame, text="", font=('Arial', 10))
+        self.memory_label.pack()
 
         # 添加 x 轴选择下拉框
         tk.Label(control_frame, text="选择 X 轴列：", font=('Arial', 12)).pack(pady=10)
@@ -94,6 +115,28 @@ class MultiFilePlotterApp:
         # 绑定字段选择事件，自动刷新图表
         self.right_y_axis_listbox.bind("<<ListboxSelect>>", lambda e: self.update_plot())
 
+        # 多文件对齐对比：把 A、B 两个文件对齐到同一时间轴后绘制 A-B 或 A/B
+        tk.Label(control_frame, text="对齐对比（A 与 B）：", font=('Arial', 12)).pack(pady=(10, 0))
+        compare_frame = tk.Frame(control_frame)
+        compare_frame.pack(fill=tk.X, padx=5)
+        self.compare_a_var = tk.StringVar()
+        self.compare_b_var = tk.StringVar()
+        self.compare_op_var = tk.StringVar(value="关闭")
+        self.compare_tol_var = tk.StringVar(value="0.5")
+        self.compare_a_selector = ttk.Combobox(compare_frame, textvariable=self.compare_a_var, state="readonly", width=14)
+        self.compare_b_selector = ttk.Combobox(compare_frame, textvariable=self.compare_b_var, state="readonly", width=14)
+        self.compare_a_selector.grid(row=0, column=0, padx=2)
+        self.compare_b_selector.grid(row=0, column=1, padx=2)
+        compare_op_selector = ttk.Combobox(compare_frame, textvariable=self.compare_op_var,
+                                           values=list(COMPARE_MODES), state="readonly", width=14)
+        compare_op_selector.grid(row=1, column=0, padx=2, pady=2)
+        tol_frame = tk.Frame(compare_frame)
+        tol_frame.grid(row=1, column=1)
+        tk.Label(tol_frame, text="容差(秒)").pack(side=tk.LEFT)
+        tk.Entry(tol_frame, textvariable=self.compare_tol_var, width=5).pack(side=tk.LEFT)
+        for selector in (self.compare_a_selector, self.compare_b_selector, compare_op_selector):
+            selector.bind("<<ComboboxSelected>>", lambda e: self.update_plot())
+
         # 添加导出和复制按钮的水平布局
         button_frame = tk.Frame(control_frame)
         button_frame.pack(pady=10)
@@ -115,6 +158,7 @@ class MultiFilePlotterApp:
             file_name = file_path.split("/")[-1]
             try:
                 df = parse_complex_csv(file_path)
+                self.fingerprints[file_name] = dataset_fingerprint(df)
                 self.all_data[file_name] = df
                 self.available_fields.update(df.columns.difference(['timestamp', 'datetime', 'delta_seconds']))
             except Exception as e:
@@ -122,11 +166,20 @@ class MultiFilePlotterApp:
 
         # 更新 x 轴选择下拉框的选项
         if self.all_data:
-            sample_df = next(iter(self.all_data.values()))
-            self.x_axis_selector['values'] = list(sample_df.columns)
-            if self.x_axis_var.get() not in sample_df.columns:
+            sample_columns = self.all_data.columns(next(iter(self.all_data)))
+            self.x_axis_selector['values'] = sample_columns
+            if self.x_axis_var.get() not in sample_columns:
                 self.x_axis_var.set("timestamp")  # 默认值
 
+            # 更新对齐对比的文件选项
+            file_names = list(self.all_data)
+            self.compare_a_selector['values'] = file_names
+            self.compare_b_selector['values'] = file_names
+            if self.compare_a_var.get() not in file_names:
+                self.compare_a_var.set(file_names[0])
+            if self.compare_b_var.get() not in file_names:
+                self.compare_b_var.set(file_names[-1])
+
             # 更新右 Y 轴字段 Listbox
             self.right_y_axis_listbox.delete(0, tk.END)
             for col in sorted(self.available_fields):
@@ -137,10 +190,33 @@ class MultiFilePlotterApp:
 
     def clear_files(self):
         self.all_data.clear()
+        self.fingerprints.clear()
+        self.align_cache.clear()
+        self.compare_a_selector['values'] = []
+        self.compare_b_selector['values'] = []
+        self.compare_a_var.set("")
+        self.compare_b_var.set("")
         self.available_fields.clear()
         self.update_checkboxes()
         self.update_plot()
 
+    def apply_memory_budget(self):
+        try:
+            budget_mb = float(self.budget_var.get())
+            if budget_mb <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("输入错误", "内存预算必须是正数（MB）")
+            return
+        self.all_data.set_budget(budget_mb)
+        self.update_memory_label()
+
+    def update_memory_label(self):
+        used_mb = self.all_data.memory_usage() / 2**20
+        budget_mb = self.all_data.budget_bytes / 2**20
+        self.memory_label.config(text=f"内存占用：{used_mb:.1f} / {budget_mb:.0f} MB（{len(self.all_data)} 个文件）",
+                                 fg='firebrick' if used_mb > budget_mb else 'black')
+
     def export_plot(self):
         if not self.all_data:
             messagebox.showwarning("警告", "没有可导出的数据！")
@@ -211,6 +287,50 @@ class MultiFilePlotterApp:
             chk.pack(anchor='w', pady=1)
             self.selected_fields[col] = var
 
+    def open_stats_panel(self):
+        if not self.all_data:
+            messagebox.showwarning("警告", "请先添加CSV文件！")
+            return
+
+        # 未勾选字段时统计全部字段
+        fields = [field for field, var in self.selected_fields.items() if var.get()] or sorted(self.available_fields)
+        try:
+            data = self.all_data.view(fields + ['RAT', 'ue_id'])
+            stats = self.stats_cache.summarize(data, fields, fingerprints=self.fingerprints)
+        except Exception as e:
+            messagebox.showerror("统计失败", f"发生错误：{e}")
+            return
+
+        win = tk.Toplevel(self.root)
+        win.title("统计面板")
+        win.geometry("1000x500")
+
+        columns = GROUP_KEYS + STAT_COLUMNS
+        table_frame = tk.Frame(win)
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        tree = ttk.Treeview(table_frame, columns=columns, show='headings')
+        scrollbar = tk.Scrollbar(table_frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=140 if col in ('file', 'field') else 70, anchor='w')
+        for row in stats.itertuples(index=False):
+            tree.insert('', tk.END, values=[f"{v:.3f}" if isinstance(v, float) else v for v in row])
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        def export_stats():
+            file_path = filedialog.asksaveasfilename(defaultextension=".csv",
+                                                     filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+            if file_path:
+                try:
+                    export_summary_csv(stats, file_path)
+                    messagebox.showinfo("成功", f"统计结果已保存到：{file_path}")
+                except Exception as e:
+                    messagebox.showerror("错误", f"统计结果保存失败：{e}")
+
+        tk.Button(win, text="导出CSV", command=export_stats).pack(pady=5)
+
     def open_style_config(self):
         win = tk.Toplevel(self.root)
         win.title("图表风格设置")
@@ -254,12 +374,25 @@ class MultiFilePlotterApp:
 
         tk.Button(win, text="应用样式并更新图表", command=apply_style).pack(pady=20)
 
+    def build_comparison(self, plot_data, fields, x_axis_column, op):
+        file_a, file_b = self.compare_a_var.get(), self.compare_b_var.get()
+        if file_a not in plot_data or file_b not in plot_data:
+            raise ValueError("请选择要对比的文件 A 和 B")
+        tolerance = float(self.compare_tol_var.get())
+        data = {file_a: plot_data[file_a], file_b: plot_data[file_b]}
+        check_alignable_axis(data, x_axis_column)
+        # 多 UE / NR+LTE 文件中不同 UE 的采样时刻相同，按 (RAT, ue_id) 分组对齐，只配对同一 UE 的行
+        aligned = self.align_cache.align(data, fields, self.fingerprints, x_col=x_axis_column, method='asof',
+                                         tolerance=tolerance, by=ALIGN_GROUP_KEYS)
+        return comparison_data_dict(aligned, file_a, file_b, fields, x_axis_column, op, by=ALIGN_GROUP_KEYS)
+
     def update_plot(self):
         selected = [field for field, var in self.selected_fields.items() if var.get()]
         self.fig.clf()
 
         if not selected or not self.all_data:
             self.canvas.draw()
+            self.update_memory_label()
             return
 
         try:
@@ -274,15 +407,23 @@ class MultiFilePlotterApp:
         selected_indices = self.right_y_axis_listbox.curselection()
         right_y_fields = [self.right_y_axis_listbox.get(i) for i in selected_indices]
 
+        # 只取出当前绘图用到的列（对比模式另取分组列），其余列在超出预算时溢出到缓存
+        op = COMPARE_MODES[self.compare_op_var.get()]
+        group_columns = list(ALIGN_GROUP_KEYS) if op else []
+        plot_data = self.all_data.view(selected + right_y_fields + [x_axis_column] + group_columns)
+        self.update_memory_label()
+
         try:
+            if op:
+                plot_data = self.build_comparison(plot_data, selected + right_y_fields, x_axis_column, op)
             if backend == "matplotlib":
-                plot_with_matplotlib(self.fig, self.all_data, selected, x_axis_column, n_cols,
+                plot_with_matplotlib(self.fig, plot_data, selected, x_axis_column, n_cols,
                                      right_y_axis=right_y_fields, style=self.plot_style)
             elif backend == "seaborn":
-                plot_with_seaborn(self.fig, self.all_data, selected, x_axis_column, n_cols, right_y_axis=right_y_fields,
+                plot_with_seaborn(self.fig, plot_data, selected, x_axis_column, n_cols, right_y_axis=right_y_fields,
                                   style=self.plot_style)
             elif backend == "plotly":
-                plot_with_plotly(self.fig, self.all_data, selected, x_axis_column, n_cols, right_y_axis=right_y_fields,
+                plot_with_plotly(self.fig, plot_data, selected, x_axis_column, n_cols, right_y_axis=right_y_fields,
                                  style=self.plot_style)
                 return
             else:
@@ -299,6 +440,7 @@ if __name__ == '__main__':
     root = tk.Tk()
 
     def on_closing():
+        app.all_data.close()
         root.destroy()
         sys.exit()
 
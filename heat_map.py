@@ -4,11 +4,33 @@ import argparse
 import sys
 import glob
 import os
+import io
+import json
+import time
+import hashlib
+import contextlib
 import plotly.graph_objs as go
 from typing import Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from Feature.heat_binning import tail_n
+from Feature.heat_fit import FIT_METHODS, DEFAULT_RESOLUTION, fit_surface
+from Feature.heat_partials import PARTIAL_SUFFIX, PartialAggregate, is_partial_file, is_raw_csv
+from Feature.heat_render import (CONTOUR_COLORSCALE, CONTOUR_START, CONTOUR_END, N_LEVELS, colorbar_ticks,
+                                 PLOT_BGCOLOR, fitted_grid, annotation_offset, save_raw_heatmap, save_fitted_heatmap)
 
 # ---- 全局常量设置 ----
 DEFAULT_METRIC = 'avg_rate_mbps'
+# 采集端 GridAggregator 写出的网格文件后缀，见 Collect/grid_aggregator.py
+GRID_SUFFIX = '.grid.csv'
+TAIL_N = 10
+# 批量模式的增量清单，保存在输出目录中
+MANIFEST_NAME = '.heatmap_manifest.json'
+# 绘图结果依赖的代码，任一文件改动后所有输出都会重新生成
+CODE_FILES = [os.path.abspath(__file__)] + [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Feature', name)
+    for name in ('heat_binning.py', 'heat_render.py', 'heat_fit.py', 'heat_partials.py')]
+# 静态导出的渲染方式：plotly 经 Kaleido 导出；mpl 用 matplotlib Agg 直接渲染，批量导出快得多
+RENDERERS = ['plotly', 'mpl']
 
 
 def validate_input_file(input_file, required_columns):
@@ -26,13 +48,53 @@ def validate_input_file(input_file, required_columns):
         sys.exit(1)
     return df_clean
 
-def create_grid(df, x_col='gain_5g', y_col='noise', resolution=400):
-    x_min, x_max = df[x_col].min(), df[x_col].max()
-    y_min, y_max = df[y_col].min(), df[y_col].max()
-    grid_x, grid_y = np.mgrid[x_min:x_max:complex(resolution), y_min:y_max:complex(resolution)]
-    return (x_min, x_max, y_min, y_max), grid_x, grid_y
+def is_grid_file(input_file):
+    return input_file.endswith(GRID_SUFFIX)
 
-def plot_raw_heatmap(df, metric, output_file=None):
+
+def grid_metrics(input_file):
+    """网格文件中聚合了哪些指标（采集端默认只聚合速率指标）"""
+    try:
+        return set(pd.read_csv(input_file, usecols=['metric'])['metric'].unique())
+    except (OSError, ValueError):
+        return set()
+
+
+def load_grid_file(input_file, metric, tail_n=TAIL_N):
+    """
+    读取采集时在线聚合的网格文件，展开每个单元的 last-N 样本，
+    返回与"原始CSV按 (gain_5g, noise) 取最后 tail_n 条"相同形状的数据，无需重新扫描原始数据。
+    """
+    if not os.path.isfile(input_file):
+        print(f"错误: 文件 '{input_file}' 不存在。", file=sys.stderr)
+        sys.exit(1)
+    grid = pd.read_csv(input_file, dtype={'tail': str, 'tail_ts': str}, keep_default_na=False)
+    grid = grid[grid['metric'] == metric]
+    if grid.empty:
+        print(f"错误: 网格文件中没有指标 '{metric}'。", file=sys.stderr)
+        sys.exit(1)
+    # 每个单元展开为 (RAT, gain_4g, gain_5g, noise, 时间戳, 值) 行
+    tails = grid['tail'].str.split(';')
+    stamps = grid['tail_ts'].str.split(';')
+    lengths = tails.str.len().to_numpy()
+    df = pd.DataFrame({
+        'RAT': np.repeat(grid['RAT'].to_numpy(), lengths),
+        'gain_4g': np.repeat(grid['gain_4g'].to_numpy(), lengths),
+        'gain_5g': np.repeat(grid['gain_5g'].to_numpy(), lengths),
+        'noise': np.repeat(grid['noise'].to_numpy(), lengths),
+        'timestamp': np.concatenate(stamps.to_numpy()).astype('int64'),
+        metric: np.concatenate(tails.to_numpy()).astype(float),
+    })
+    # 不同 RAT / gain_4g 的单元合并到同一 (gain_5g, noise) 时，按时间取最后 tail_n 条
+    df = df.sort_values('timestamp', kind='stable')
+    return df.groupby(['gain_5g', 'noise']).tail(tail_n).reset_index(drop=True)
+
+
+def plot_raw_heatmap(df, metric, output_file=None, renderer='plotly'):
+    if output_file and renderer == 'mpl':
+        save_raw_heatmap(df, metric, output_file)
+        print(f"\n原始数据点热力图已保存至: {output_file}")
+        return
     z = df[metric]
     z_min = z.min()
     z_max = z.max()
@@ -74,58 +136,26 @@ def plot_raw_heatmap(df, metric, output_file=None):
     else:
         fig.show()
 
-def plot_fitted_heatmap(df, metric, output_file=None, title="拟合等高线图"):
-    # 设定步长
-    gain_step = 2.5
-    noise_step = 5
-
-    # 计算bin
-    df['gain_bin'] = (df['gain_5g'] / gain_step).round() * gain_step
-    df['noise_bin'] = (df['noise'] / noise_step).round() * noise_step
-
-    # 生成规则网格（所有数据）
-    pivot = df.pivot_table(index='noise_bin', columns='gain_bin', values=metric, aggfunc='mean')
-
-    z = pivot.values
-    x = pivot.columns.values
-    y = pivot.index.values
-
-    # 自动设置等高线分级，使z_max一端的区间宽度为其它的两倍
-    z_min = np.nanmin(z)
-    z_max = np.nanmax(z)
-    n_levels = 10  # 总区间数
-
-    col_sum = np.sum(z, axis=0)
-    # 计算列的有效性
-    valid_cols = col_sum != 0
-
-    # 严格筛选有效数据
-    x = pivot.columns[valid_cols]
-    z = z[:, valid_cols]
-    x_min, x_max = x.min(), x.max()
+def plot_fitted_heatmap(df, metric, output_file=None, title="拟合等高线图", renderer='plotly', fit='bin',
+                        resolution=DEFAULT_RESOLUTION, mask_distance=None):
+    # bin: 按 gain 2.5、noise 5 的步长分箱，生成规则网格（所有数据）；其余方法把散点插值到 create_grid 网格。
+    # 同时找到最小z值的位置
+    if fit == 'bin':
+        grid = fitted_grid(df, metric)
+    else:
+        grid = fit_surface(df, metric, fit, resolution, mask_distance=mask_distance)
+    x, y, z = grid['x'], grid['y'], grid['z']
+    x_min, x_max = grid['x_min'], grid['x_max']
+    y_min, y_max = grid['y_min'], grid['y_max']
     print(f"[DEBUG] x_min: {x_min}, x_max: {x_max}")
-    y_min, y_max = y.min(), y.max()
-
-    # 找到最小z值的位置
-    min_z_idx = np.unravel_index(np.argmin(z, axis=None), z.shape)
-    min_z_x = x[min_z_idx[1]]
-    min_z_y = y[min_z_idx[0]]
-    min_z_val = z[min_z_idx]
+    min_z_x, min_z_y, min_z_val = grid['min_z_x'], grid['min_z_y'], grid['min_z_val']
+    if output_file and renderer == 'mpl':
+        save_fitted_heatmap(grid, output_file)
+        print(f"\n拟合等高线图已保存至: {output_file}")
+        return
 
     # 色带
-    custom_colorscale = [
-        [0.0, "#0c0180"],
-        [0.1, "#1101bc"],
-        [0.2, "#1a2dff"],
-        [0.3, "#247ef2"],
-        [0.4, "#21d9cc"],
-        [0.5, "#2ad921"],
-        [0.6, "#abd921"],
-        [0.7, "#f2cc24"],
-        [0.8, "#f27324"],
-        [0.9, "#e52222"],
-        [1.0, "#e52222"]
-    ]
+    custom_colorscale = CONTOUR_COLORSCALE
 
     # # 构造新的 colorscale: 最小值绿色，最大值红色，其余用 Viridis
     # custom_colorscale = [
@@ -136,23 +166,17 @@ def plot_fitted_heatmap(df, metric, output_file=None, title="拟合等高线图"
     #     [1.0, "red"]
     # ]
 
-    # 色带比例点
-    scale_positions = [c[0] for c in custom_colorscale][:-1]
-
-    # 将比例映射到实际数值
-    tickvals = [10 + p * 200 for p in scale_positions]
-
-    # 格式化显示文本（可选：四舍五入，避免太长的小数）
-    ticktext = [f"{val:.0f}" for val in tickvals]
+    # 色带刻度放在色块交界位置
+    tickvals, ticktext = colorbar_ticks()
 
     fig = go.Figure(data=go.Contour(
         x=x,
         y=y,
         z=z,
         contours=dict(
-            start=float(10),
-            end=float(210),
-            size=float((200) / n_levels),
+            start=float(CONTOUR_START),
+            end=float(CONTOUR_END),
+            size=float((CONTOUR_END - CONTOUR_START) / N_LEVELS),
             coloring='fill',
             showlines=False
         ),
@@ -170,6 +194,14 @@ def plot_fitted_heatmap(df, metric, output_file=None, title="拟合等高线图"
         )
     ))
 
+    # 拟合结果中无数据支撑的格点（凸包外或超出置信距离）；Contour 会自动补齐空值，用背景色覆盖这些格点
+    if not grid.get('fill_gaps', True) and np.isnan(z).any():
+        fig.add_trace(go.Heatmap(
+            x=x, y=y, z=np.where(np.isnan(z), 1.0, np.nan),
+            colorscale=[[0, PLOT_BGCOLOR], [1, PLOT_BGCOLOR]],
+            showscale=False, hoverinfo='skip'
+        ))
+
     # # 叠加LTE/NR点
     # df_lte = df[df['RAT'] == 'LTE']
     # df_nr = df[df['RAT'] == 'NR']
@@ -230,14 +262,7 @@ def plot_fitted_heatmap(df, metric, output_file=None, title="拟合等高线图"
     #     borderpad=4
     # )
     # 动态计算箭头偏移量，确保标记在图内
-    # x轴是反向的（从大到小），y轴是正向的
-    x_center = (x_min + x_max) / 2
-    y_center = (y_min + y_max) / 2
-
-    # 如果最小值的x坐标在图的右半边（因为x轴反向，值更小），箭头就指向左
-    ax_offset = -150 if min_z_x < x_center else 150
-    # 如果最小值的y坐标在图的上半边，箭头就指向下
-    ay_offset = 150 if min_z_y > y_center else -150
+    ax_offset, ay_offset = annotation_offset(grid)
 
     # 添加注释：标记最小z值
     fig.add_annotation(
@@ -264,28 +289,202 @@ def plot_fitted_heatmap(df, metric, output_file=None, title="拟合等高线图"
     else:
         fig.show()
 
-def create_optimized_heatmap(input_file: str, output_file: Optional[str] = None, metric: str = DEFAULT_METRIC):
-    required_columns = ['gain_5g', 'noise', 'RAT', metric]
-    df= validate_input_file(input_file, required_columns)
-    if metric not in df.columns:
-        metric = 'instant_rate_mbps'
+def create_optimized_heatmap(input_file: str, output_file: Optional[str] = None, metric: str = DEFAULT_METRIC,
+                             renderer: str = 'plotly', fit: str = 'bin', resolution: int = DEFAULT_RESOLUTION,
+                             mask_distance: Optional[float] = None):
+    if is_grid_file(input_file):
+        # 采集端已在线聚合，直接使用每个单元的最后 TAIL_N 条；与原始CSV相同，缺少指标时退回 instant_rate_mbps
+        available = grid_metrics(input_file)
+        if metric not in available and 'instant_rate_mbps' in available:
+            metric = 'instant_rate_mbps'
+        df = load_grid_file(input_file, metric)
+    elif is_partial_file(input_file):
+        # 多次扫描合并后的部分聚合：每个箱一行，取合并后的均值
+        df = PartialAggregate.load(input_file).to_frame(metric)
+    else:
+        required_columns = ['gain_5g', 'noise', 'RAT', metric]
+        df= validate_input_file(input_file, required_columns)
+        if metric not in df.columns:
+            metric = 'instant_rate_mbps'
 
-    # 只保留每组 (gain_5g, noise) 的最后10条数据
-    df = df.sort_index()  # 保证原始顺序
-    df = df.groupby(['gain_5g', 'noise'], as_index=False, group_keys=False).apply(lambda g: g.tail(10)).reset_index(drop=True)
+        # 只保留每组 (gain_5g, noise) 的最后10条数据
+        df = df.sort_index()  # 保证原始顺序
+        df = tail_n(df, ['gain_5g', 'noise'], TAIL_N).reset_index(drop=True)
 
     # 原始数据点热力图
-    raw_out = None
-    fit_out = None
-    if output_file:
-        # 自动生成两个文件名
-        base, ext = os.path.splitext(output_file)
-        raw_out = base + '_raw' + ext
-        fit_out = base + '_fit' + ext
+    raw_out, fit_out = output_pair(output_file) if output_file else (None, None)
     print("\n生成原始数据点热力图...")
-    plot_raw_heatmap(df, metric, raw_out)
+    plot_raw_heatmap(df, metric, raw_out, renderer=renderer)
     print("\n生成拟合+平滑热力图...")
-    plot_fitted_heatmap(df, metric, fit_out)
+    plot_fitted_heatmap(df, metric, fit_out, renderer=renderer, fit=fit, resolution=resolution,
+                        mask_distance=mask_distance)
+
+def output_pair(output_file):
+    """输出路径 -> (原始数据点热力图, 拟合等高线图) 两个文件名"""
+    base, ext = os.path.splitext(output_file)
+    return base + '_raw' + ext, base + '_fit' + ext
+
+
+def output_name(input_file, ext):
+    """从输入文件名构建输出文件名，例如 'path/to/data_part1.csv' -> 'data_part1.png'；网格文件去掉 .grid.csv"""
+    if is_grid_file(input_file):
+        return f"{os.path.basename(input_file)[:-len(GRID_SUFFIX)]}.{ext}"
+    if is_partial_file(input_file):
+        return f"{os.path.basename(input_file)[:-len(PARTIAL_SUFFIX)]}.{ext}"
+    return f"{os.path.splitext(os.path.basename(input_file))[0]}.{ext}"
+
+
+def code_version():
+    """绘图代码的版本：CODE_FILES 内容的摘要"""
+    digest = hashlib.sha1()
+    for path in CODE_FILES:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def file_digest(path, chunk_size=2**20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path, manifest):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def input_state(input_file, entry):
+    """
+    输入文件的 (大小, mtime_ns, 内容摘要)。大小与修改时间都与清单记录相同时沿用记录的摘要，不重新读取文件，
+    因此大量未改动的文件只需一次 stat
+    """
+    st = os.stat(input_file)
+    if entry and entry.get('size') == st.st_size and entry.get('mtime_ns') == st.st_mtime_ns:
+        return st.st_size, st.st_mtime_ns, entry['input_hash']
+    return st.st_size, st.st_mtime_ns, file_digest(input_file)
+
+
+def is_up_to_date(entry, input_hash, version, output_path, settings):
+    """settings 为影响输出的选项（指标、格式、渲染与拟合方式等），与清单记录逐项比较"""
+    return (entry is not None and entry.get('input_hash') == input_hash and entry.get('version') == version
+            and all(entry.get(name) == value for name, value in settings.items())
+            and all(os.path.exists(path) for path in output_pair(output_path)))
+
+
+def render_file(input_file, output_path, metric, quiet=False, **options):
+    """
+    生成一个文件的两张热力图，options 为 create_optimized_heatmap 的渲染与拟合选项，返回 (耗时秒数, 错误信息或 None, 输出日志)。
+    quiet 时捕获打印输出（并行进程中避免日志交错）；输入无效时 validate_input_file 调用的 sys.exit 也按失败处理
+    """
+    log = io.StringIO()
+    started = time.perf_counter()
+    error = None
+    with contextlib.ExitStack() as stack:
+        if quiet:
+            stack.enter_context(contextlib.redirect_stdout(log))
+            stack.enter_context(contextlib.redirect_stderr(log))
+        try:
+            create_optimized_heatmap(input_file, output_path, metric, **options)
+        except SystemExit:
+            error = log.getvalue().strip().splitlines()[-1] if log.getvalue().strip() else '输入文件无效'
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    return time.perf_counter() - started, error, log.getvalue()
+
+
+def run_batch(jobs, metric, ext, manifest_path, n_jobs=1, force=False, **options):
+    """
+    jobs 为 [(输入文件, 输出路径)]，options 传给 create_optimized_heatmap 并记入清单。按清单跳过未变化的文件，其余串行或用 n_jobs 个进程生成；
+    每完成一个文件就更新清单，中断后重跑只处理剩余的文件。
+    返回 [{'input', 'output', 'status': 'done'|'skipped'|'failed', 'seconds', 'error'}]
+    """
+    manifest = load_manifest(manifest_path)
+    version = code_version()
+    settings = dict(metric=metric, ext=ext, **options)
+    results = []
+    pending = []
+    for input_file, output_path in jobs:
+        key = os.path.basename(output_path)
+        entry = manifest.get(key)
+        try:
+            size, mtime_ns, input_hash = input_state(input_file, entry)
+        except OSError as e:
+            results.append({'input': input_file, 'output': output_path, 'status': 'failed', 'seconds': 0.0,
+                            'error': str(e)})
+            continue
+        if not force and is_up_to_date(entry, input_hash, version, output_path, settings):
+            if (entry['size'], entry['mtime_ns']) != (size, mtime_ns):
+                # 内容未变（例如只是被复制或 touch），记录新的修改时间以免下次再计算摘要
+                entry.update(size=size, mtime_ns=mtime_ns)
+            results.append({'input': input_file, 'output': output_path, 'status': 'skipped', 'seconds': 0.0,
+                            'error': None})
+            continue
+        pending.append((input_file, output_path, key, {
+            'input': os.path.abspath(input_file), 'input_hash': input_hash, 'size': size, 'mtime_ns': mtime_ns,
+            'version': version, **settings}))
+    print(f"\n需要生成 {len(pending)} 个文件，跳过 {len(results)} 个未变化或无法读取的文件。")
+
+    def finish(item, seconds, error, log):
+        input_file, output_path, key, entry = item
+        if error is None:
+            manifest[key] = dict(entry, seconds=round(seconds, 3))
+            save_manifest(manifest_path, manifest)
+            print(f"[{len(results) + 1}/{len(jobs)}] {os.path.basename(input_file)}: {seconds:.1f}s")
+        else:
+            manifest.pop(key, None)
+            if n_jobs > 1 and log:
+                print(log, end='')
+            print(f"处理文件 {input_file} 时发生错误: {error}")
+        results.append({'input': input_file, 'output': output_path, 'status': 'failed' if error else 'done',
+                        'seconds': seconds, 'error': error})
+
+    if n_jobs > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = {pool.submit(render_file, item[0], item[1], metric, True, **options): item for item in pending}
+            for future in as_completed(futures):
+                try:
+                    seconds, error, log = future.result()
+                except Exception as e:
+                    # 工作进程异常退出
+                    seconds, error, log = 0.0, f"{type(e).__name__}: {e}", ''
+                finish(futures[future], seconds, error, log)
+    else:
+        for item in pending:
+            print(f"\n--- 正在处理: {os.path.basename(item[0])} ---")
+            finish(item, *render_file(item[0], item[1], metric, **options))
+    if not pending:
+        save_manifest(manifest_path, manifest)
+    return results
+
+
+def print_summary(results, slowest=10):
+    done = [r for r in results if r['status'] == 'done']
+    failed = [r for r in results if r['status'] == 'failed']
+    skipped = len(results) - len(done) - len(failed)
+    total = sum(r['seconds'] for r in done + failed)
+    print(f"\n===== 汇总 =====\n生成 {len(done)} 个，跳过 {skipped} 个（未变化），失败 {len(failed)} 个；"
+          f"绘图累计耗时 {total:.1f}s")
+    if done:
+        print("耗时最长的文件:")
+        for r in sorted(done, key=lambda r: r['seconds'], reverse=True)[:slowest]:
+            print(f"  {r['seconds']:7.1f}s  {os.path.basename(r['input'])}")
+    if failed:
+        print("失败的文件:")
+        for r in failed:
+            print(f"  {os.path.basename(r['input'])}: {r['error']}")
 
 # if __name__ == "__main__":
 #     parser = argparse.ArgumentParser(
@@ -305,13 +504,27 @@ if __name__ == "__main__":
         formatter_class=argparse.RawTextHelpFormatter
     )
     parser.add_argument('input_path', type=str,
-                        help='单个CSV文件路径 或 包含多个CSV文件的文件夹路径。')
+                        help='单个CSV文件路径 或 包含多个CSV文件的文件夹路径。\n采集端写出的 *.grid.csv 网格文件可直接绘图，且优先于同名原始CSV。\n'
+                             '多次扫描合并的 *.partial.npz（见 Feature/heat_partials.py）也可直接绘图。')
     parser.add_argument('-o', '--output', type=str,
                         help='热力图保存的文件夹路径 (可选)。\n如果未提供，图片将保存在输入文件相同的位置。')
     parser.add_argument('-m', '--metric', type=str, default=DEFAULT_METRIC,
                         help=f'可视化的性能指标 (默认: {DEFAULT_METRIC})')
     parser.add_argument('--ext', type=str, default='png',
                         help='输出图片的文件扩展名 (例如: png, pdf, svg)。\n默认: png')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='并行处理的进程数 (默认: 1)。')
+    parser.add_argument('--force', action='store_true',
+                        help=f'忽略增量清单 ({MANIFEST_NAME})，重新生成所有文件。')
+    parser.add_argument('--renderer', choices=RENDERERS, default='plotly',
+                        help='静态图渲染方式 (默认: plotly)。\nmpl: matplotlib Agg 渲染，外观一致，无需 Kaleido，批量导出快得多。')
+    parser.add_argument('--fit', choices=FIT_METHODS, default='bin',
+                        help='等高线图的拟合方式 (默认: bin)。\nbin: 按 2.5 dB x 5 分箱求均值；linear/cubic: 三角剖分插值；\n'
+                             'idw/rbf: 最近邻反距离 / 高斯核加权。')
+    parser.add_argument('--resolution', type=int, default=DEFAULT_RESOLUTION,
+                        help=f'散点拟合网格的分辨率 (默认: {DEFAULT_RESOLUTION})。')
+    parser.add_argument('--fit-mask', type=float, metavar='BINS',
+                        help='离最近测点超过 BINS 个箱的区域留空，不画出外推结果。')
     args = parser.parse_args()
 
     # --- 主要逻辑更新 ---
@@ -320,7 +533,17 @@ if __name__ == "__main__":
     if os.path.isdir(args.input_path):
         # 如果输入的是文件夹，则查找其中所有的.csv文件
         search_pattern = os.path.join(args.input_path, '*.csv')
-        input_files = glob.glob(search_pattern)
+        # 只保留网格文件和含所选指标的原始扫描CSV；iperf 报告流、merge/replay 输出等附属文件
+        # 不是扫描数据或与原始CSV重复，否则每次重跑都会重新哈希并报告失败
+        input_files = [f for f in glob.glob(search_pattern) if is_grid_file(f) or is_raw_csv(f, [args.metric])]
+        # 同名的网格文件聚合了所选指标时，它已包含绘图所需的全部信息，跳过对应的原始CSV；
+        # 网格中没有该指标（例如 cqi）时仍使用原始CSV，并跳过网格文件
+        grid_bases = {f[:-len(GRID_SUFFIX)]: args.metric in grid_metrics(f) for f in input_files if is_grid_file(f)}
+        raw_bases = {os.path.splitext(f)[0] for f in input_files if not is_grid_file(f)}
+        input_files = [f for f in input_files
+                       if (is_grid_file(f) and (grid_bases[f[:-len(GRID_SUFFIX)]] or
+                                                f[:-len(GRID_SUFFIX)] not in raw_bases))
+                       or (not is_grid_file(f) and not grid_bases.get(os.path.splitext(f)[0], False))]
         print(f"在文件夹 '{args.input_path}' 中找到 {len(input_files)} 个CSV文件。")
     elif os.path.isfile(args.input_path):
         # 如果输入的是单个文件，则将其放入列表以便统一处理
@@ -342,27 +565,13 @@ if __name__ == "__main__":
     else:
         print("未指定输出目录，文件将保存在原位置。")
 
-    # 3. 遍历每个文件并生成热力图
-    for input_file in input_files:
-        try:
-            print(f"\n--- 正在处理: {os.path.basename(input_file)} ---")
-
-            # 从输入文件名构建输出文件名
-            # 例如：'path/to/data_part1.csv' -> 'data_part1'
-            base_name = os.path.splitext(os.path.basename(input_file))[0]
-            output_filename = f"{base_name}.{args.ext}"
-
-            if output_dir:
-                # 指定了输出目录
-                output_path = os.path.join(output_dir, output_filename)
-            else:
-                # 未指定，保存在输入文件旁边
-                output_path = os.path.join(os.path.dirname(input_file), output_filename)
-
-            # 调用你的核心函数生成图像
-            create_optimized_heatmap(input_file, output_path, args.metric)
-
-        except Exception as e:
-            print(f"处理文件 {input_file} 时发生错误: {e}")
-
+    # 3. 生成热力图：输入内容、指标、格式与代码版本都未变化的文件直接跳过
+    manifest_dir = output_dir or (args.input_path if os.path.isdir(args.input_path) else
+                                  os.path.dirname(os.path.abspath(args.input_path)))
+    jobs = [(input_file, os.path.join(output_dir or os.path.dirname(input_file), output_name(input_file, args.ext)))
+            for input_file in sorted(input_files)]
+    results = run_batch(jobs, args.metric, args.ext, os.path.join(manifest_dir, MANIFEST_NAME),
+                        n_jobs=args.jobs, force=args.force, renderer=args.renderer, fit=args.fit,
+                        resolution=args.resolution, mask_distance=args.fit_mask)
     print("\n所有文件处理完毕！")
+    print_summary(results)
@@ -0,0 +1,25 @@
+from io import StringIO
+
+import pandas as pd
+import pytest
+
+from Feature.csv_parser import parse_complex_csv
+
+
+def test_datetime_column_with_whole_second_stamps():
+    csv = StringIO("datetime,value\n2024-05-02 12:00:00,1\n2024-05-02 12:00:02,2\nnot a time,3\n")
+    df = parse_complex_csv(csv, drop_unparsed=True)
+    assert list(df['value']) == [1, 2]
+    assert list(df['delta_seconds']) == [0.0, 2.0]
+
+
+def test_timestamp_column_mixes_fixed_and_general_formats():
+    csv = StringIO("timestamp,value\n2024-05-02 12:00:00.500000,1\n2024-05-02 12:00:01,2\n")
+    df = parse_complex_csv(csv)
+    assert df['pd_time'].notna().all()
+    assert list(df['delta_seconds']) == [0.0, 0.5]
+
+
+def test_missing_time_column_is_a_value_error():
+    with pytest.raises(ValueError):
+        parse_complex_csv(StringIO("value\n1\n"))